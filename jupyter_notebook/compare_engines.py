@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+Runs the aggregatePercentiles query of demo_duckdb.ipynb and demo_trino.ipynb (stops placed in
+their city by a spatial join, then arrival and departure delay percentiles per city and hour) on
+DuckDB with iceberg_scan and on the Trino iceberg catalog, for several thread counts and memory
+limits, and reports wall time, peak memory and bytes read of each.
+
+Usage, from this folder (configuration and credentials as in the notebooks):
+
+    python3 compare_engines.py --duckdb-threads 1,2,4,8 --duckdb-memory 2GB,7GB \\
+        --trino-concurrency default,4,16 --trino-memory default,2GB \\
+        --where "year=2024 AND month=9" --where "year=2024"
+
+Each DuckDB configuration runs in its own process, so that its peak RSS is its own. The Trino
+configurations are session properties (task_concurrency, query_max_memory) of the cluster. Each
+--where restricts the istdaten scan of both engines, to see where the single-node engine stops
+beating the cluster as the data grows. With --geo-cache, the spatial join of the stops and the
+city shapes is replaced by the mapping materialized by geo_tags.py. Both engines compute the same
+columns, the group counts of their results are compared.
+"""
+
+import argparse
+import configparser
+import csv
+import json
+import os
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+S3_PREFIXES = {
+    'istdaten': 'com490/data/sbb/parquet/istdaten/',
+    'shapes': 'com490/data/geo/parquet/',
+    'stops': 'com490/data/sbb/parquet/timetable/stops',
+}
+
+TRINO_TABLES = {
+    'istdaten': 'sbb_istdaten_parquet_part',
+    'shapes': 'geo_parquet',
+    'stops': 'sbb_stops_parquet_part',
+}
+
+# same columns on both engines: delays in seconds, day_week 1-5 is Monday to Friday on both
+DUCKDB_SPATIAL_JOIN = """
+    stop AS (
+        SELECT TRY_CAST(stop_id[:7] AS INTEGER) AS bpuic, stop_lat, stop_lon
+        FROM iceberg_scan('{stops}')
+        WHERE year=2024 AND month=9 AND day=9
+    ),
+    shape AS (
+        SELECT ST_GeomFromWKB(wkb_geometry) AS geometry, name
+        FROM iceberg_scan('{shapes}')
+        WHERE level='city'
+    ),
+    geo_tagged_stop AS (
+        SELECT stop.bpuic, shape.name
+        FROM stop JOIN shape ON ST_Contains(shape.geometry, ST_Point(stop.stop_lon, stop.stop_lat))
+    )"""
+
+DUCKDB_QUERY = """
+WITH
+    {geo_tagged_stop},
+    geo_tagged_istdaten AS (
+        SELECT dayofweek(istdaten.arr_actual) AS day_week, hour(istdaten.arr_actual) AS hour_day,
+               date_diff('second', istdaten.arr_time, istdaten.arr_actual) AS arr_delay,
+               date_diff('second', istdaten.dep_time, istdaten.dep_actual) AS dep_delay,
+               geo_tagged_stop.name
+        FROM (SELECT * FROM iceberg_scan('{istdaten}') WHERE {where}) AS istdaten
+        JOIN geo_tagged_stop ON geo_tagged_stop.bpuic = istdaten.bpuic
+    )
+SELECT AVG(arr_delay) AS arr_delay, AVG(dep_delay) AS dep_delay, COUNT(*) AS num,
+       approx_quantile(arr_delay, 0.25) AS p25, approx_quantile(arr_delay, 0.5) AS p50,
+       approx_quantile(arr_delay, 0.75) AS p75, hour_day, name
+FROM geo_tagged_istdaten WHERE day_week >= 1 AND day_week <= 5 GROUP BY name, hour_day ORDER BY name, hour_day
+"""
+
+TRINO_SPATIAL_JOIN = """
+    stop AS (
+        SELECT TRY(CAST(substr(stop_id, 1, 7) AS INTEGER)) AS bpuic, stop_lat, stop_lon
+        FROM {schema}.{stops}
+        WHERE year=2024 AND month=9 AND day=9
+    ),
+    shape AS (
+        SELECT ST_GeomFromBinary(wkb_geometry) AS geometry, name
+        FROM {schema}.{shapes}
+        WHERE level='city'
+    ),
+    geo_tagged_stop AS (
+        SELECT stop.bpuic, shape.name
+        FROM stop JOIN shape ON ST_Contains(shape.geometry, ST_Point(stop.stop_lon, stop.stop_lat))
+    )"""
+
+TRINO_QUERY = """
+WITH
+    {geo_tagged_stop},
+    geo_tagged_istdaten AS (
+        SELECT day_of_week(istdaten.arr_actual) AS day_week, hour(istdaten.arr_actual) AS hour_day,
+               date_diff('second', istdaten.arr_time, istdaten.arr_actual) AS arr_delay,
+               date_diff('second', istdaten.dep_time, istdaten.dep_actual) AS dep_delay,
+               geo_tagged_stop.name
+        FROM (SELECT * FROM {schema}.{istdaten} WHERE {where}) AS istdaten
+        JOIN geo_tagged_stop USING (bpuic)
+    )
+SELECT AVG(arr_delay) AS arr_delay, AVG(dep_delay) AS dep_delay, COUNT(*) AS num,
+       approx_percentile(arr_delay, 0.25) AS p25, approx_percentile(arr_delay, 0.5) AS p50,
+       approx_percentile(arr_delay, 0.75) AS p75, hour_day, name
+FROM geo_tagged_istdaten WHERE day_week >= 1 AND day_week <= 5 GROUP BY name, hour_day ORDER BY name, hour_day
+"""
+
+def median(values):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    middle = len(ordered) // 2
+    return ordered[middle] if len(ordered) % 2 else (ordered[middle - 1] + ordered[middle]) / 2
+
+def fingerprint(rows, columns):
+    """Number of (name, hour) groups and total of their counts, to check that both engines agree."""
+    num = columns.index('num')
+    return {'groups': len(rows), 'rows': sum(row[num] for row in rows)}
+
+def duckdb_connect(settings, threads=None, memory=None):
+    """A DuckDB connection configured for iceberg_scan on the S3 of the notebooks."""
+    import duckdb
+
+    conn = duckdb.connect()
+    for extension in ('httpfs', 'iceberg', 'spatial'):
+        conn.execute(f"INSTALL '{extension}'")
+        conn.execute(f"LOAD '{extension}'")
+    if memory:
+        conn.execute(f"SET memory_limit = '{memory}'")
+    if threads:
+        conn.execute(f"SET threads TO {threads}")
+    try:
+        # every run reads from S3, as the first run of a notebook does (DuckDB 1.3+ caches the files)
+        conn.execute("SET enable_external_file_cache = false")
+    except duckdb.CatalogException:
+        pass
+    conn.execute(f"""
+        CREATE SECRET s3 (TYPE S3, KEY_ID '{settings['s3key']}', SECRET '{settings['s3secret']}',
+            ENDPOINT '{settings['endpoint']}', URL_STYLE 'path', USE_SSL true, REGION 'ZH')
+    """)
+    return conn
+
+def trino_connect(settings, properties=None):
+    from trino.auth import BasicAuthentication
+    from trino.dbapi import connect
+
+    auth = BasicAuthentication(settings['user'], settings['password']) if settings.get('password') else None
+    return connect(host=settings['host'], port=settings['port'], http_scheme=settings['scheme'],
+                   user=settings['user'], auth=auth, session_properties=properties or {})
+
+def run_duckdb(settings, threads, memory, where, warmup, repeat):
+    """Runs the DuckDB query in this (fresh) process, returns its timings and profile."""
+    import tempfile
+
+    result = {'engine': 'duckdb', 'threads': threads, 'memory': memory, 'where': where, 'error': None}
+    conn = duckdb_connect(settings, threads, memory)
+    profile = os.path.join(tempfile.mkdtemp(), 'profile.json')
+    conn.execute("SET enable_profiling = 'json'")
+    conn.execute(f"SET profiling_output = '{profile}'")
+    tables = {name: f"s3://{settings['bucket']}/{path}" for name, path in settings['metadata'].items()}
+    if settings.get('geo_tags'):
+        geo_tagged_stop = f"geo_tagged_stop AS (SELECT bpuic, name FROM read_parquet('{settings['geo_tags']}'))"
+    else:
+        geo_tagged_stop = DUCKDB_SPATIAL_JOIN.format(**tables)
+    sql = DUCKDB_QUERY.format(geo_tagged_stop=geo_tagged_stop, where=where or 'true', **tables)
+
+    samples, profiles = [], []
+    try:
+        for i in range(warmup + repeat):
+            start = time.perf_counter()
+            cur = conn.execute(sql)
+            rows = cur.fetchall()
+            elapsed = time.perf_counter() - start
+            if i >= warmup:
+                samples.append(elapsed)
+                with open(profile) as f:
+                    profiles.append(json.load(f))
+        result.update(fingerprint(rows, [d[0] for d in cur.description]))
+    except Exception as e:
+        result['error'] = str(e).splitlines()[0]
+    conn.close()
+    result.update(
+        samples=samples, wall=median(samples),
+        cpu=median([p.get('cpu_time', 0) for p in profiles]),
+        bytes_read=median([p.get('total_bytes_read', 0) for p in profiles]),
+        peak_memory=median([p.get('system_peak_buffer_memory', 0) for p in profiles]),
+        # ru_maxrss is in KB on Linux
+        peak_rss=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+    )
+    return result
+
+def run_trino(settings, concurrency, memory, where, warmup, repeat):
+    """Runs the Trino query with the session properties of the configuration, returns its timings and stats."""
+    from contextlib import closing
+
+    properties = {}
+    if concurrency != 'default':
+        properties['task_concurrency'] = int(concurrency)
+    if memory != 'default':
+        properties['query_max_memory'] = memory
+    conn = trino_connect(settings, properties)
+    if settings.get('geo_table'):
+        geo_tagged_stop = f"geo_tagged_stop AS (SELECT bpuic, name FROM {settings['geo_table']})"
+    else:
+        geo_tagged_stop = TRINO_SPATIAL_JOIN.format(schema=settings['schema'], **TRINO_TABLES)
+    sql = TRINO_QUERY.format(geo_tagged_stop=geo_tagged_stop, schema=settings['schema'], where=where or 'true', **TRINO_TABLES)
+
+    result = {'engine': 'trino', 'threads': concurrency, 'memory': memory, 'where': where, 'error': None}
+    samples, stats = [], []
+    try:
+        for i in range(warmup + repeat):
+            with closing(conn.cursor()) as cur:
+                start = time.perf_counter()
+                cur.execute(sql)
+                rows = cur.fetchall()
+                elapsed = time.perf_counter() - start
+                if i >= warmup:
+                    samples.append(elapsed)
+                    stats.append(dict(cur.stats or {}))
+                columns = [d[0] for d in cur.description]
+        result.update(fingerprint(rows, columns))
+    except Exception as e:
+        result['error'] = str(e).splitlines()[0]
+    finally:
+        conn.close()
+    result.update(
+        samples=samples, wall=median(samples),
+        cpu=median([s.get('cpuTimeMillis', 0) / 1000 for s in stats]),
+        bytes_read=median([s.get('physicalInputBytes', 0) for s in stats]),
+        peak_memory=median([s.get('peakMemoryBytes', 0) for s in stats]),
+        nodes=median([s.get('nodes', 0) for s in stats]),
+    )
+    return result
+
+def load_settings(args):
+    config = configparser.RawConfigParser()
+    config.read(args.config)
+    s3 = configparser.ConfigParser()
+    s3.read(os.path.expanduser(args.s3_creds))
+    trino = configparser.ConfigParser()
+    trino.read(os.path.expanduser(args.trino_creds))
+    return {
+        'bucket': config.get('default', 'bucket'), 'endpoint': config.get('default', 'endpoint'),
+        'host': config.get('default', 'host'), 'port': config.getint('default', 'port'),
+        'scheme': config.get('default', 'scheme'), 'schema': args.schema,
+        's3key': s3.get('default', 'key', fallback=None), 's3secret': s3.get('default', 'secret', fallback=None),
+        'user': trino.get('default', 'user', fallback=os.getenv('USER', 'trino')),
+        'password': trino.get('default', 'pass', fallback=None),
+    }
+
+def table(results):
+    lines = [f"{'engine':<7} {'threads':>8} {'memory':>8} {'where':<24} {'wall s':>8} {'CPU s':>8} {'peak MB':>9}"
+             f" {'RSS MB':>8} {'read MB':>9} {'groups':>7} {'vs trino':>9}"]
+    for r in results:
+        if r['error']:
+            lines.append(f"{r['engine']:<7} {r['threads']:>8} {r['memory']:>8} {(r['where'] or '-')[:24]:<24} {r['error'][:60]}")
+            continue
+        speedup = '-' if r.get('speedup') is None else f"{r['speedup']:.2f}x"
+        lines.append(f"{r['engine']:<7} {r['threads']:>8} {r['memory']:>8} {(r['where'] or '-')[:24]:<24} {r['wall']:>8.2f}"
+                     f" {r['cpu'] or 0:>8.1f} {(r['peak_memory'] or 0) / 2**20:>9.0f} {(r.get('peak_rss') or 0) / 2**20:>8.0f}"
+                     f" {(r['bytes_read'] or 0) / 2**20:>9.1f} {r.get('groups', '-'):>7} {speedup:>9}")
+    return '\n'.join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--config', default='config.ini', help='host, bucket and endpoint, as in the notebooks')
+    parser.add_argument('--s3-creds', default='~/.ssh/s3.ini', help='S3 key and secret for DuckDB')
+    parser.add_argument('--trino-creds', default='~/.ssh/trino.ini', help='Trino user and password')
+    parser.add_argument('--schema', default='iceberg.com490_ice', help='Trino catalog and schema of the tables')
+    parser.add_argument('--duckdb-threads', default='2', help='comma separated DuckDB thread counts')
+    parser.add_argument('--duckdb-memory', default='7GB', help='comma separated DuckDB memory limits')
+    parser.add_argument('--trino-concurrency', default='default', help='comma separated task_concurrency (powers of 2)')
+    parser.add_argument('--trino-memory', default='default', help='comma separated query_max_memory')
+    parser.add_argument('--where', action='append', help='predicate on the istdaten table, repeat for several data sizes')
+    parser.add_argument('--engines', default='duckdb,trino', help='engines to run')
+    parser.add_argument('--geo-cache', action='store_true',
+                        help='join istdaten with the materialized stop to city mapping of geo_tags.py')
+    parser.add_argument('--geo-schema', help='Trino schema of the materialized mapping, default --schema')
+    parser.add_argument('-w', '--warmup', type=int, default=0, help='untimed runs per configuration')
+    parser.add_argument('-n', '--repeat', type=int, default=3, help='timed runs per configuration')
+    parser.add_argument('-o', '--output', default='saved_results', help='report directory')
+    args = parser.parse_args()
+
+    settings = load_settings(args)
+    engines = args.engines.split(',')
+    wheres = args.where or [None]
+    if 'duckdb' in engines:
+        from iceberg_metadata import MetadataResolver
+
+        resolver = MetadataResolver(settings['bucket'], settings['endpoint'], settings['s3key'], settings['s3secret'],
+                                    cache_file=os.path.expanduser('~/.cache/iceberg_metadata.json'))
+        settings['metadata'] = resolver.resolve_all(S3_PREFIXES)
+        resolver.close()
+    if args.geo_cache:
+        from geo_tags import GeoTagCache, TrinoGeoTags
+
+        if 'duckdb' in engines:
+            conn = duckdb_connect(settings)
+            cache = GeoTagCache(conn, settings['bucket'], settings['metadata'])
+            settings['geo_tags'] = cache.path()
+            conn.close()
+            print(f"Geo tags: {settings['geo_tags']} {cache.stats or '(cached)'}")
+        if 'trino' in engines:
+            conn = trino_connect(settings)
+            tags = TrinoGeoTags(conn, settings['schema'], args.geo_schema)
+            settings['geo_table'] = tags.table()
+            conn.close()
+            print(f"Geo tags: {settings['geo_table']} {tags.stats or '(up to date)'}")
+
+    results = []
+    for where in wheres:
+        if 'trino' in engines:
+            for concurrency in args.trino_concurrency.split(','):
+                for memory in args.trino_memory.split(','):
+                    results.append(run_trino(settings, concurrency, memory, where, args.warmup, args.repeat))
+                    print(table(results[-1:]).splitlines()[-1], flush=True)
+        if 'duckdb' in engines:
+            # one process per configuration, one at a time so that they do not compete for the CPUs
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn'), max_tasks_per_child=1) as executor:
+                for threads in args.duckdb_threads.split(','):
+                    for memory in args.duckdb_memory.split(','):
+                        results.append(executor.submit(run_duckdb, settings, int(threads), memory, where,
+                                                       args.warmup, args.repeat).result())
+                        print(table(results[-1:]).splitlines()[-1], flush=True)
+
+    for where in wheres:
+        measured = [r for r in results if r['where'] == where and not r['error']]
+        trino = [r for r in measured if r['engine'] == 'trino']
+        best = min((r['wall'] for r in trino), default=None)
+        for r in measured:
+            r['speedup'] = best / r['wall'] if best and r['wall'] else None
+        counts = {(r['groups'], r['rows']) for r in measured}
+        if len(counts) > 1:
+            print(f"Warning: the results differ for {where or 'all data'}: {sorted(counts)}")
+        winners = [r for r in measured if r['engine'] == 'duckdb' and r['speedup'] and r['speedup'] > 1]
+        for r in winners:
+            print(f"DuckDB {r['threads']} threads {r['memory']} beats the best Trino run by {r['speedup']:.2f}x"
+                  f" on {where or 'all data'}")
+
+    print(table(results))
+    os.makedirs(args.output, exist_ok=True)
+    stem = os.path.join(args.output, f"engines_{time.strftime('%Y-%m-%dT%H%M%S')}")
+    with open(f'{stem}.json', 'w') as f:
+        json.dump({'args': vars(args), 'results': results}, f, indent=2, default=str)
+    columns = ['engine', 'threads', 'memory', 'where', 'wall', 'cpu', 'peak_memory', 'peak_rss', 'bytes_read',
+               'nodes', 'groups', 'rows', 'speedup', 'error']
+    with open(f'{stem}.csv', 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(results)
+    print(f'Report: {stem}.{{json,csv}}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""
+Materialized geo_tagged_stop of the aggregatePercentiles query: the stops of the timetable placed
+in the city that contains them. The notebooks compute it with ST_Contains between every stop and
+every city polygon on each run, although stops and boundaries hardly ever change. Here it is
+computed once and kept, so that the istdaten join is an equi-join on bpuic.
+
+Usage, in demo_duckdb.ipynb (conn set up with the S3 secret, metadata from MetadataResolver):
+
+    from geo_tags import GeoTagCache
+
+    geo_tags = GeoTagCache(conn, bucket, metadata).path()
+    ... JOIN read_parquet('{geo_tags}') AS geo_tagged_stop ON geo_tagged_stop.bpuic = ...
+
+or in demo_trino.ipynb:
+
+    from geo_tags import TrinoGeoTags
+
+    geo_tags = TrinoGeoTags(conn, 'iceberg.com490_ice').table()
+    ... JOIN {geo_tags} AS geo_tagged_stop USING (bpuic)
+
+GeoTagCache builds a local Parquet file with a shapely STRtree over the city polygons, named after
+the metadata files of the stops and shapes tables: a new Iceberg snapshot of either is a new
+metadata file, so the file is rebuilt only then. TrinoGeoTags keeps an Iceberg table next to the
+sources, created with the spatial join of the query, and records the snapshot ids of the sources
+in its comment. Both reproduce the CTE row for row: one row per stop and city polygon that
+contains it (a stop inside overlapping polygons appears once per polygon), with bpuic,
+stop_lat, stop_lon and name.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import time
+
+STOP_FILTER = 'year=2024 AND month=9 AND day=9'
+LEVEL = 'city'
+
+class GeoTagCache:
+    def __init__(self, conn, bucket, metadata, cache_dir='~/.cache/geo_tags', stop_filter=STOP_FILTER, level=LEVEL):
+        self.conn = conn
+        self.bucket = bucket
+        self.metadata = metadata
+        self.cache_dir = os.path.expanduser(cache_dir)
+        self.stop_filter = stop_filter
+        self.level = level
+        self.stats = {}
+
+    def key(self):
+        """Changes with the metadata file (i.e. the snapshot) of the stops or shapes table, or the filters."""
+        source = json.dumps([self.metadata['stops'], self.metadata['shapes'], self.stop_filter, self.level])
+        return hashlib.sha1(source.encode()).hexdigest()[:16]
+
+    def path(self):
+        """The Parquet file of the current stops and shapes, built if they changed."""
+        path = os.path.join(self.cache_dir, f'geo_tagged_stop_{self.key()}.parquet')
+        if not os.path.exists(path):
+            self.build(path)
+        return path
+
+    def build(self, path):
+        import numpy as np
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        import shapely
+
+        start = time.perf_counter()
+        stops = self.conn.execute(f"""
+            SELECT TRY_CAST(stop_id[:7] AS INTEGER) AS bpuic, stop_lat, stop_lon
+            FROM iceberg_scan('s3://{self.bucket}/{self.metadata["stops"]}')
+            WHERE {self.stop_filter}
+        """).fetchnumpy()
+        shapes = self.conn.execute(f"""
+            SELECT wkb_geometry, name
+            FROM iceberg_scan('s3://{self.bucket}/{self.metadata["shapes"]}')
+            WHERE level='{self.level}'
+        """).fetchnumpy()
+        loaded = time.perf_counter()
+
+        polygons = shapely.from_wkb([bytes(wkb) for wkb in shapes['wkb_geometry']])
+        points = shapely.points(np.asarray(stops['stop_lon'], dtype=float), np.asarray(stops['stop_lat'], dtype=float))
+        # pairs (stop, polygon) with the stop strictly inside the polygon, as ST_Contains(polygon, stop)
+        stop_index, shape_index = shapely.STRtree(polygons).query(points, predicate='within')
+        order = np.argsort(stop_index, kind='stable')
+        stop_index, shape_index = stop_index[order], shape_index[order]
+        table = pa.table({
+            'bpuic': pa.array(stops['bpuic'][stop_index], pa.int32()),
+            'stop_lat': stops['stop_lat'][stop_index],
+            'stop_lon': stops['stop_lon'][stop_index],
+            'name': pa.array(shapes['name'][shape_index], pa.string()),
+        })
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp = f'{path}.tmp'
+        pq.write_table(table, tmp)
+        os.replace(tmp, path)
+        for stale in glob.glob(os.path.join(self.cache_dir, 'geo_tagged_stop_*.parquet')):
+            if stale != path:
+                os.remove(stale)
+        self.stats = {'stops': len(points), 'shapes': len(polygons), 'tagged': table.num_rows,
+                      'load_time': loaded - start, 'join_time': time.perf_counter() - loaded}
+
+class TrinoGeoTags:
+    def __init__(self, conn, schema, target=None, name='geo_tagged_stop', stops='sbb_stops_parquet_part',
+                 shapes='geo_parquet', stop_filter=STOP_FILTER, level=LEVEL):
+        self.conn = conn
+        self.schema = schema
+        self.target = target or schema
+        self.name = name
+        self.stops = stops
+        self.shapes = shapes
+        self.stop_filter = stop_filter
+        self.level = level
+        self.stats = {}
+
+    def query(self, sql):
+        from contextlib import closing
+
+        with closing(self.conn.cursor()) as cur:
+            cur.execute(sql)
+            return cur.fetchall()
+
+    def key(self):
+        """Current snapshot ids of the stops and shapes tables, and the filters."""
+        snapshots = [
+            self.query(f'SELECT snapshot_id FROM {self.schema}."{table}$snapshots" ORDER BY committed_at DESC LIMIT 1')
+            for table in (self.stops, self.shapes)
+        ]
+        source = json.dumps([[s[0][0] if s else None for s in snapshots], self.stop_filter, self.level])
+        return f'geo_tags {hashlib.sha1(source.encode()).hexdigest()[:16]}'
+
+    def built(self):
+        catalog, schema = self.target.split('.')
+        rows = self.query(f"""
+            SELECT comment FROM system.metadata.table_comments
+            WHERE catalog_name = '{catalog}' AND schema_name = '{schema}' AND table_name = '{self.name}'
+        """)
+        return rows[0][0] if rows else None
+
+    def table(self):
+        """The name of the table of the current stops and shapes, (re)created if they changed."""
+        key = self.key()
+        table = f'{self.target}.{self.name}'
+        if self.built() != key:
+            start = time.perf_counter()
+            self.query(f"""
+                CREATE OR REPLACE TABLE {table} AS
+                WITH
+                    stop AS (
+                        SELECT TRY(CAST(substr(stop_id, 1, 7) AS INTEGER)) AS bpuic, stop_lat, stop_lon
+                        FROM {self.schema}.{self.stops}
+                        WHERE {self.stop_filter}
+                    ),
+                    shape AS (
+                        SELECT ST_GeomFromBinary(wkb_geometry) AS geometry, name
+                        FROM {self.schema}.{self.shapes}
+                        WHERE level='{self.level}'
+                    )
+                SELECT stop.bpuic, stop.stop_lat, stop.stop_lon, shape.name
+                FROM stop JOIN shape ON ST_Contains(shape.geometry, ST_Point(stop.stop_lon, stop.stop_lat))
+            """)
+            self.query(f"COMMENT ON TABLE {table} IS '{key}'")
+            self.stats = {'build_time': time.perf_counter() - start}
+        return table
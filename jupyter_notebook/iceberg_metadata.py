@@ -0,0 +1,173 @@
+"""
+Resolves the current metadata JSON of Iceberg tables stored on S3, for engines without an Iceberg
+catalog such as DuckDB's iceberg_scan.
+
+Usage, in a notebook:
+
+    from iceberg_metadata import MetadataResolver
+
+    resolver = MetadataResolver(bucket, s3endpoint, s3key, s3secret)
+    metadata = resolver.resolve_all(s3_prefixes)
+
+One boto3 client is shared by all the lookups, which run in parallel. A table is resolved from its
+metadata/version-hint.text when it has one (Hadoop tables), otherwise from a paginated listing of
+its metadata/ folder, taking the highest metadata version rather than the latest LastModified.
+Results are cached, for ttl seconds without any request, then revalidated cheaply: a conditional
+GET of the version hint (ETag), or a listing that starts after the cached metadata file and stops
+at the first key that is not a metadata file, before the manifests.
+With cache_file set, the cache outlives the notebook kernel.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# <version>-<uuid>.metadata.json (Trino, Spark with a catalog) or v<version>.metadata.json (Hadoop)
+VERSION = re.compile(r'^(?:v(\d+)|(\d+)-[^/]*)\.(?:gz\.)?metadata\.json$')
+PADDED = re.compile(r'^\d{5,}-')
+
+def metadata_version(key):
+    match = VERSION.match(key.rsplit('/', 1)[-1])
+    if match is None:
+        return -1
+    return int(match.group(1) or match.group(2))
+
+class MetadataResolver:
+    def __init__(self, bucket, endpoint, key, secret, ttl=300, workers=16, cache_file=None, verify=True):
+        import boto3
+        from botocore.config import Config
+
+        self.bucket = bucket
+        self.ttl = ttl
+        self.workers = workers
+        self.cache_file = cache_file
+        self.s3 = boto3.client('s3', endpoint_url=endpoint if '://' in endpoint else 'https://' + endpoint,
+                               aws_access_key_id=key, aws_secret_access_key=secret, verify=verify,
+                               config=Config(max_pool_connections=workers))
+        self.lock = threading.Lock()
+        self.cache = {}
+        self.stats = {'hits': 0, 'revalidated': 0, 'resolved': 0, 'requests': 0}
+        if cache_file and os.path.exists(cache_file):
+            with open(cache_file) as f:
+                self.cache = json.load(f)
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.stats[name] += n
+
+    def save(self):
+        if self.cache_file:
+            with self.lock:
+                cache = dict(self.cache)
+            os.makedirs(os.path.dirname(self.cache_file) or '.', exist_ok=True)
+            tmp = f'{self.cache_file}.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(cache, f, indent=1)
+            os.replace(tmp, self.cache_file)
+
+    def read_hint(self, prefix, etag=None):
+        """Returns (version, etag) of metadata/version-hint.text, (None, etag) if unchanged, None if missing."""
+        from botocore.exceptions import ClientError
+
+        args = {'IfNoneMatch': etag} if etag else {}
+        self.count('requests')
+        try:
+            response = self.s3.get_object(Bucket=self.bucket, Key=f'{prefix}/metadata/version-hint.text', **args)
+        except ClientError as e:
+            code = e.response.get('Error', {}).get('Code')
+            if code in ('304', 'NotModified'):
+                return None, etag
+            if code in ('404', 'NoSuchKey'):
+                return None
+            raise
+        return int(response['Body'].read().decode().strip()), response['ETag']
+
+    def list_metadata(self, prefix, start_after=None):
+        """
+        Yields (key, LastModified) of the metadata JSON files. With start_after, a zero padded
+        <version>-<uuid>.metadata.json, only the metadata files named after it: the listing stops
+        at the first key that is not one, as the manifests and manifest lists sort after them.
+        """
+        args = {'Bucket': self.bucket, 'Prefix': f'{prefix}/metadata/'}
+        if start_after:
+            args['StartAfter'] = start_after
+        for page in self.s3.get_paginator('list_objects_v2').paginate(**args):
+            self.count('requests')
+            for obj in page.get('Contents', []):
+                name = obj['Key'].rsplit('/', 1)[-1]
+                if start_after and not PADDED.match(name):
+                    return
+                if VERSION.match(name) or name.endswith('.metadata.json'):
+                    yield obj['Key'], obj['LastModified']
+
+    def latest(self, prefix, start_after=None):
+        best = None
+        for key, modified in self.list_metadata(prefix, start_after):
+            rank = (metadata_version(key), modified)
+            if best is None or rank > best[0]:
+                best = (rank, key)
+        return best and best[1]
+
+    def lookup(self, prefix, entry):
+        """Resolves a table, revalidating the cached entry if any. Returns the new cache entry."""
+        if entry and entry.get('hint_etag'):
+            hint = self.read_hint(prefix, entry['hint_etag'])
+            if hint is not None and hint[0] is None:
+                return dict(entry, checked=time.time())
+        else:
+            hint = None if entry else self.read_hint(prefix)
+        if hint is not None:
+            version, etag = hint
+            return {'key': f'{prefix}/metadata/v{version}.metadata.json', 'hint_etag': etag, 'checked': time.time()}
+        # zero padded versions sort by name, only the metadata files named after the cached one are listed
+        incremental = entry and PADDED.match(entry['key'].rsplit('/', 1)[-1])
+        key = self.latest(prefix, entry['key'] if incremental else None)
+        if key is None and incremental:
+            return dict(entry, checked=time.time())
+        if key is None:
+            raise FileNotFoundError(f'No Iceberg metadata in s3://{self.bucket}/{prefix}/metadata/')
+        return {'key': key, 'checked': time.time()}
+
+    def resolve(self, prefix):
+        """Returns the key of the current metadata JSON of the table at prefix."""
+        prefix = prefix.strip('/')
+        with self.lock:
+            entry = self.cache.get(prefix)
+        if entry and time.time() - entry['checked'] < self.ttl:
+            self.count('hits')
+            return entry['key']
+        self.count('revalidated' if entry else 'resolved')
+        entry = self.lookup(prefix, entry)
+        with self.lock:
+            self.cache[prefix] = entry
+        return entry['key']
+
+    def resolve_all(self, prefixes):
+        """Resolves a {name: prefix} dict in parallel, returns {name: metadata key}."""
+        names = list(prefixes)
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            keys = list(pool.map(lambda name: self.resolve(prefixes[name]), names))
+        self.save()
+        return dict(zip(names, keys))
+
+    def invalidate(self, prefix=None):
+        with self.lock:
+            if prefix is None:
+                self.cache.clear()
+            else:
+                self.cache.pop(prefix.strip('/'), None)
+
+    def close(self):
+        self.save()
+        self.s3.close()
+
+def get_metadata(bucket, prefix, s3endpoint, s3key, s3secret):
+    """Drop-in replacement of the get_metadata helper of demo_duckdb.ipynb."""
+    resolver = MetadataResolver(bucket, s3endpoint, s3key, s3secret, ttl=0)
+    try:
+        return resolver.resolve(prefix)
+    finally:
+        resolver.close()
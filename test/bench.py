@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Benchmark harness, replays the CREATE/INSERT/SELECT workloads of the test suites and
+reports latency percentiles and throughput per catalog.
+"""
+
+import argparse
+import importlib
+import inspect
+import math
+import os
+import time
+from contextlib import closing
+
+import mixins
+
+def percentile(samples, p):
+    """Percentile with linear interpolation between closest ranks (numpy's default)."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    k = (len(ordered) - 1) * p / 100
+    f = math.floor(k)
+    c = min(f + 1, len(ordered) - 1)
+    return ordered[f] + (ordered[c] - ordered[f]) * (k - f)
+
+def summarize(catalog, query, samples, rows, bytes, physical=(), cpu=()):
+    elapsed = sum(samples)
+    return {
+        'catalog': catalog,
+        'query': query,
+        'samples': len(samples),
+        'min': min(samples),
+        'mean': elapsed / len(samples),
+        'p50': percentile(samples, 50),
+        'p95': percentile(samples, 95),
+        'p99': percentile(samples, 99),
+        'max': max(samples),
+        'rows': sum(rows),
+        'bytes': sum(bytes),
+        'rowsPerSec': sum(rows) / elapsed if elapsed > 0 else None,
+        'bytesPerSec': sum(bytes) / elapsed if elapsed > 0 else None,
+        'physicalInputBytes': sum(physical) / len(physical) if physical else None,
+        'physicalSamples': list(physical),
+        'clientCpu': percentile(cpu, 50),
+        'latencies': samples,
+    }
+
+class Report:
+    """
+    Collects the summaries of a benchmark run and writes them as JSON and CSV, and appends them
+    to the run history (history.py) keyed by catalog and dimensions, None for reports that are
+    not benchmarks.
+    """
+    columns = ['catalog', 'query', 'samples', 'min', 'mean', 'p50', 'p95', 'p99', 'max',
+               'rows', 'bytes', 'rowsPerSec', 'bytesPerSec', 'physicalInputBytes', 'clientCpu']
+    dimensions = ['query']
+
+    def __init__(self, name, **params):
+        self.name = name
+        self.params = params
+        self.started = time.strftime('%Y-%m-%dT%H:%M:%S')
+        self.results = []
+
+    def add(self, result):
+        self.results.append(result)
+
+    def write(self, outdir):
+        import csv
+        import json
+
+        os.makedirs(outdir, exist_ok=True)
+        stem = os.path.join(outdir, f"{self.name}_{self.started.replace(':', '')}")
+        with open(f'{stem}.json', 'w') as f:
+            json.dump({'name': self.name, 'started': self.started, 'params': self.params,
+                       'results': self.results}, f, indent=2, default=str)
+        with open(f'{stem}.csv', 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=self.columns, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(self.results)
+        if self.dimensions is not None:
+            import history
+            history.record(os.path.join(outdir, 'history.sqlite'), self)
+        return stem
+
+    def table(self):
+        lines = [f"{'catalog':<10} {'query':<28} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'rows/s':>12} {'bytes/s':>14}"
+                 f" {'client CPU ms':>13}"]
+        for r in self.results:
+            lines.append(f"{r['catalog']:<10} {r['query']:<28} {r['p50']*1e3:>10.1f} {r['p95']*1e3:>10.1f} {r['p99']*1e3:>10.1f}"
+                         f" {r['rowsPerSec'] or 0:>12.1f} {r['bytesPerSec'] or 0:>14.1f} {(r.get('clientCpu') or 0)*1e3:>13.1f}")
+        return '\n'.join(lines)
+
+class Benchmark:
+    """
+    Times the workload of a test suite class (e.g. test_s3.TestS3). The suite provides the
+    connection and schema via TrinoConnect.setUpTrait/tearDownTrait and the SQL via its
+    createTableSql/insertSql/selectSql class methods. With columnar, the SELECT queries are also
+    fetched as Arrow tables (columnar.ColumnarCursor), to compare the client CPU time of decoding.
+    """
+
+    def __init__(self, suite, warmup=2, repeat=10, columnar=False):
+        self.suite = suite
+        self.warmup = warmup
+        self.repeat = repeat
+        self.columnar = columnar
+
+    def workload(self):
+        suite = self.suite
+        return [
+            ('show_schemas', f"SHOW SCHEMAS FROM {suite.catalog}"),
+            ('show_tables', f"SHOW TABLES FROM {suite.catalog}.{suite.schemaNm}"),
+            ('insert_into_table', suite.insertSql()),
+            ('select_from_table', suite.selectSql()),
+        ]
+
+    def execute(self, sql):
+        with closing(self.suite.conn.cursor()) as cur:
+            cur.execute(sql)
+            return cur.fetchall()
+
+    def measure(self, name, sql, columnar=False):
+        if columnar:
+            from columnar import ColumnarCursor
+
+        samples, rows, bytes, physical, cpus = [], [], [], [], []
+        for i in range(self.warmup + self.repeat):
+            cursor = ColumnarCursor(self.suite.conn) if columnar else self.suite.conn.cursor()
+            with mixins.QueryLog.tagged(f'bench/{self.suite.catalog}/{name}/{i}'), closing(cursor) as cur:
+                start, cpu = time.perf_counter(), time.process_time()
+                cur.execute(sql)
+                result = cur.fetchTable() if columnar else cur.fetchall()
+                elapsed, cpu = time.perf_counter() - start, time.process_time() - cpu
+                stats = cur.stats or {}
+                updated = cur.update_type is not None
+            if i < self.warmup:
+                continue
+            samples.append(elapsed)
+            cpus.append(cpu)
+            rows.append(result.num_rows if columnar else result[0][0] if updated and result else len(result))
+            bytes.append(stats.get('processedBytes', 0))
+            physical.append(stats.get('physicalInputBytes', 0))
+        self.suite.logger.info(f'{name}: p50 {percentile(samples, 50)*1e3:.1f} ms over {len(samples)} runs')
+        return summarize(self.suite.catalog, name, samples, rows, bytes, physical, cpus)
+
+    def run(self, report):
+        suite = self.suite
+        suite.setUpTrait()
+        try:
+            self.execute(f"CREATE SCHEMA IF NOT EXISTS {suite.catalog}.{suite.schemaNm}")
+            self.execute(suite.createTableSql())
+            for name, sql in self.workload():
+                report.add(self.measure(name, sql))
+                if self.columnar and sql.lstrip().upper().startswith('SELECT'):
+                    report.add(self.measure(f'{name}/columnar', sql, columnar=True))
+        finally:
+            suite.tearDownTrait()
+
+def suites(names):
+    """Resolves test module names (test_s3 or test_s3.py) to their mixins.TestCase classes."""
+    for name in names:
+        module = importlib.import_module(os.path.basename(name).removesuffix('.py'))
+        for _, cls in inspect.getmembers(module, inspect.isclass):
+            if issubclass(cls, mixins.TestCase) and cls is not mixins.TestCase:
+                yield cls
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('suites', nargs='*', default=['test_s3', 'test_hive', 'test_iceberg'],
+                        help='test modules whose workload to replay')
+    parser.add_argument('-w', '--warmup', type=int, default=2, help='untimed runs per query')
+    parser.add_argument('-n', '--repeat', type=int, default=10, help='timed runs per query')
+    parser.add_argument('-c', '--columnar', action='store_true', help='also fetch the SELECT results as Arrow tables')
+    parser.add_argument('-o', '--output', default='private/bench', help='report directory')
+    args = parser.parse_args()
+
+    report = Report('bench', warmup=args.warmup, repeat=args.repeat, columnar=args.columnar)
+    for suite in suites(args.suites):
+        Benchmark(suite, args.warmup, args.repeat, args.columnar).run(report)
+    print(report.table())
+    print(f'Report: {report.write(args.output)}.{{json,csv}}')
+
+if __name__ == '__main__':
+    main()
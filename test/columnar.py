@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Columnar fetch of query results as Arrow record batches or NumPy arrays. The rows of each batch
+are taken as the JSON values of the protocol (legacy_primitive_types, no Decimal, datetime or
+NamedRowTuple per value), transposed and converted column by column by pyarrow: decimals, dates
+and timestamps are cast from their text, ARRAY and MAP values are flattened to list offsets and
+ROW fields to struct children. Compares the client CPU time of the row and columnar fetches.
+"""
+
+import argparse
+import base64
+import re
+import time
+from contextlib import closing
+
+import bench
+import mixins
+
+def parseType(name):
+    """Parses a Trino type name ('decimal(10,2)', 'row(a integer, b array(varchar))') to (base, arguments)."""
+    name = name.strip()
+    match = re.match(r'([a-z ]+?)\s*(\((.*)\))?(\s+with(out)? time zone)?$', name, re.DOTALL)
+    if not match:
+        return name, []
+    base, inner, zone = match.group(1).strip(), match.group(3), match.group(4)
+    if zone:
+        base += ' with time zone' if match.group(5) is None else ''
+    arguments = []
+    if inner is not None:
+        depth, start = 0, 0
+        parts = []
+        for i, c in enumerate(inner):
+            if c == '(':
+                depth += 1
+            elif c == ')':
+                depth -= 1
+            elif c == ',' and depth == 0:
+                parts.append(inner[start:i])
+                start = i + 1
+        parts.append(inner[start:])
+        for part in (p.strip() for p in parts):
+            if base == 'row':
+                field = re.match(r'("(?:[^"]|"")+"|[^\s"]+)\s+(.+)$', part, re.DOTALL)
+                if field and '(' not in field.group(1):
+                    arguments.append((field.group(1).strip('"').replace('""', '"'), parseType(field.group(2))))
+                else:
+                    arguments.append((None, parseType(part)))
+            elif re.fullmatch(r'\d+', part):
+                arguments.append(int(part))
+            else:
+                arguments.append(parseType(part))
+    return base, arguments
+
+def unit(precision):
+    return 's' if precision == 0 else 'ms' if precision <= 3 else 'us' if precision <= 6 else 'ns'
+
+def arrowType(t):
+    """The Arrow type of a parsed Trino type, string for the types without an Arrow equivalent."""
+    import pyarrow as pa
+
+    base, arguments = t
+    fixed = {
+        'boolean': pa.bool_(), 'tinyint': pa.int8(), 'smallint': pa.int16(), 'integer': pa.int32(),
+        'bigint': pa.int64(), 'real': pa.float32(), 'double': pa.float64(), 'date': pa.date32(),
+        'varbinary': pa.binary(),
+    }
+    if base in fixed:
+        return fixed[base]
+    if base == 'decimal':
+        return pa.decimal128(arguments[0] if arguments else 38, arguments[1] if len(arguments) > 1 else 0)
+    if base == 'timestamp':
+        return pa.timestamp(unit(arguments[0] if arguments else 3))
+    if base == 'timestamp with time zone':
+        return pa.timestamp(unit(arguments[0] if arguments else 3), tz='UTC')
+    if base == 'time':
+        precision = arguments[0] if arguments else 3
+        return pa.time32(unit(precision)) if precision <= 3 else pa.time64(unit(precision))
+    if base == 'array':
+        return pa.list_(arrowType(arguments[0]))
+    if base == 'map':
+        return pa.map_(arrowType(arguments[0]), arrowType(arguments[1]))
+    if base == 'row':
+        return pa.struct([pa.field(name or f'field{i}', arrowType(child)) for i, (name, child) in enumerate(arguments)])
+    return pa.string()
+
+def toArrow(values, t, raw=True):
+    """
+    Arrow array of a column of values of the parsed Trino type t. Raw values are those of the
+    JSON protocol (decimals, dates, timestamps as text, varbinary as base64, ROW as list, MAP keys
+    as text), otherwise those of the client's row mappers or of the embedded engine.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    base, arguments = t
+    target = arrowType(t)
+    mask = None
+    if base in ('array', 'map', 'row'):
+        mask = pa.array([v is None for v in values], pa.bool_()) if None in values else None
+    if base == 'array':
+        offsets, flat = [0], []
+        for v in values:
+            if v is not None:
+                flat.extend(v)
+            offsets.append(len(flat))
+        return pa.ListArray.from_arrays(pa.array(offsets, pa.int32()), toArrow(flat, arguments[0], raw), type=target, mask=mask)
+    if base == 'map':
+        offsets, keys, items = [0], [], []
+        for v in values:
+            if v is not None:
+                keys.extend(v.keys())
+                items.extend(v.values())
+            offsets.append(len(keys))
+        if raw and arguments[0][0] in ('boolean', 'tinyint', 'smallint', 'integer', 'bigint'):
+            # JSON object keys are text whatever the key type
+            keys = pa.array(keys, pa.string()).cast(target.key_type)
+        else:
+            keys = toArrow(keys, arguments[0], raw)
+        return pa.MapArray.from_arrays(pa.array(offsets, pa.int32()), keys, toArrow(items, arguments[1], raw), type=target, mask=mask)
+    if base == 'row':
+        children = []
+        for i, (name, child) in enumerate(arguments):
+            column = [None if v is None else v[name] if isinstance(v, dict) else v[i] for v in values]
+            children.append(toArrow(column, child, raw))
+        return pa.StructArray.from_arrays(children, fields=list(target), mask=mask)
+    if not raw and target == pa.string():
+        # uuid, intervals, time with time zone... as their text
+        return pa.array([None if v is None else str(v) for v in values], target)
+    if not raw or base in ('boolean', 'tinyint', 'smallint', 'integer', 'bigint'):
+        return pa.array(values, target)
+    if base in ('real', 'double'):
+        try:
+            return pa.array(values, pa.float64()).cast(target)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # NaN and infinities are strings in the JSON protocol
+            return pa.array([None if v is None else str(v) for v in values], pa.string()).cast(target)
+    if base == 'varbinary':
+        return pa.array([None if v is None else base64.b64decode(v) for v in values], target)
+    text = pa.array(values, pa.string())
+    if base in ('decimal', 'date'):
+        return text.cast(target)
+    if base == 'timestamp':
+        precision = arguments[0] if arguments else 3
+        # Arrow parses down to nanoseconds, Trino timestamps go to picoseconds
+        return (pc.utf8_slice_codeunits(text, 0, 29) if precision > 9 else text).cast(target)
+    if base == 'timestamp with time zone':
+        zones = pc.extract_regex(text, r'^(?P<local>\S+ \S+) (?P<zone>\S+)$')
+        local, zone = zones.field('local'), zones.field('zone')
+        offset = pc.replace_substring_regex(zone, r'^UTC$', '+00:00')
+        if pc.all(pc.match_substring_regex(offset, r'^[+-]\d\d:\d\d$')).as_py() is not False:
+            return pc.binary_join_element_wise(local, offset, '').cast(target)
+        # named time zones, converted by the client's mapper
+        from trino.mapper import TimestampWithTimeZoneValueMapper
+        mapper = TimestampWithTimeZoneValueMapper(arguments[0] if arguments else 3)
+        return pa.array([mapper.map(v) for v in values], target)
+    if base == 'time':
+        timestamp = pa.timestamp(target.unit)
+        return pc.binary_join_element_wise('1970-01-01 ', text, '').cast(timestamp).cast(target)
+    return text
+
+class ColumnarCursor:
+    """
+    Executes a query on a (pooled) connection and returns its results as pyarrow RecordBatches of
+    up to batchSize rows, a Table or a dict of NumPy arrays. On Trino the cursor returns the values
+    of the protocol unmapped; the embedded engine of offline.py returns Python objects.
+    """
+
+    def __init__(self, conn, batchSize=65536):
+        self.conn = conn
+        self.batchSize = batchSize
+        self.cur = None
+        self.types = None
+        self.schema = None
+        self.raw = True
+
+    def execute(self, sql):
+        import pyarrow as pa
+
+        self.close()
+        try:
+            self.cur = self.conn.cursor(legacy_primitive_types=True)
+        except TypeError:
+            # the embedded engine's cursor
+            self.cur = self.conn.cursor()
+            self.raw = False
+        self.cur.execute(sql)
+        self.types = [parseType(d[1]) for d in self.cur.description]
+        self.schema = pa.schema([pa.field(d[0], arrowType(t)) for d, t in zip(self.cur.description, self.types)])
+        return self
+
+    def fetchBatch(self):
+        """The next RecordBatch, None at the end of the result."""
+        import pyarrow as pa
+
+        rows = self.cur.fetchmany(self.batchSize)
+        if not rows:
+            return None
+        columns = list(zip(*rows))
+        with mixins.Profiler.phase('columnar decode'):
+            return pa.RecordBatch.from_arrays([toArrow(list(c), t, self.raw) for c, t in zip(columns, self.types)],
+                                              schema=self.schema)
+
+    def __iter__(self):
+        while (batch := self.fetchBatch()) is not None:
+            yield batch
+
+    def fetchTable(self):
+        import pyarrow as pa
+
+        return pa.Table.from_batches(list(self), schema=self.schema)
+
+    def fetchNumpy(self):
+        """The result as NumPy arrays per column, nested and decimal columns are object arrays."""
+        table = self.fetchTable()
+        return {name: column.to_numpy() for name, column in zip(table.column_names, table.columns)}
+
+    def __getattr__(self, name):
+        # stats, query_id, update_type of the underlying cursor
+        return getattr(self.__dict__['cur'], name)
+
+    def close(self):
+        if self.cur is not None:
+            self.cur.close()
+            self.cur = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def fetchRows(conn, sql, batchSize=65536):
+    """The row fetch the suites use, fetchmany with the client's mappers. Returns the number of rows."""
+    rows = 0
+    with closing(conn.cursor()) as cur:
+        cur.execute(sql)
+        while batch := cur.fetchmany(batchSize):
+            rows += len(batch)
+    return rows
+
+def fetchColumnar(conn, sql, batchSize=65536, numpy=False):
+    """The columnar fetch, the result as Arrow batches (or NumPy arrays). Returns the number of rows."""
+    with ColumnarCursor(conn, batchSize) as cur:
+        cur.execute(sql)
+        if numpy:
+            return len(next(iter(cur.fetchNumpy().values()), []))
+        return sum(batch.num_rows for batch in cur)
+
+class ColumnarReport(bench.Report):
+    columns = ['mode', 'samples', 'p50', 'p95', 'rows', 'rowsPerSec', 'clientCpu', 'cpuPerMillionRows', 'cpuRatio']
+    dimensions = ['mode']
+
+    def table(self):
+        lines = [f"{'mode':<8} {'p50 s':>8} {'rows':>10} {'rows/s':>12} {'client CPU s':>12} {'CPU s/M rows':>12} {'vs rows':>8}"]
+        for r in self.results:
+            lines.append(f"{r['mode']:<8} {r['p50']:>8.2f} {r['rows']:>10} {r['rowsPerSec'] or 0:>12.0f} {r['clientCpu']:>12.2f}"
+                         f" {r['cpuPerMillionRows'] or 0:>12.2f} {r['cpuRatio'] or 0:>7.2f}x")
+        return '\n'.join(lines)
+
+def compare(target, sql, warmup=1, repeat=3, batchSize=65536):
+    """
+    Times the row fetch and the columnar fetches (Arrow, NumPy) of sql, with the client CPU time of
+    the process: for a remote cluster mostly JSON parsing and decoding, offline it includes the
+    embedded engine.
+    """
+    modes = [('rows', lambda conn: fetchRows(conn, sql, batchSize)),
+             ('arrow', lambda conn: fetchColumnar(conn, sql, batchSize)),
+             ('numpy', lambda conn: fetchColumnar(conn, sql, batchSize, numpy=True))]
+    results = []
+    for mode, fetch in modes:
+        samples, cpus, rows = [], [], 0
+        for i in range(warmup + repeat):
+            with mixins.QueryLog.tagged(f'columnar/{mode}/{i}'), target.pool.connection() as conn:
+                start, cpu = time.perf_counter(), time.process_time()
+                rows = fetch(conn)
+                elapsed, cpu = time.perf_counter() - start, time.process_time() - cpu
+            if i >= warmup:
+                samples.append(elapsed)
+                cpus.append(cpu)
+        p50, clientCpu = bench.percentile(samples, 50), bench.percentile(cpus, 50)
+        results.append({
+            'mode': mode, 'samples': len(samples), 'p50': p50, 'p95': bench.percentile(samples, 95), 'rows': rows,
+            'rowsPerSec': rows / p50 if p50 else None, 'clientCpu': clientCpu,
+            'cpuPerMillionRows': clientCpu * 1e6 / rows if rows else None, 'latencies': samples,
+        })
+        target.logger.info(f'{mode}: p50 {p50:.2f}s, client CPU {clientCpu:.2f}s for {rows} rows')
+    for result in results:
+        result['cpuRatio'] = result['clientCpu'] / results[0]['clientCpu'] if results[0]['clientCpu'] else None
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('catalog', nargs='?', default='hive', help='catalog of the session')
+    parser.add_argument('-q', '--query', help='query to fetch, default a generated result of -r rows')
+    parser.add_argument('-r', '--rows', type=int, default=200000, help='rows of the generated result')
+    parser.add_argument('-b', '--batch', type=int, default=65536, help='rows per fetch')
+    parser.add_argument('-w', '--warmup', type=int, default=1, help='untimed runs per mode')
+    parser.add_argument('-n', '--repeat', type=int, default=3, help='timed runs per mode')
+    parser.add_argument('-o', '--output', default='private/bench', help='report directory')
+    args = parser.parse_args()
+
+    outer = max(-(-args.rows // 1000), 1)
+    # one column of each type whose decoding is costly per row
+    sql = args.query or f"""
+        SELECT o * 1000 + i AS id, random() AS value,
+               CAST(o * 1000 + i AS DECIMAL(18,2)) / 7 AS amount,
+               date_add('second', o * 1000 + i, TIMESTAMP '2024-01-01 00:00:00.000') AS ts,
+               to_hex(md5(to_utf8(CAST(i AS VARCHAR)))) AS payload,
+               ARRAY[i, i + 1, i + 2] AS tags,
+               MAP(ARRAY['a', 'b'], ARRAY[i, o]) AS attributes,
+               CAST(ROW(i, CAST(i AS VARCHAR)) AS ROW(n INTEGER, s VARCHAR)) AS pair
+        FROM UNNEST(sequence(0, {outer - 1})) AS a(o) CROSS JOIN UNNEST(sequence(0, {min(args.rows, 1000) - 1})) AS b(i)
+    """
+    target = type(f'Columnar{args.catalog.capitalize()}', (mixins.TrinoConnect,), {'_catalog': args.catalog})
+    target.setUpTrait()
+    try:
+        report = ColumnarReport('columnar', query=' '.join(sql.split()), batch=args.batch, warmup=args.warmup, repeat=args.repeat)
+        for result in compare(target, sql, args.warmup, args.repeat, args.batch):
+            report.add(result)
+    finally:
+        target.tearDownTrait()
+    print(report.table())
+    print(f'Report: {report.write(args.output)}.{{json,csv}}')
+
+if __name__ == '__main__':
+    main()
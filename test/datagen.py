@@ -0,0 +1,684 @@
+#!/usr/bin/env python3
+"""
+Bulk synthetic data loader, generates a seeded dataset for the column types of a table and
+streams it in bounded memory, either as batched multi-row INSERTs or as Parquet files written
+to the table's external_location followed by a partition sync.
+"""
+
+import argparse
+import random
+import re
+import struct
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time as dtime, timedelta, timezone
+from decimal import Decimal
+from json.encoder import encode_basestring
+
+import bench
+import mixins
+
+class TrinoType:
+    """Parsed Trino type, e.g. 'map(varchar, integer)' or 'timestamp(6) with time zone'."""
+
+    def __init__(self, name, params=(), text=None):
+        self.name = name
+        self.params = list(params)
+        self.text = text or name
+
+    def __repr__(self):
+        return self.text
+
+    @classmethod
+    def parse(cls, text):
+        tokens = re.findall(r'"[^"]*"|\w+|[(),]', text.lower())
+        pos = 0
+
+        def parse():
+            nonlocal pos
+            name = tokens[pos]
+            pos += 1
+            params = []
+            if pos < len(tokens) and tokens[pos] == '(':
+                pos += 1
+                while tokens[pos] != ')':
+                    if name == 'row':
+                        field = tokens[pos].strip('"')
+                        pos += 1
+                        params.append((field, parse()))
+                    elif tokens[pos].isdigit():
+                        params.append(int(tokens[pos]))
+                        pos += 1
+                    else:
+                        params.append(parse())
+                    if tokens[pos] == ',':
+                        pos += 1
+                pos += 1
+            while pos + 2 < len(tokens) and tokens[pos] in ('with', 'without') and tokens[pos+1:pos+3] == ['time', 'zone']:
+                if tokens[pos] == 'with':
+                    name += ' with time zone'
+                pos += 3
+            return cls(name, params)
+
+        parsed = parse()
+        parsed.text = text
+        return parsed
+
+    def sql(self):
+        if self.name == 'row':
+            return f"row({', '.join(f'{n} {t.sql()}' for n, t in self.params)})"
+        if self.params:
+            inner = ', '.join(p.sql() if isinstance(p, TrinoType) else str(p) for p in self.params)
+            base, _, suffix = self.name.partition(' ')
+            return f"{base}({inner}){' ' + suffix if suffix else ''}"
+        return self.name
+
+class DataGenerator:
+    """
+    Seeded generator of table rows for a list of (column, TrinoType). Row i only depends on the
+    seed and on its batch, so any batch can be regenerated on its own (e.g. to verify a load).
+    DATE columns spread the rows over consecutive days, so partitions are filled one after the
+    other, and timestamps fall on the day of their row. The optional key column holds the row
+    number instead of a random value, so that results can be ordered like the generated rows.
+    """
+    alphabet = mixins.Consts.range("AZ", "az", "09") + mixins.Consts.accents + mixins.Consts.symbols + "'"
+
+    def __init__(self, columns, rows, seed=0, batchSize=1000, days=365, start=date(2024, 1, 1), key=None):
+        self.columns = columns
+        self.key = key
+        self.rows = rows
+        self.seed = seed
+        self.batchSize = batchSize
+        self.days = days
+        self.start = start
+
+    @property
+    def batchCount(self):
+        return -(-self.rows // self.batchSize)
+
+    def batches(self):
+        for k in range(self.batchCount):
+            yield self.batch(k)
+
+    def batch(self, k):
+        rng = random.Random(f'{self.seed}:{k}')
+        last = min((k + 1) * self.batchSize, self.rows)
+        return [tuple(i if n == self.key else self.value(t, rng, i) for n, t in self.columns)
+                for i in range(k * self.batchSize, last)]
+
+    def iterRows(self):
+        for batch in self.batches():
+            yield from batch
+
+    def day(self, i):
+        return self.start + timedelta(days=i * self.days // self.rows)
+
+    def value(self, t, rng, i):
+        name = t.name
+        if name == 'tinyint':
+            return rng.randint(-2**7, 2**7-1)
+        if name == 'smallint':
+            return rng.randint(-2**15, 2**15-1)
+        if name in ('integer', 'int'):
+            return rng.randint(-2**31, 2**31-1)
+        if name == 'bigint':
+            return rng.randint(-2**63, 2**63-1)
+        if name == 'boolean':
+            return rng.random() < .5
+        if name == 'real':
+            # round to the closest float32, the value Trino stores and returns
+            return struct.unpack('f', struct.pack('f', rng.uniform(-1e6, 1e6)))[0]
+        if name == 'double':
+            return rng.uniform(-1e9, 1e9)
+        if name == 'decimal':
+            precision, scale = t.params
+            return Decimal(rng.randrange(-10**precision + 1, 10**precision)).scaleb(-scale)
+        if name == 'varchar':
+            return ''.join(rng.choices(self.alphabet, k=rng.randint(0, 32)))
+        if name == 'char':
+            return ''.join(rng.choices(self.alphabet, k=rng.randint(0, t.params[0]))).rstrip(' ')
+        if name == 'varbinary':
+            return rng.randbytes(rng.randint(0, 16))
+        if name == 'array':
+            return [self.value(t.params[0], rng, i) for _ in range(rng.randint(0, 5))]
+        if name == 'map':
+            keys = {self.value(t.params[0], rng, i) for _ in range(rng.randint(0, 3))}
+            return {k: self.value(t.params[1], rng, i) for k in sorted(keys)}
+        if name == 'row':
+            return tuple(self.value(f, rng, i) for _, f in t.params)
+        if name == 'date':
+            return self.day(i)
+        if name in ('timestamp', 'timestamp with time zone'):
+            precision = t.params[0] if t.params else 3
+            micros = rng.randrange(86400 * 10**6)
+            micros -= micros % 10**(6 - min(precision, 6))
+            value = datetime.combine(self.day(i), dtime()) + timedelta(microseconds=micros)
+            return value.replace(tzinfo=timezone.utc) if name.endswith('zone') else value
+        if name == 'time':
+            precision = t.params[0] if t.params else 3
+            micros = rng.randrange(86400 * 10**6)
+            micros -= micros % 10**(6 - min(precision, 6))
+            return (datetime.min + timedelta(microseconds=micros)).time()
+        if name == 'uuid':
+            return uuid.UUID(int=rng.getrandbits(128), version=4)
+        raise RuntimeError(f'Unsupported type: {t}')
+
+def literal(t, value):
+    """Renders a generated value as a Trino SQL literal of type t."""
+    name = t.name
+    if name in ('integer', 'int'):
+        return str(value)
+    if name in ('tinyint', 'smallint', 'bigint'):
+        return f"{name.upper()} '{value}'"
+    if name == 'boolean':
+        return 'true' if value else 'false'
+    if name in ('real', 'double'):
+        return f"{name.upper()} '{value!r}'"
+    if name == 'decimal':
+        return f"CAST(DECIMAL '{value}' AS {t.sql()})"
+    if name == 'varchar':
+        return "'" + value.replace("'", "''") + "'"
+    if name == 'char':
+        return "CHAR '" + value.replace("'", "''") + "'"
+    if name == 'varbinary':
+        return f"X'{value.hex()}'"
+    if name == 'array':
+        return f"CAST(ARRAY[{', '.join(literal(t.params[0], v) for v in value)}] AS {t.sql()})"
+    if name == 'map':
+        keys = ', '.join(literal(t.params[0], k) for k in value)
+        values = ', '.join(literal(t.params[1], v) for v in value.values())
+        return f"CAST(MAP(ARRAY[{keys}], ARRAY[{values}]) AS {t.sql()})"
+    if name == 'row':
+        return f"CAST(ROW({', '.join(literal(f, v) for (_, f), v in zip(t.params, value))}) AS {t.sql()})"
+    if name == 'date':
+        return f"DATE '{value.isoformat()}'"
+    if name == 'timestamp':
+        return f"TIMESTAMP '{value:%Y-%m-%d %H:%M:%S.%f}'"
+    if name == 'timestamp with time zone':
+        return f"TIMESTAMP '{value.astimezone(timezone.utc):%Y-%m-%d %H:%M:%S.%f} UTC'"
+    if name == 'time':
+        return f"TIME '{value:%H:%M:%S.%f}'"
+    if name == 'uuid':
+        return f"UUID '{value}'"
+    raise RuntimeError(f'Unsupported type: {t}')
+
+def arrowType(t):
+    import pyarrow as pa
+
+    name = t.name
+    simple = {
+        'tinyint': pa.int8(), 'smallint': pa.int16(), 'integer': pa.int32(), 'int': pa.int32(),
+        'bigint': pa.int64(), 'boolean': pa.bool_(), 'real': pa.float32(), 'double': pa.float64(),
+        'varchar': pa.string(), 'char': pa.string(), 'varbinary': pa.binary(), 'date': pa.date32(),
+        'time': pa.time64('us'), 'timestamp': pa.timestamp('us'),
+        'timestamp with time zone': pa.timestamp('us', tz='UTC'),
+    }
+    if name in simple:
+        return simple[name]
+    if name == 'decimal':
+        return pa.decimal128(*t.params)
+    if name == 'array':
+        return pa.list_(arrowType(t.params[0]))
+    if name == 'map':
+        return pa.map_(arrowType(t.params[0]), arrowType(t.params[1]))
+    if name == 'row':
+        return pa.struct([(n, arrowType(f)) for n, f in t.params])
+    raise RuntimeError(f'Unsupported Parquet type: {t}')
+
+def arrowValue(t, value):
+    if t.name == 'map':
+        return [(k, arrowValue(t.params[1], v)) for k, v in value.items()]
+    if t.name == 'row':
+        return {n: arrowValue(f, v) for (n, f), v in zip(t.params, value)}
+    if t.name == 'array':
+        return [arrowValue(t.params[0], v) for v in value]
+    return value
+
+HASH_MASK = 2**64 - 1
+INTEGERS = ('tinyint', 'smallint', 'integer', 'int', 'bigint')
+# xxhash64 primes
+XXH_PRIMES = (11400714785074694791, 14029467366897019727, 1609587929392839161, 9650029242287828579, 2870177450012600261)
+
+def jsonSupported(t):
+    """Whether json_format(CAST(value AS JSON)) of a value of type t can be rendered by jsonFormatter."""
+    if t.name in ('array', 'map'):
+        return all(jsonSupported(p) for p in t.params)
+    if t.name == 'row':
+        return all(jsonSupported(f) for _, f in t.params)
+    return t.name in INTEGERS or t.name in ('boolean', 'varchar')
+
+def jsonFormatter(t):
+    """
+    Function rendering a value of type t as json_format(CAST(value AS JSON)) does in Trino:
+    compact, ROW as an object of its fields, MAP as an object sorted by key, strings with the
+    non-ASCII characters unescaped. Built once per type, applied to every value of a column.
+    """
+    name = t.name
+    if name in INTEGERS:
+        render = str
+    elif name == 'boolean':
+        render = lambda v: 'true' if v else 'false'
+    elif name == 'varchar':
+        render = encode_basestring
+    elif name == 'array':
+        element = jsonFormatter(t.params[0])
+        render = lambda v: '[' + ','.join(map(element, v)) + ']'
+    elif name == 'map':
+        key, value = jsonFormatter(t.params[0]), jsonFormatter(t.params[1])
+        # JSON keys are the text of the map keys, sorted as text
+        text = (lambda k: k) if t.params[0].name == 'varchar' else key
+        render = lambda v: '{' + ','.join(f'{encode_basestring(k)}:{value(x)}'
+                                          for k, x in sorted((text(k), x) for k, x in v.items())) + '}'
+    elif name == 'row':
+        fields = [(encode_basestring(n), jsonFormatter(f)) for n, f in t.params]
+        render = lambda v: '{' + ','.join(f'{n}:{f(x)}' for (n, f), x in zip(fields, v)) + '}'
+    else:
+        raise RuntimeError(f'Unsupported JSON type: {t}')
+    return lambda v: 'null' if v is None else render(v)
+
+def hashSql(column, t):
+    """
+    Trino expression of the VARBINARY a column value is hashed from, None if the type has no
+    hashed form: big-endian integers, IEEE 754 floating points, text of the temporal, decimal
+    and uuid types as CAST to VARCHAR renders it, and JSON text of ARRAY, MAP and ROW values.
+    """
+    name = t.name
+    if name in INTEGERS:
+        return f'to_big_endian_64({column})'
+    if name == 'boolean':
+        return f'to_big_endian_64(IF({column}, 1, 0))'
+    if name == 'real':
+        return f'to_ieee754_32({column})'
+    if name == 'double':
+        return f'to_ieee754_64({column})'
+    if name == 'varbinary':
+        return column
+    if name == 'char':
+        return f'to_utf8(rtrim(CAST({column} AS VARCHAR)))'
+    if name == 'timestamp with time zone':
+        return f"to_utf8(CAST({column} AT TIME ZONE 'UTC' AS VARCHAR))"
+    if name in ('varchar', 'decimal', 'date', 'timestamp', 'time', 'uuid'):
+        return f'to_utf8(CAST({column} AS VARCHAR))'
+    if name in ('array', 'map', 'row') and jsonSupported(t):
+        return f'to_utf8(json_format(CAST({column} AS JSON)))'
+    return None
+
+def fraction(value, precision):
+    micros = f'{value.microsecond:06d}'
+    return f".{(micros + '0' * precision)[:precision]}" if precision else ''
+
+def xxh64(data, offsets):
+    """
+    xxhash64 (seed 0) of every data[offsets[k]:offsets[k + 1]] as unsigned 64 bit integers,
+    computed by numpy for all the values at once: each step of the algorithm (32 byte stripe,
+    8 byte lane, 4 byte lane, byte) is applied to the values that still have that many bytes.
+    """
+    import numpy as np
+
+    P1, P2, P3, P4, P5 = (np.uint64(p) for p in XXH_PRIMES)
+    rotl = lambda x, r: (x << np.uint64(r)) | (x >> np.uint64(64 - r))
+    mix = lambda acc, lane: rotl(acc + lane * P2, 31) * P1
+    offsets = np.asarray(offsets, np.int64)
+    start, length = offsets[:-1], np.diff(offsets)
+    # unaligned little-endian words at every byte offset, so that a lane of all the values is one gather
+    padded = np.concatenate([np.asarray(data, np.uint8), np.zeros(8, np.uint8)])
+    words = np.ndarray((len(padded) - 7,), '<u8', padded, strides=(1,))
+    halves = np.ndarray((len(padded) - 3,), '<u4', padded, strides=(1,))
+    zero = np.uint64(0)
+
+    with np.errstate(over='ignore'):
+        h = np.full(len(length), P5)
+        pos = start.copy()
+        long = np.flatnonzero(length >= 32)
+        if long.size:
+            stripes = length[long] // 32
+            v = [np.full(long.size, P1 + P2), np.full(long.size, P2), np.zeros(long.size, np.uint64), np.full(long.size, zero - P1)]
+            for stripe in range(int(stripes.max())):
+                sel = np.flatnonzero(stripes > stripe)
+                at = pos[long[sel]]
+                for j in range(4):
+                    v[j][sel] = mix(v[j][sel], words[at + 8 * j])
+                pos[long[sel]] += 32
+            acc = rotl(v[0], 1) + rotl(v[1], 7) + rotl(v[2], 12) + rotl(v[3], 18)
+            for j in range(4):
+                acc = (acc ^ mix(zero, v[j])) * P1 + P4
+            h[long] = acc
+        h += length.astype(np.uint64)
+        end = start + length
+        while (sel := np.flatnonzero(end - pos >= 8)).size:
+            h[sel] = rotl(h[sel] ^ mix(zero, words[pos[sel]]), 27) * P1 + P4
+            pos[sel] += 8
+        sel = np.flatnonzero(end - pos >= 4)
+        h[sel] = rotl(h[sel] ^ halves[pos[sel]].astype(np.uint64) * P1, 23) * P2 + P3
+        pos[sel] += 4
+        while (sel := np.flatnonzero(end > pos)).size:
+            h[sel] = rotl(h[sel] ^ padded[pos[sel]].astype(np.uint64) * P5, 11) * P1
+            pos[sel] += 1
+        h ^= h >> np.uint64(33)
+        h *= P2
+        h ^= h >> np.uint64(29)
+        h *= P3
+        h ^= h >> np.uint64(32)
+    return h
+
+def hashValues(t, values):
+    """
+    xxhash64 of the non-NULL values as unsigned 64 bit integers, as hashed by hashSql on the
+    server. The payloads are laid out in one buffer, by numpy for the fixed width types and by
+    pyarrow casts and string kernels for the text of the others, and hashed at once by xxh64.
+    """
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    values = [v for v in values if v is not None]
+    name = t.name
+    precision = t.params[0] if t.params else 3
+    if name in INTEGERS or name in ('boolean', 'real', 'double'):
+        dtype, width = {'real': ('>f4', 4), 'double': ('>f8', 8)}.get(name, ('>i8', 8))
+        return xxh64(np.frombuffer(np.asarray(values, dtype=dtype).tobytes(), np.uint8), np.arange(len(values) + 1) * width)
+
+    def fractions(text, length):
+        """text (with 6 fractional digits) cut or padded with zeros to precision fractional digits."""
+        text = pc.utf8_slice_codeunits(text, 0, length + (precision > 0) + min(precision, 6))
+        return pc.binary_join_element_wise(text, pa.scalar('0' * (precision - 6), text.type), pa.scalar('', text.type)) if precision > 6 else text
+
+    if name in ('varbinary', 'varchar'):
+        payloads = pa.array(values, pa.large_binary() if name == 'varbinary' else pa.large_string())
+    elif name == 'char':
+        payloads = pc.utf8_rtrim(pa.array(values, pa.large_string()), characters=' ')
+    elif name == 'decimal':
+        payloads = pa.array(values, arrowType(t)).cast(pa.large_string())
+    elif name == 'date':
+        payloads = pa.array(values, pa.date32()).cast(pa.large_string())
+    elif name == 'timestamp':
+        payloads = fractions(pa.array(values, pa.timestamp('us')).cast(pa.large_string()), 19)
+    elif name == 'timestamp with time zone':
+        # converted to UTC by pyarrow
+        text = fractions(pa.array(values, pa.timestamp('us')).cast(pa.large_string()), 19)
+        payloads = pc.binary_join_element_wise(text, pa.scalar(' UTC', text.type), pa.scalar('', text.type))
+    elif name == 'time':
+        payloads = fractions(pa.array(values, pa.time64('us')).cast(pa.large_string()), 8)
+    elif name == 'uuid':
+        # the 36 characters of the canonical form, from the hex digits of the 16 bytes
+        raw = np.frombuffer(b''.join(v.bytes for v in values), np.uint8).reshape(-1, 16)
+        digits = np.frombuffer(b'0123456789abcdef', np.uint8)[np.stack([raw >> 4, raw & 15], axis=2).reshape(-1, 32)]
+        text = np.full((len(values), 36), ord('-'), np.uint8)
+        for src, dst, width in ((0, 0, 8), (8, 9, 4), (12, 14, 4), (16, 19, 4), (20, 24, 12)):
+            text[:, dst:dst + width] = digits[:, src:src + width]
+        return xxh64(text.reshape(-1), np.arange(len(values) + 1) * 36)
+    elif name in ('array', 'map', 'row'):
+        payloads = pa.array(list(map(jsonFormatter(t), values)), pa.large_string())
+    else:
+        raise RuntimeError(f'Unsupported checksum type: {t}')
+    payloads = payloads.cast(pa.large_binary())
+    _, offsets, data = payloads.buffers()
+    offsets = np.frombuffer(offsets, np.int64)[payloads.offset:payloads.offset + len(payloads) + 1]
+    return xxh64(np.frombuffer(data, np.uint8) if data is not None else np.zeros(0, np.uint8), offsets)
+
+class Loader:
+    """
+    Loads generated rows into a table of a test suite class, through batched multi-row INSERTs
+    run concurrently on the suite's TrinoPool, or by writing Parquet files to the
+    external_location of a Hive table followed by system.sync_partition_metadata. The
+    statements run with the session properties of session, if any.
+    """
+
+    def __init__(self, suite, table='table_1', workers=4, session=None):
+        self.suite = suite
+        self.table = table
+        self.workers = workers
+        self.session = session
+
+    @property
+    def qualifiedName(self):
+        return f"{self.suite.catalog}.{self.suite.schemaNm}.{self.table}"
+
+    def query(self, sql):
+        with self.suite.pool.cursor(properties=self.session) as cur:
+            cur.execute(sql)
+            return cur.fetchall()
+
+    def columns(self):
+        rows = self.query(f"DESCRIBE {self.qualifiedName}")
+        return [(row[0], TrinoType.parse(row[1])) for row in rows]
+
+    def properties(self):
+        """Returns the location and the partition columns from SHOW CREATE TABLE."""
+        ddl = self.query(f"SHOW CREATE TABLE {self.qualifiedName}")[0][0]
+        location = re.search(r"(?:external_location|location) = '([^']*)'", ddl)
+        partitions = re.search(r"partitioned_by = ARRAY\[([^\]]*)\]", ddl)
+        return (location.group(1) if location else None,
+                re.findall(r"'([^']*)'", partitions.group(1)) if partitions else [])
+
+    def tableSize(self, location):
+        if location is None or not self.suite.hasS3Credentials():
+            return None
+        key = location.split('://', 1)[1].split('/', 1)[1]
+        return sum(size for _, size in self.suite.listS3Objects(self.suite.s3Client(), key))
+
+    def insert(self, generator):
+        columns = generator.columns
+
+        def load(rows):
+            values = ',\n'.join('(' + ', '.join(literal(t, v) for (_, t), v in zip(columns, row)) + ')' for row in rows)
+            sql = f"INSERT INTO {self.qualifiedName} VALUES\n{values}"
+            self.query(sql)
+            return len(sql)
+
+        sent = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for _, future in mixins.boundedMap(pool, load, generator.batches(), 2 * self.workers):
+                sent += future.result()
+        return {'sqlBytes': sent}
+
+    def parquet(self, generator, location, partitions):
+        import io
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if location is None or not partitions:
+            raise RuntimeError(f'Parquet load requires a partitioned table with an external_location: {self.qualifiedName}')
+        columns = generator.columns
+        data = [(i, n, t) for i, (n, t) in enumerate(columns) if n not in partitions]
+        keys = [i for i, (n, _) in enumerate(columns) if n in partitions]
+        schema = pa.schema([(n, arrowType(t)) for _, n, t in data])
+        bucket, prefix = location.split('://', 1)[1].split('/', 1)
+        if bucket != self.suite.s3Bucket:
+            raise RuntimeError(f'Table location {location} is not in bucket {self.suite.s3Bucket}')
+        s3 = self.suite.s3Client()
+
+        def write(k):
+            groups = {}
+            for row in generator.batch(k):
+                groups.setdefault(tuple(row[i] for i in keys), []).append(row)
+            written, files = 0, 0
+            for values, rows in groups.items():
+                table = pa.table([pa.array([arrowValue(t, row[i]) for row in rows], type=arrowType(t)) for i, _, t in data], schema=schema)
+                buffer = io.BytesIO()
+                pq.write_table(table, buffer)
+                path = '/'.join(f"{columns[i][0]}={v.isoformat() if hasattr(v, 'isoformat') else v}" for i, v in zip(keys, values))
+                s3.put_object(Bucket=bucket, Key=f"{prefix.rstrip('/')}/{path}/part-{generator.seed}-{k:08d}.parquet", Body=buffer.getvalue())
+                written += buffer.tell()
+                files += 1
+            return written, files
+
+        written, files = 0, 0
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for _, future in mixins.boundedMap(pool, write, range(generator.batchCount), 2 * self.workers):
+                size, count = future.result()
+                written += size
+                files += count
+        self.query(f"CALL {self.suite.catalog}.system.sync_partition_metadata('{self.suite.schemaNm}', '{self.table}', 'ADD')")
+        return {'parquetBytes': written, 'files': files}
+
+    def verify(self, generator, batchSize=1000):
+        """
+        Streams the table ordered by the generator key and compares it row by row with the
+        regenerated rows, in constant memory. Returns the RowStream statistics and mismatches.
+        """
+        mismatches = 0
+        with self.suite.pool.cursor() as cur:
+            stream = mixins.RowStream(cur, batchSize)
+            cur.execute(f"SELECT * FROM {self.qualifiedName} ORDER BY {generator.key}")
+            expected = generator.iterRows()
+            for row in stream:
+                types = [column[1] for column in cur.description]
+                exp = next(expected, None)
+                if exp is None or [mixins.normalize(v, t) for v, t in zip(row, types)] != [mixins.normalize(v, t) for v, t in zip(exp, types)]:
+                    mismatches += 1
+                    if mismatches <= 10:
+                        self.suite.logger.warning(f"Row {stream.rows} mismatch: {row} != {exp}")
+            missing = sum(1 for _ in expected)
+        stats = stream.stats()
+        stats.update({'mismatches': mismatches, 'missing': missing})
+        self.suite.logger.info(f"Verified {stats['rows']} rows: {mismatches} mismatches, {missing} missing,"
+                               f" {stats['rowsPerSec'] or 0:.0f} rows/s, peak RSS {stats['peakRss'] >> 20} MB")
+        return stats
+
+    def checksum(self, generator, chunk=1 << 16):
+        """
+        Compares per column the count and the sum modulo 2^64 of the xxhash64 of the values,
+        aggregated by Trino over the table, with the same computed over the regenerated rows.
+        Only a few bytes per column leave the cluster; the sum is split in its high and low 32
+        bits on the server, so that it cannot overflow BIGINT. ARRAY, MAP and ROW values are hashed
+        as JSON text, those with elements of other types than integers, booleans and VARCHAR are
+        skipped. The regenerated rows are hashed chunk rows at a time, vectorized. Returns the per
+        column results and the timings, None offline.
+        """
+        import numpy as np
+
+        if self.suite.offline:
+            # the embedded engine has no xxhash64 nor from_big_endian_64
+            self.suite.logger.warning(f'Checksum of {self.qualifiedName} skipped, not supported offline (use -v)')
+            return None
+        columns = [(i, n, t, hashSql(f'"{n}"', t)) for i, (n, t) in enumerate(generator.columns)]
+        hashed = [(i, n, t, sql) for i, n, t, sql in columns if sql is not None]
+        aggregates = ', '.join(f"count({sql}), sum(bitwise_and(from_big_endian_64(xxhash64({sql})), 4294967295)),"
+                               f" sum(bitwise_right_shift(from_big_endian_64(xxhash64({sql})), 32))"
+                               for _, _, _, sql in hashed)
+        start = time.perf_counter()
+        with self.suite.pool.cursor() as cur:
+            cur.execute(f"SELECT count(*), {aggregates} FROM {self.qualifiedName}")
+            row = cur.fetchall()[0]
+            stats = cur.stats or {}
+        serverTime = time.perf_counter() - start
+
+        start = time.perf_counter()
+        counts = [0] * len(hashed)
+        sums = [np.uint64(0)] * len(hashed)
+        def add(rows):
+            for j, (i, _, t, _) in enumerate(hashed):
+                hashes = hashValues(t, [r[i] for r in rows])
+                counts[j] += len(hashes)
+                sums[j] += hashes.sum(dtype=np.uint64)
+
+        rows = []
+        with np.errstate(over='ignore'):
+            for batch in generator.batches():
+                rows += batch
+                if len(rows) >= chunk:
+                    add(rows)
+                    rows = []
+            add(rows)
+        clientTime = time.perf_counter() - start
+
+        results = []
+        for j, (_, name, t, _) in enumerate(hashed):
+            count, low, high = row[1 + 3 * j:4 + 3 * j]
+            server = ((high or 0) * 2**32 + (low or 0)) & HASH_MASK
+            results.append({'column': name, 'type': t.sql(), 'count': count, 'server': f'{server:016x}',
+                            'client': f'{int(sums[j]):016x}', 'match': count == counts[j] and server == int(sums[j])})
+            if not results[-1]['match']:
+                self.suite.logger.warning(f"Checksum mismatch of {name}: {count} values {server:016x} on the server,"
+                                          f" {counts[j]} values {int(sums[j]):016x} generated")
+        skipped = [n for _, n, _, sql in columns if sql is None]
+        mismatches = sum(not r['match'] for r in results) + (row[0] != generator.rows)
+        self.suite.logger.info(f"Checksums of {row[0]} rows: {len(results)} columns, {mismatches} mismatches,"
+                               f" skipped {', '.join(skipped) or 'none'}, server {serverTime:.1f}s, client {clientTime:.1f}s")
+        return {'rows': row[0], 'columns': results, 'skipped': skipped, 'mismatches': mismatches,
+                'serverTime': serverTime, 'clientTime': clientTime, 'processedBytes': stats.get('processedBytes')}
+
+    def load(self, path, rows, seed=0, batchSize=1000, days=365, key=None):
+        location, partitions = self.properties()
+        generator = DataGenerator(self.columns(), rows, seed, batchSize, days, key=key)
+        before = self.tableSize(location)
+        start = time.perf_counter()
+        if path == 'insert':
+            result = self.insert(generator)
+        elif path == 'parquet':
+            result = self.parquet(generator, location, partitions)
+        else:
+            raise RuntimeError(f'Unsupported load path: {path}')
+        elapsed = time.perf_counter() - start
+        after = self.tableSize(location)
+        result.update({
+            'catalog': self.suite.catalog,
+            'path': path,
+            'rows': rows,
+            'seconds': elapsed,
+            'rowsPerSec': rows / elapsed if elapsed > 0 else None,
+            'bytes': after - before if after is not None else None,
+        })
+        result['bytesPerSec'] = result['bytes'] / elapsed if result['bytes'] and elapsed > 0 else None
+        self.suite.logger.info(f"Loaded {rows} rows into {self.qualifiedName} via {path} at {result['rowsPerSec']:.0f} rows/s")
+        return result, generator
+
+class DataReport(bench.Report):
+    columns = ['catalog', 'path', 'rows', 'seconds', 'rowsPerSec', 'bytes', 'bytesPerSec', 'files']
+    dimensions = ['path', 'rows']
+
+    def table(self):
+        lines = [f"{'catalog':<10} {'path':<8} {'rows':>12} {'seconds':>9} {'rows/s':>12} {'bytes':>14} {'bytes/s':>14}"]
+        for r in self.results:
+            lines.append(f"{r['catalog']:<10} {r['path']:<8} {r['rows']:>12} {r['seconds']:>9.1f} {r['rowsPerSec'] or 0:>12.0f}"
+                         f" {r['bytes'] or 0:>14} {r['bytesPerSec'] or 0:>14.0f}")
+        return '\n'.join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('suites', nargs='*', default=['test_s3', 'test_hive', 'test_iceberg'],
+                        help='test modules whose table_1 to load')
+    parser.add_argument('-r', '--rows', type=int, default=1000000, help='rows to generate')
+    parser.add_argument('-b', '--batch', type=int, default=1000, help='rows per INSERT or Parquet batch')
+    parser.add_argument('-d', '--days', type=int, default=365, help='days the DATE columns spread over')
+    parser.add_argument('-s', '--seed', type=int, default=0, help='seed of the dataset')
+    parser.add_argument('-p', '--path', choices=['insert', 'parquet'], action='append',
+                        help='load path(s), default insert')
+    parser.add_argument('-w', '--workers', type=int, default=4, help='concurrent batches')
+    parser.add_argument('-K', '--key', default='c_int', help='integer column holding the row number')
+    parser.add_argument('-v', '--verify', action='store_true', help='stream the table back and verify every row')
+    parser.add_argument('-c', '--checksum', action='store_true', help='verify per column hash aggregates computed by Trino')
+    parser.add_argument('-k', '--keep', action='store_true', help='keep the schema and its data')
+    parser.add_argument('-o', '--output', default='private/bench', help='report directory')
+    args = parser.parse_args()
+
+    report = DataReport('datagen', rows=args.rows, batch=args.batch, days=args.days, seed=args.seed)
+    for suite in bench.suites(args.suites):
+        suite.setUpTrait()
+        try:
+            for path in args.path or ['insert']:
+                loader = Loader(suite, table=f'table_{path}', workers=args.workers)
+                with suite.pool.cursor() as cur:
+                    cur.execute(f"CREATE SCHEMA IF NOT EXISTS {suite.catalog}.{suite.schemaNm}")
+                    cur.fetchall()
+                    cur.execute(suite.createTableSql().replace('table_1', loader.table))
+                    cur.fetchall()
+                result, generator = loader.load(path, args.rows, args.seed, args.batch, args.days, args.key)
+                if args.verify:
+                    result['verify'] = loader.verify(generator, args.batch)
+                if args.checksum:
+                    result['checksum'] = loader.checksum(generator)
+                report.add(result)
+        finally:
+            if args.keep:
+                suite.logger.warning(f"Keep schema {suite.catalog}.{suite.schemaNm}")
+                suite.pool.release(suite.conn)
+            else:
+                suite.tearDownTrait()
+    print(report.table())
+    print(f'Report: {report.write(args.output)}.{{json,csv}}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+File format and compression codec matrix on the table_1 data of the suites: the same generated
+rows are written once per format and codec, then full scans, single-column projections and a
+selective filter are timed on each copy, with the bytes read and the storage footprint on S3.
+"""
+
+import argparse
+import time
+
+import bench
+from datagen import Loader
+from workload import CONNECTORS, FORMATS
+from writes import dataFiles
+
+CODECS = ['NONE', 'SNAPPY', 'LZ4', 'ZSTD', 'GZIP']
+KINDS = ['integer', 'double', 'varchar', 'array', 'map', 'row']
+
+class FormatReport(bench.Report):
+    columns = ['catalog', 'format', 'codec', 'query', 'samples', 'p50', 'p95', 'p99', 'physicalInputBytes',
+               'storedBytes', 'files', 'ratio', 'writeSeconds']
+    dimensions = ['format', 'codec', 'query']
+
+    def table(self):
+        lines = [f"{'catalog':<8} {'format':<8} {'codec':<7} {'query':<16} {'p50 ms':>9} {'read MiB':>9} {'stored MiB':>10}"
+                 f" {'files':>6} {'ratio':>6} {'write s':>8}"]
+        for r in self.results:
+            lines.append(f"{r['catalog']:<8} {r['format']:<8} {r['codec']:<7} {r['query']:<16} {r['p50']*1e3:>9.1f}"
+                         f" {(r['physicalInputBytes'] or 0)/2**20:>9.2f} {(r['storedBytes'] or 0)/2**20:>10.2f}"
+                         f" {r['files'] or 0:>6} {r['ratio'] or 0:>6.2f} {r['writeSeconds']:>8.1f}")
+        return '\n'.join(lines)
+
+class FormatMatrix:
+    """
+    Loads rows of generated data into the table_1 of a suite class (datagen.Loader), copies it
+    with INSERT ... SELECT into one table per file format and compression codec (the codec is
+    the compression_codec session property of the catalog during the copy), and times the
+    queries on each copy with bench.Benchmark. Combinations the connector rejects, e.g. LZ4 for
+    PARQUET, are skipped. The storage footprint is the size of the data files under the table
+    location, the ratio is relative to the NONE codec of the same format.
+    """
+
+    def __init__(self, suite, rows, formats=None, codecs=None, loadPath='insert', warmup=1, repeat=5):
+        self.suite = suite
+        self.rows = rows
+        self.formats = formats or FORMATS[CONNECTORS[suite.catalog]]
+        self.codecs = codecs or CODECS
+        self.loadPath = loadPath
+        self.warmup = warmup
+        self.repeat = repeat
+
+    def queries(self, table, columns, key):
+        """Full scan, one projection per column kind and a filter on 1% of the key range."""
+        # the embedded engine has no checksum, count still reads the column
+        aggregate = 'count' if self.suite.offline else 'checksum'
+        scan = ', '.join(f'{aggregate}({name})' for name, _ in columns)
+        queries = [('full_scan', f'SELECT {scan} FROM {table}')]
+        for kind in KINDS:
+            name = next((name for name, t in columns if t.name == kind), None)
+            if name is not None:
+                queries.append((f'project_{name}', f'SELECT {aggregate}({name}) FROM {table}'))
+        queries.append(('filter', f'SELECT {scan} FROM {table} WHERE {key} < {max(self.rows // 100, 1)}'))
+        return queries
+
+    def footprint(self, loader):
+        sizes = dataFiles(self.suite, loader.properties()[0])
+        return (sum(sizes), len(sizes)) if sizes is not None else (None, None)
+
+    def copy(self, timer, source, table, codec):
+        suite = self.suite
+        if suite.offline:
+            suite.logger.warning(f'Codecs are ignored offline, {table} is written with the default codec')
+        else:
+            timer.execute(f"SET SESSION {suite.catalog}.compression_codec = '{codec}'")
+        try:
+            start = time.perf_counter()
+            timer.execute(f'INSERT INTO {table} SELECT * FROM {source}')
+            return time.perf_counter() - start
+        finally:
+            if not suite.offline:
+                timer.execute(f'RESET SESSION {suite.catalog}.compression_codec')
+
+    def run(self, report, key='c_int'):
+        suite = self.suite
+        suite.setUpTrait()
+        try:
+            timer = bench.Benchmark(suite, self.warmup, self.repeat)
+            timer.execute(f"CREATE SCHEMA IF NOT EXISTS {suite.catalog}.{suite.schemaNm}")
+            timer.execute(suite.createTableSql())
+            source = Loader(suite, 'table_1')
+            source.load(self.loadPath, self.rows, key=key)
+            for format in self.formats:
+                baseline = None
+                for codec in self.codecs:
+                    name = f'table_1_{format.lower()}_{codec.lower()}'
+                    loader = Loader(suite, name)
+                    ddl = (suite.createTableSql().replace('table_1', name).replace("format='PARQUET'", f"format='{format}'")
+                           .replace('/parquet/', f'/{format.lower()}_{codec.lower()}/'))
+                    try:
+                        timer.execute(ddl)
+                        written = self.copy(timer, source.qualifiedName, loader.qualifiedName, codec)
+                    except Exception as e:
+                        suite.logger.warning(f'Skip {format}/{codec}: {e}')
+                        timer.execute(f'DROP TABLE IF EXISTS {loader.qualifiedName}')
+                        continue
+                    stored, files = self.footprint(loader)
+                    baseline = stored if codec == 'NONE' else baseline
+                    suite.logger.info(f'{format}/{codec}: {stored} bytes in {files} files, written in {written:.1f}s')
+                    columns = [(n, t) for n, t in loader.columns() if n not in loader.properties()[1]]
+                    for query, sql in self.queries(loader.qualifiedName, columns, key):
+                        result = timer.measure(f'{format}/{codec}/{query}', sql)
+                        result.update({'format': format, 'codec': codec, 'query': query, 'storedBytes': stored,
+                                       'files': files, 'writeSeconds': written,
+                                       'ratio': stored / baseline if stored and baseline else None})
+                        report.add(result)
+        finally:
+            suite.tearDownTrait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('suites', nargs='*', default=['test_hive', 'test_iceberg'], help='test modules whose table_1 to use')
+    parser.add_argument('-r', '--rows', type=int, default=1000000, help='rows to generate')
+    parser.add_argument('-f', '--format', action='append', help='file format(s), default all supported by the catalog')
+    parser.add_argument('-c', '--codec', action='append', help=f"compression codec(s), default {','.join(CODECS)}")
+    parser.add_argument('-p', '--path', choices=['insert', 'parquet'], default='insert', help='load path of the source rows')
+    parser.add_argument('-w', '--warmup', type=int, default=1, help='untimed runs per query')
+    parser.add_argument('-n', '--repeat', type=int, default=5, help='timed runs per query')
+    parser.add_argument('-o', '--output', default='private/bench', help='report directory')
+    args = parser.parse_args()
+
+    report = FormatReport('formats', rows=args.rows, warmup=args.warmup, repeat=args.repeat)
+    for suite in bench.suites(args.suites):
+        FormatMatrix(suite, args.rows, args.format, args.codec, args.path, args.warmup, args.repeat).run(report)
+    print(report.table())
+    print(f'Report: {report.write(args.output)}.{{json,csv}}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+History of the benchmark runs and regression check. Every report written by the benchmark
+tools is appended to private/bench/history.sqlite with the git commit of the tree and the
+cluster it ran against; compare tests the latency and bytes scanned samples of a candidate
+commit against a baseline commit with a one-sided Mann-Whitney U test.
+"""
+
+import argparse
+import json
+import math
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import closing
+
+METRICS = ['latency', 'physicalInputBytes']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs(
+    id INTEGER PRIMARY KEY, name TEXT, started TEXT, recorded TEXT, commitId TEXT, target TEXT, trino TEXT, s3 TEXT,
+    offline INTEGER, params TEXT
+);
+CREATE TABLE IF NOT EXISTS samples(run INTEGER REFERENCES runs(id), catalog TEXT, key TEXT, metric TEXT, value REAL);
+CREATE INDEX IF NOT EXISTS samplesRun ON samples(run);
+"""
+
+def commitId():
+    """Short commit of the tree, with a +dirty suffix for uncommitted changes, None outside git."""
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=cwd, capture_output=True, text=True, check=True).stdout.strip()
+        status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=cwd, capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f'{commit}+dirty' if status.strip() else commit
+
+def cluster():
+    """Target of private/config.ini the process ran against, if the session settings were loaded."""
+    import mixins
+
+    settings = mixins.Session.cached or {}
+    return {
+        'target': settings.get('targetEnv'),
+        'trino': 'embedded' if settings.get('offline') else
+                 f"{settings['trinoScheme']}://{settings['trinoHost']}:{settings['trinoPort']}" if settings else None,
+        's3': f"{settings.get('s3Endpoint')}/{settings.get('s3Bucket')}" if settings else None,
+        'offline': settings.get('offline'),
+    }
+
+def samples(result):
+    """Samples of each metric of a report result: the timed runs when kept, else its single value."""
+    latencies = result.get('latencies') or [result[k] for k in ('p50', 'seconds') if result.get(k) is not None][:1]
+    physical = result.get('physicalSamples') or ([result['physicalInputBytes']] if result.get('physicalInputBytes') is not None else [])
+    return {'latency': latencies, 'physicalInputBytes': physical}
+
+def connect(path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    db = sqlite3.connect(path)
+    db.executescript(SCHEMA)
+    return db
+
+def record(path, report):
+    """Appends the results of a bench.Report, keyed by catalog and the report's dimensions."""
+    config = cluster()
+    with closing(connect(path)) as db, db:
+        run = db.execute('INSERT INTO runs(name, started, recorded, commitId, target, trino, s3, offline, params)'
+                         ' VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                         (report.name, report.started, time.strftime('%Y-%m-%dT%H:%M:%S'), commitId(), config['target'],
+                          config['trino'], config['s3'], config['offline'], json.dumps(report.params, default=str))).lastrowid
+        rows = []
+        for result in report.results:
+            key = '/'.join(json.dumps(result[d], sort_keys=True) if isinstance(result.get(d), dict) else str(result.get(d))
+                           for d in report.dimensions)
+            for metric, values in samples(result).items():
+                rows += [(run, result.get('catalog'), key, metric, float(v)) for v in values if v is not None]
+        db.executemany('INSERT INTO samples VALUES (?, ?, ?, ?, ?)', rows)
+    return run
+
+def mannWhitney(baseline, candidate):
+    """
+    One-sided p-value of the candidate values being stochastically larger than the baseline
+    ones. Exact distribution of U without ties for small samples, normal approximation with tie
+    and continuity corrections otherwise.
+    """
+    n1, n2 = len(candidate), len(baseline)
+    values = sorted([(v, 0) for v in candidate] + [(v, 1) for v in baseline])
+    ranks, ties, i = [0.0] * len(values), [], 0
+    while i < len(values):
+        j = i
+        while j + 1 < len(values) and values[j + 1][0] == values[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        ties.append(j - i + 1)
+        i = j + 1
+    # pairs (candidate, baseline) with the candidate larger, ties count half
+    u = sum(r for r, (_, group) in zip(ranks, values) if group == 0) - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    if max(ties) == 1 and n <= 40:
+        counts = exactU(n1, n2)
+        return sum(counts[math.ceil(u):]) / math.comb(n, n1)
+    variance = n1 * n2 / 12 * ((n + 1) - sum(t**3 - t for t in ties) / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+    z = (u - n1 * n2 / 2 - 0.5) / math.sqrt(variance)
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+def exactU(n1, n2):
+    """
+    Number of orderings of n1 candidate and n2 baseline distinct values for each value of U:
+    the largest value is either a candidate one, larger than the n baseline ones, or a baseline one.
+    """
+    table = {(0, n): [1] for n in range(n2 + 1)}
+    for m in range(1, n1 + 1):
+        table[(m, 0)] = [1]
+        for n in range(1, n2 + 1):
+            shifted = [0] * n + table[(m - 1, n)]
+            previous = table[(m, n - 1)]
+            size = max(len(shifted), len(previous))
+            table[(m, n)] = [(shifted[k] if k < len(shifted) else 0) + (previous[k] if k < len(previous) else 0) for k in range(size)]
+    return table[(n1, n2)]
+
+class History:
+    def __init__(self, path):
+        self.db = connect(path)
+
+    def runs(self, name=None, limit=20):
+        sql = 'SELECT id, name, started, commitId, target, trino, (SELECT count(*) FROM samples WHERE run = runs.id) FROM runs'
+        args = ()
+        if name:
+            sql, args = sql + ' WHERE name = ?', (name,)
+        return self.db.execute(f'{sql} ORDER BY id DESC LIMIT {int(limit)}', args).fetchall()
+
+    def resolve(self, spec, name=None, target=None, exclude=None):
+        """Run ids of a spec: #<run id>, latest, previous (latest other commit than exclude) or a commit (prefix)."""
+        where, args = ['1 = 1'], []
+        if name:
+            where.append('name = ?')
+            args.append(name)
+        if target is not None:
+            where.append('trino IS ?')
+            args.append(target)
+        runs = self.db.execute(f"SELECT id, commitId, trino FROM runs WHERE {' AND '.join(where)} ORDER BY id DESC", args).fetchall()
+        if spec.startswith('#'):
+            runs = [r for r in runs if str(r[0]) == spec[1:]]
+            commit = runs[0][1] if runs else None
+        elif spec in ('latest', 'previous'):
+            others = [r for r in runs if spec == 'latest' or r[1] != exclude]
+            commit = others[0][1] if others else None
+            runs = [r for r in runs if r[1] == commit]
+        else:
+            exact = [r for r in runs if r[1] == spec]
+            runs = exact or [r for r in runs if (r[1] or '').startswith(spec)]
+            commit = runs[0][1] if runs else None
+            runs = [r for r in runs if r[1] == commit]
+        if not runs:
+            raise SystemExit(f'No run matches {spec}')
+        return [r[0] for r in runs], commit, runs[0][2]
+
+    def samples(self, runs, metrics):
+        marks = ','.join('?' * len(runs))
+        grouped = {}
+        for name, catalog, key, metric, value in self.db.execute(
+                f'SELECT name, catalog, key, metric, value FROM samples JOIN runs ON runs.id = samples.run'
+                f' WHERE run IN ({marks}) AND metric IN ({",".join("?" * len(metrics))})', [*runs, *metrics]):
+            grouped.setdefault((name, catalog, key, metric), []).append(value)
+        return grouped
+
+    def compare(self, baseline='previous', candidate='latest', name=None, metrics=METRICS, alpha=0.01, threshold=0.05, minSamples=3):
+        """
+        Compares the pooled samples of the candidate and baseline runs per benchmark, catalog,
+        key and metric. A change is flagged when the one-sided test is significant at alpha and
+        the medians differ by more than threshold, both are needed for repeated samples of a
+        noisy latency to be told apart from a shift that matters.
+        """
+        candidateRuns, candidateCommit, trino = self.resolve(candidate, name)
+        baselineRuns, baselineCommit, _ = self.resolve(baseline, name, trino, exclude=candidateCommit)
+        before, after = self.samples(baselineRuns, metrics), self.samples(candidateRuns, metrics)
+        results = []
+        for group in sorted(set(before) & set(after), key=lambda g: tuple(str(v) for v in g)):
+            base, cand = before[group], after[group]
+            result = dict(zip(['name', 'catalog', 'key', 'metric'], group), baseline=statistics.median(base),
+                          candidate=statistics.median(cand), baselineSamples=len(base), candidateSamples=len(cand))
+            result['change'] = result['candidate'] / result['baseline'] - 1 if result['baseline'] else None
+            if min(len(base), len(cand)) < minSamples:
+                result.update(pValue=None, status='few samples')
+            else:
+                worse, better = mannWhitney(base, cand), mannWhitney(cand, base)
+                change = result['change'] or 0
+                if worse < alpha and change > threshold:
+                    result.update(pValue=worse, status='REGRESSED')
+                elif better < alpha and change < -threshold:
+                    result.update(pValue=better, status='improved')
+                else:
+                    result.update(pValue=min(worse, better), status='ok')
+            results.append(result)
+        return {'baseline': baselineCommit, 'baselineRuns': baselineRuns, 'candidate': candidateCommit,
+                'candidateRuns': candidateRuns, 'results': results}
+
+def table(comparison):
+    lines = [f"baseline {comparison['baseline']} (runs {comparison['baselineRuns']}),"
+             f" candidate {comparison['candidate']} (runs {comparison['candidateRuns']})",
+             f"{'benchmark':<10} {'catalog':<8} {'key':<32} {'metric':<18} {'baseline':>12} {'candidate':>12} {'change':>8} {'p':>8}  status"]
+    for r in comparison['results']:
+        p = f"{r['pValue']:.4f}" if r['pValue'] is not None else '-'
+        change = f"{r['change']*100:+.1f}%" if r['change'] is not None else '-'
+        lines.append(f"{r['name']:<10} {r['catalog'] or '-':<8} {r['key'][:32]:<32} {r['metric']:<18} {r['baseline']:>12.4g}"
+                     f" {r['candidate']:>12.4g} {change:>8} {p:>8}  {r['status']}")
+    return '\n'.join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-d', '--db', default='private/bench/history.sqlite', help='history database')
+    commands = parser.add_subparsers(dest='command', required=True)
+    runs = commands.add_parser('runs', help='list the recorded runs')
+    runs.add_argument('-n', '--name', help='benchmark name, e.g. bench, matrix, formats')
+    runs.add_argument('-l', '--limit', type=int, default=20, help='runs to list')
+    compare = commands.add_parser('compare', help='test a candidate against a baseline')
+    compare.add_argument('-n', '--name', help='benchmark name, default all')
+    compare.add_argument('-b', '--baseline', default='previous', help='commit (prefix), #<run id>, latest or previous')
+    compare.add_argument('-c', '--candidate', default='latest', help='commit (prefix), #<run id> or latest')
+    compare.add_argument('-m', '--metric', choices=METRICS, action='append', help='metric(s), default all')
+    compare.add_argument('-a', '--alpha', type=float, default=0.01, help='significance level of the one-sided test')
+    compare.add_argument('-t', '--threshold', type=float, default=0.05, help='minimum relative change of the median')
+    compare.add_argument('-s', '--min-samples', type=int, default=3, help='samples per side needed to test')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        raise SystemExit(f'No history at {args.db}')
+    history = History(args.db)
+    if args.command == 'runs':
+        print(f"{'id':>5} {'name':<12} {'started':<20} {'commit':<16} {'target':<10} {'trino':<32} {'samples':>8}")
+        for id, name, started, commit, target, trino, count in history.runs(args.name, args.limit):
+            print(f"{id:>5} {name:<12} {started:<20} {commit or '-':<16} {target or '-':<10} {trino or '-':<32} {count:>8}")
+        return
+    comparison = history.compare(args.baseline, args.candidate, args.name, args.metric or METRICS, args.alpha,
+                                 args.threshold, args.min_samples)
+    print(table(comparison))
+    # non-zero exit code on regressions, for CI
+    sys.exit(1 if any(r['status'] == 'REGRESSED' for r in comparison['results']) else 0)
+
+if __name__ == '__main__':
+    main()
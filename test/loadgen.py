@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+asyncio load generator, runs concurrent streams of the suite workload (INSERT, full scans,
+SHOW SCHEMAS/TABLES) against one catalog and prints the throughput-vs-concurrency curve.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bench
+
+QUERIES = ['insert_into_table', 'select_from_table', 'show_schemas', 'show_tables']
+
+class LoadReport(bench.Report):
+    columns = ['mode', 'level', 'duration', 'completed', 'errors', 'qps', 'p50', 'p95', 'p99',
+               'clientQueue', 'serverQueue']
+    dimensions = ['mode', 'level']
+
+    def table(self):
+        top = max([r['qps'] for r in self.results] + [1e-9])
+        lines = [f"{'mode':<6} {'level':>6} {'qps':>8} {'p50 ms':>9} {'p95 ms':>9} {'queue ms':>9} {'errors':>7}"]
+        for r in self.results:
+            bar = '#' * round(40 * r['qps'] / top)
+            lines.append(f"{r['mode']:<6} {r['level']:>6} {r['qps']:>8.2f} {(r['p50'] or 0)*1e3:>9.1f} {(r['p95'] or 0)*1e3:>9.1f}"
+                         f" {(r['clientQueue'] + r['serverQueue'])*1e3:>9.1f} {r['errors']:>7} {bar}")
+        return '\n'.join(lines)
+
+class LoadGenerator:
+    """
+    Drives the workload of a test suite class with virtual users. In ramp mode each stage runs
+    a fixed number of closed-loop users, in rate mode queries are started at a target rate
+    whatever the latency (open loop), so that queueing shows up once the cluster saturates.
+    Queries run on the threads of an executor using connections of the suite's TrinoPool.
+    When the mix has INSERTs, table_1 is recreated before each stage so that every stage scans
+    the same rows.
+    """
+
+    def __init__(self, suite, mix, duration, workers=64, seed=None):
+        self.suite = suite
+        self.workers = workers
+        self.mix = mix
+        self.duration = duration
+        self.random = random.Random(seed)
+        self.executor = None
+
+    def workload(self):
+        suite = self.suite
+        return {
+            'insert_into_table': suite.insertSql,
+            'select_from_table': suite.selectSql,
+            'show_schemas': lambda: f"SHOW SCHEMAS FROM {suite.catalog}",
+            'show_tables': lambda: f"SHOW TABLES FROM {suite.catalog}.{suite.schemaNm}",
+        }
+
+    def pick(self):
+        names = list(self.mix)
+        name = self.random.choices(names, weights=[self.mix[n] for n in names])[0]
+        return name, self.workload()[name]()
+
+    def execute(self, name, sql, scheduled):
+        """Runs in an executor thread, scheduled is the time the query should have started."""
+        record = {'query': name, 'error': None, 'rows': 0, 'serverQueue': 0.0}
+        dequeued = time.perf_counter()
+        try:
+            with self.suite.pool.cursor() as cur:
+                started = time.perf_counter()
+                cur.execute(sql)
+                record['rows'] = len(cur.fetchall())
+                record['latency'] = time.perf_counter() - started
+                record['serverQueue'] = (cur.stats or {}).get('queuedTimeMillis', 0) / 1e3
+                record['queryId'] = cur.query_id
+        except Exception as e:
+            started = dequeued
+            record['latency'] = time.perf_counter() - started
+            record['error'] = str(e)
+        record['clientQueue'] = started - scheduled
+        record['poolWait'] = started - dequeued
+        return record
+
+    async def query(self, scheduled):
+        name, sql = self.pick()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.execute, name, sql, scheduled)
+
+    async def user(self, deadline, records):
+        while time.perf_counter() < deadline:
+            records.append(await self.query(time.perf_counter()))
+
+    async def ramp(self, users):
+        records = []
+        deadline = time.perf_counter() + self.duration
+        await asyncio.gather(*(self.user(deadline, records) for _ in range(users)))
+        return records
+
+    async def rate(self, qps):
+        start = time.perf_counter()
+        tasks = []
+        for i in range(int(qps * self.duration)):
+            scheduled = start + i / qps
+            await asyncio.sleep(max(0, scheduled - time.perf_counter()))
+            tasks.append(asyncio.create_task(self.query(scheduled)))
+        return await asyncio.gather(*tasks)
+
+    def summarize(self, mode, level, records, elapsed):
+        ok = [r for r in records if r['error'] is None]
+        latencies = [r['latency'] for r in ok]
+        return {
+            'mode': mode,
+            'level': level,
+            'duration': elapsed,
+            'completed': len(ok),
+            'errors': len(records) - len(ok),
+            'qps': len(ok) / elapsed if elapsed > 0 else 0,
+            'p50': bench.percentile(latencies, 50),
+            'p95': bench.percentile(latencies, 95),
+            'p99': bench.percentile(latencies, 99),
+            'clientQueue': sum(r['clientQueue'] for r in records) / max(len(records), 1),
+            'serverQueue': sum(r['serverQueue'] for r in ok) / max(len(ok), 1),
+            'queries': records,
+        }
+
+    def createTable(self):
+        with self.suite.pool.cursor() as cur:
+            cur.execute(self.suite.createTableSql())
+            cur.fetchall()
+            cur.execute(self.suite.insertSql())
+            cur.fetchall()
+
+    def resetTable(self):
+        """Drops table_1 and its files, the tables are external, and creates it again with its single row."""
+        suite = self.suite
+        with suite.pool.cursor() as cur:
+            cur.execute(f"DROP TABLE IF EXISTS {suite.catalog}.{suite.schemaNm}.table_1")
+            cur.fetchall()
+        if suite.hasS3Credentials():
+            suite.deleteS3Folder(suite.s3Client(), f'trino/data/unittest/{suite.schemaNm}/parquet/table_1')
+        self.createTable()
+
+    def run(self, report, users=(), rates=()):
+        suite = self.suite
+        suite.setUpTrait()
+        width = max(list(users) + [self.workers])
+        suite.pool.resize(width)
+        self.executor = ThreadPoolExecutor(max_workers=width)
+        try:
+            with suite.pool.cursor() as cur:
+                cur.execute(f"CREATE SCHEMA IF NOT EXISTS {suite.catalog}.{suite.schemaNm}")
+                cur.fetchall()
+            self.createTable()
+            fresh = True
+            for mode, levels, stage in [('users', users, self.ramp), ('qps', rates, self.rate)]:
+                for level in levels:
+                    if not fresh:
+                        self.resetTable()
+                    fresh = not self.mix.get('insert_into_table')
+                    start = time.perf_counter()
+                    records = asyncio.run(stage(level))
+                    result = self.summarize(mode, level, records, time.perf_counter() - start)
+                    suite.logger.info(f"{mode}={level}: {result['qps']:.2f} queries/s, {result['errors']} errors")
+                    report.add(result)
+        finally:
+            self.executor.shutdown()
+            suite.tearDownTrait()
+
+def parseMix(value):
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        try:
+            mix[name] = float(weight or 1)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f'Invalid weight of {name}: {weight}')
+    return mix
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('suite', nargs='?', default='test_hive', help='test module whose workload to run')
+    parser.add_argument('-u', '--users', default='1,2,4,8,16',
+                        help='comma separated concurrent virtual users, one ramp stage each')
+    parser.add_argument('-q', '--qps', default='',
+                        help='comma separated target queries/s, one open-loop stage each')
+    parser.add_argument('-d', '--duration', type=float, default=30, help='seconds per stage')
+    parser.add_argument('-m', '--mix', type=parseMix,
+                        default='select_from_table=4,show_schemas=2,show_tables=2',
+                        help=f'weighted query mix of {", ".join(QUERIES)}; with insert_into_table the table '
+                             'is recreated before each stage')
+    parser.add_argument('-w', '--workers', type=int, default=64,
+                        help='executor threads and pool connections in rate mode')
+    parser.add_argument('-s', '--seed', type=int, default=None, help='seed of the query mix')
+    parser.add_argument('-o', '--output', default='private/bench', help='report directory')
+    args = parser.parse_args()
+    unknown = [name for name in args.mix if name not in QUERIES]
+    if unknown:
+        parser.error(f'Unknown queries in the mix: {", ".join(unknown)} (choose from {", ".join(QUERIES)})')
+
+    users = [int(u) for u in args.users.split(',') if u]
+    rates = [float(q) for q in args.qps.split(',') if q]
+    report = LoadReport('loadgen', users=users, qps=rates, duration=args.duration, mix=args.mix)
+    for suite in bench.suites([args.suite]):
+        LoadGenerator(suite, args.mix, args.duration, args.workers, args.seed).run(report, users, rates)
+    print(report.table())
+    print(f'Report: {report.write(args.output)}.{{json,csv}}')
+
+if __name__ == '__main__':
+    main()
@@ -2,72 +2,635 @@
 Helper classes, provides default TestCase class set up and tear down.
 """
 
+import atexit
 import logging
+import re
+import struct
+import threading
+import time
 import unittest
+from contextlib import closing, contextmanager
+
+class classproperty:
+    def __init__(self, fget):
+        self.fget = fget
+
+    def __get__(self, instance, owner):
+        return self.fget(owner)
 
 class Consts:
     @staticmethod
     def range(*args):
         return ''.join([chr(i) for a in args for i in range(ord(a[0]), ord(a[1])+1)])
 
-    @property
-    def catalog(self):
-        return self._catalog
+    @classproperty
+    def catalog(cls):
+        return cls._catalog
 
-    @property
-    def unsetValue(self):
+    @classproperty
+    def unsetValue(cls):
         return 'CHANGE.ME'
 
-    @property
-    def accents(self):
+    @classproperty
+    def accents(cls):
         return r"ÅÁÀÂÄÉÈÊËÍÌÎÏÓÒÔÖÚÙÛÜÇåáàâäéèêëíìîïóòôöúùûüçõã"
 
-    @property
-    def symbols(self):
+    @classproperty
+    def symbols(cls):
         return r"""~`!@#$%^&*()_-+={}[]\|:;"<>,./?"""
 
-    @property
-    def specials(self):
+    @classproperty
+    def specials(cls):
         return r"""`¡™£¢∞§¶•ªº–≠œ∑´®†\¨ˆøπ“‘«åß∂ƒ©˙∆˚¬…æΩ≈ç√∫˜µ≤≥÷`⁄€‹›ﬁﬂ‡°·‚—±Œ„´‰ˇÁ¨ˆØ∏”’»ÅÍÎÏ˝ÓÔÒÚÆ¸˛Ç◊ı˜Â¯˘¿"""
 
-    @property
-    def minTiny(self):
+    @classproperty
+    def minTiny(cls):
         return -2**7
 
-    @property
-    def maxTiny(self):
+    @classproperty
+    def maxTiny(cls):
         return 2**7-1
 
-    @property
-    def minSmall(self):
+    @classproperty
+    def minSmall(cls):
         return -2**15
 
-    @property
-    def maxSmall(self):
+    @classproperty
+    def maxSmall(cls):
         return -2**15
 
-    @property
-    def minBig(self):
+    @classproperty
+    def minBig(cls):
         return -2**63
 
-    @property
-    def maxBig(self):
+    @classproperty
+    def maxBig(cls):
         return 2**63-1
 
-    @property
-    def minInt(self):
+    @classproperty
+    def minInt(cls):
         return -2**31
 
-    @property
-    def maxInt(self):
+    @classproperty
+    def maxInt(cls):
         return 2**31-1
 
-class classproperty:
-    def __init__(self, fget):
-        self.fget = fget
+def boundedMap(pool, fn, items, inflight):
+    """
+    Submits fn(item) to the executor pool while consuming items lazily, with at most inflight
+    pending calls so that memory does not grow with the input. Yields (item, future) in
+    completion order.
+    """
+    from concurrent.futures import wait, FIRST_COMPLETED
+
+    pending = {}
+    for item in items:
+        while len(pending) >= inflight:
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future
+        pending[pool.submit(fn, item)] = item
+    for future in wait(list(pending)).done:
+        yield pending.pop(future), future
+
+# Expected value of the columns that are not verified
+ANY = object()
+
+def normalize(value, typeName):
+    """Normalizes a value for comparison with a result value of the Trino type typeName."""
+    if value is None:
+        return None
+    if typeName == 'real' and isinstance(value, float):
+        # Trino returns the shortest representation of the float32, not the float32 itself
+        return struct.unpack('f', struct.pack('f', value))[0]
+    if typeName.startswith('char(') and isinstance(value, str):
+        return value.ljust(int(typeName[5:-1]))
+    return value
+
+class RowStream:
+    """
+    Iterates the rows of a cursor with fetchmany, so that memory does not grow with the result
+    size, and measures time-to-first-row and rows/s. Create it before executing the query.
+    """
+
+    def __init__(self, cur, batchSize=1000):
+        self.cur = cur
+        self.batchSize = batchSize
+        self.rows = 0
+        self.start = time.perf_counter()
+        self.firstRow = None
+        self.end = None
+
+    def __iter__(self):
+        while True:
+            batch = self.cur.fetchmany(self.batchSize)
+            if not batch:
+                break
+            if self.firstRow is None:
+                self.firstRow = time.perf_counter()
+            for row in batch:
+                self.rows += 1
+                yield row
+        self.end = time.perf_counter()
+
+    def stats(self):
+        import resource
+
+        elapsed = (self.end or time.perf_counter()) - self.start
+        return {
+            'rows': self.rows,
+            'timeToFirstRow': self.firstRow - self.start if self.firstRow else None,
+            'seconds': elapsed,
+            'rowsPerSec': self.rows / elapsed if elapsed > 0 else None,
+            # high-water mark of the process, in bytes (ru_maxrss is in KB on Linux)
+            'peakRss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        }
+
+def parseDuration(value):
+    """Parses an airlift Duration ('1.50s', '12.00ms') to seconds."""
+    units = {'ns': 1e-9, 'us': 1e-6, 'ms': 1e-3, 's': 1, 'm': 60, 'h': 3600, 'd': 86400}
+    match = re.fullmatch(r'([0-9.]+)\s*([a-z]+)', str(value))
+    return float(match.group(1)) * units[match.group(2)] if match else None
+
+def parseDataSize(value):
+    """Parses an airlift DataSize ('1.5MB', '12B') to bytes."""
+    units = {'B': 1, 'kB': 2**10, 'MB': 2**20, 'GB': 2**30, 'TB': 2**40, 'PB': 2**50}
+    match = re.fullmatch(r'([0-9.]+)\s*([a-zA-Z]+)', str(value))
+    return int(float(match.group(1)) * units[match.group(2)]) if match else None
+
+class QueryLog:
+    """
+    Process-wide log of the queries run through pooled connections: query id, SQL, client time
+    and final cursor stats, tagged with the running test or benchmark. Recorded only when
+    TRINO_QUERY_STATS names a directory: the queries are then joined with system.runtime.queries
+    and the coordinator query info at the end of each test class, and written to a per-run JSON
+    report.
+    """
+    lock = threading.Lock()
+    queries = []
+    local = threading.local()
+    started = time.strftime('%Y-%m-%dT%H%M%S')
+    infoStats = {
+        'elapsedTime': parseDuration, 'queuedTime': parseDuration, 'planningTime': parseDuration,
+        'executionTime': parseDuration, 'totalCpuTime': parseDuration, 'physicalInputReadTime': parseDuration,
+        'physicalInputDataSize': parseDataSize, 'processedInputDataSize': parseDataSize,
+        'outputDataSize': parseDataSize, 'physicalWrittenDataSize': parseDataSize,
+        'peakUserMemoryReservation': parseDataSize, 'peakTotalMemoryReservation': parseDataSize,
+        'physicalInputPositions': int, 'totalDrivers': int, 'completedDrivers': int, 'totalTasks': int,
+    }
 
-    def __get__(self, instance, owner):
-        return self.fget(owner)
+    @classmethod
+    def enabled(cls):
+        import os
+        return bool(os.getenv('TRINO_QUERY_STATS'))
+
+    @classmethod
+    @contextmanager
+    def tagged(cls, tag):
+        previous = getattr(cls.local, 'tag', None)
+        cls.local.tag = tag
+        try:
+            yield
+        finally:
+            cls.local.tag = previous
+
+    @classmethod
+    def add(cls, record):
+        # kept only for the report, the log would otherwise grow for the life of the process
+        if not cls.enabled():
+            return
+        with cls.lock:
+            cls.queries.append(record)
+
+    @classmethod
+    def enrich(cls, pool, conn):
+        """Adds the server-side statistics to the queries that do not have them yet."""
+        from concurrent.futures import ThreadPoolExecutor
+
+        with cls.lock:
+            pending = {q['queryId']: q for q in cls.queries if q.get('queryId') and 'server' not in q}
+        ids = list(pending)
+        for i in range(0, len(ids), 500):
+            # the raw cursor, so that these queries are not logged
+            with closing(conn.raw.cursor()) as cur:
+                cur.execute(f"""
+                    SELECT query_id, state, queued_time_ms, analysis_time_ms, planning_time_ms, error_type, error_code
+                    FROM system.runtime.queries
+                    WHERE query_id IN ({', '.join(f"'{id}'" for id in ids[i:i+500])})
+                """)
+                for row in cur.fetchall():
+                    pending[row[0]]['server'] = dict(zip(
+                        ['state', 'queuedTimeMs', 'analysisTimeMs', 'planningTimeMs', 'errorType', 'errorCode'], row[1:]))
+
+        session = pool.session()
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            for queryId, future in boundedMap(executor, lambda queryId: cls.info(pool, queryId, session), ids, 16):
+                try:
+                    pending[queryId].setdefault('server', {}).update(future.result())
+                except Exception as e:
+                    pending[queryId].setdefault('server', {})['infoError'] = str(e)
+
+    @classmethod
+    def info(cls, pool, queryId, session=None):
+        """The infoStats of a query, from the coordinator query info."""
+        session = session or pool.session()
+        response = session.get(f'{pool.url}/v1/query/{queryId}', params={'pruned': 'true'},
+                               headers={'X-Trino-User': pool.user}, timeout=30)
+        response.raise_for_status()
+        stats = response.json().get('queryStats', {})
+        return {name: parse(stats[name]) for name, parse in cls.infoStats.items() if name in stats}
+
+    @classmethod
+    def export(cls):
+        import json
+        import os
+
+        outdir = os.getenv('TRINO_QUERY_STATS')
+        os.makedirs(outdir, exist_ok=True)
+        path = os.path.join(outdir, f'queries_{cls.started}_{os.getpid()}.json')
+        with cls.lock:
+            with open(path, 'w') as f:
+                json.dump({'started': cls.started, 'queries': cls.queries}, f, indent=2, default=str)
+        return path
+
+class Profiler:
+    """
+    Client-side phase profile, when TRINO_PROFILE names a directory: wall time, CPU time of the
+    thread and of the process of each phase (set up, statement execution, result fetch and
+    decoding, schema drop, S3 clean up), aggregated per path of nested phases. TRINO_PROFILE_TOOLS
+    adds cprofile (one pstats file per outermost phase, i.e. per test class) and tracemalloc (peak allocation of the process
+    above the phase's start). Written at the end of each test class, with the paths in the folded
+    format of flamegraph.pl and speedscope.
+    """
+    lock = threading.Lock()
+    phases = {}
+    profiles = {}
+    local = threading.local()
+    started = time.strftime('%Y-%m-%dT%H%M%S')
+
+    @classmethod
+    def enabled(cls):
+        import os
+        return bool(os.getenv('TRINO_PROFILE'))
+
+    @classmethod
+    def tools(cls):
+        import os
+        return {t.strip() for t in os.getenv('TRINO_PROFILE_TOOLS', '').lower().split(',') if t.strip()}
+
+    @classmethod
+    @contextmanager
+    def phase(cls, name):
+        if not cls.enabled():
+            yield
+            return
+        import tracemalloc
+
+        tools = cls.tools()
+        stack = cls.local.__dict__.setdefault('stack', [])
+        entry = {'name': name, 'peak': 0, 'mem': 0, 'profile': None}
+        if 'tracemalloc' in tools:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+            tracemalloc.reset_peak()
+            entry['mem'] = entry['peak'] = current
+        if 'cprofile' in tools and not any(e['profile'] for e in stack):
+            # one profiler per thread at a time, the outermost phase profiles its nested phases
+            import cProfile
+            entry['profile'] = cProfile.Profile()
+        stack.append(entry)
+        path = ';'.join(e['name'] for e in stack)
+        cpu, processCpu = time.thread_time(), time.process_time()
+        start = time.perf_counter()
+        if entry['profile']:
+            entry['profile'].enable()
+        try:
+            yield
+        finally:
+            if entry['profile']:
+                entry['profile'].disable()
+            wall = time.perf_counter() - start
+            cpu, processCpu = time.thread_time() - cpu, time.process_time() - processCpu
+            stack.pop()
+            peak = None
+            if tracemalloc.is_tracing() and 'tracemalloc' in tools:
+                peak = max(entry['peak'], tracemalloc.get_traced_memory()[1])
+                if stack:
+                    stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+                peak -= entry['mem']
+            with cls.lock:
+                record = cls.phases.setdefault(path, {'path': path, 'count': 0, 'wall': 0.0, 'cpu': 0.0,
+                                                      'processCpu': 0.0, 'peak': None})
+                record['count'] += 1
+                record['wall'] += wall
+                record['cpu'] += cpu
+                record['processCpu'] += processCpu
+                if peak is not None:
+                    record['peak'] = max(record['peak'] or 0, peak)
+                if entry['profile']:
+                    import pstats
+                    if name in cls.profiles:
+                        cls.profiles[name].add(entry['profile'])
+                    else:
+                        cls.profiles[name] = pstats.Stats(entry['profile'])
+
+    @classmethod
+    def export(cls):
+        """Writes the phases as JSON and folded stacks of self wall time (microseconds), and the pstats."""
+        import json
+        import os
+
+        outdir = os.getenv('TRINO_PROFILE')
+        os.makedirs(outdir, exist_ok=True)
+        stem = os.path.join(outdir, f'profile_{cls.started}_{os.getpid()}')
+        with cls.lock:
+            phases = sorted((dict(p) for p in cls.phases.values()), key=lambda p: p['path'])
+            for name, stats in cls.profiles.items():
+                stats.dump_stats(f"{stem}_{re.sub(r'[^A-Za-z0-9_.-]+', '_', name)}.prof")
+        children = {}
+        for p in phases:
+            parent = p['path'].rpartition(';')[0]
+            children[parent] = children.get(parent, 0.0) + p['wall']
+        totals = {}
+        for p in phases:
+            p['selfWall'] = max(p['wall'] - children.get(p['path'], 0.0), 0.0)
+            # totals per phase name over all tests, e.g. the time spent fetching SELECT results
+            total = totals.setdefault(p['path'].rpartition(';')[2], {'count': 0, 'wall': 0.0, 'cpu': 0.0, 'peak': None})
+            total['count'] += p['count']
+            total['wall'] += p['wall']
+            total['cpu'] += p['cpu']
+            if p['peak'] is not None:
+                total['peak'] = max(total['peak'] or 0, p['peak'])
+        with open(f'{stem}.json', 'w') as f:
+            json.dump({'started': cls.started, 'tools': sorted(cls.tools()), 'phases': phases, 'totals': totals}, f, indent=2)
+        with open(f'{stem}.folded', 'w') as f:
+            for p in phases:
+                f.write(f"{p['path'].replace(' ', '_')} {round(p['selfWall'] * 1e6)}\n")
+        return stem
+
+class RecordingCursor:
+    """Cursor proxy that logs each executed query to the QueryLog once its results are consumed."""
+    # s3proxy.S3Proxy of the process with TRINO_S3_PROXY, counts the S3 requests during each query
+    s3Proxy = None
+
+    def __init__(self, cursor):
+        self.raw = cursor
+        self.record = None
+        self.kind = None
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __iter__(self):
+        yield from self.raw
+        self.finish()
+
+    def finish(self, error=None):
+        if self.record is None:
+            return
+        record, self.record = self.record, None
+        record['clientSeconds'] = time.perf_counter() - record.pop('start')
+        record['queryId'] = self.raw.query_id
+        record['stats'] = dict(self.raw.stats or {})
+        record['error'] = str(error) if error else None
+        if 's3' in record:
+            record['s3'] = self.s3Proxy.end(record['s3'], queryId=record['queryId'])
+        QueryLog.add(record)
+
+    def execute(self, operation, params=None):
+        self.finish()
+        self.record = {
+            'tag': getattr(QueryLog.local, 'tag', None),
+            'sql': ' '.join(operation.split())[:1000],
+            'started': time.time(),
+            'start': time.perf_counter(),
+        }
+        if self.s3Proxy is not None:
+            self.record['s3'] = self.s3Proxy.begin(f"{self.record['tag'] or '-'} {self.record['sql'][:60]}",
+                                                   tag=self.record['tag'], sql=self.record['sql'])
+        self.kind = (operation.split(None, 1) or ['?'])[0].upper()
+        try:
+            with Profiler.phase(f'execute {self.kind}'):
+                self.raw.execute(operation, params)
+        except Exception as e:
+            self.finish(e)
+            raise
+        return self
+
+    def fetchone(self):
+        with Profiler.phase(f'fetch {self.kind}'):
+            row = self.raw.fetchone()
+        if row is None:
+            self.finish()
+        return row
+
+    def fetchmany(self, size=None):
+        with Profiler.phase(f'fetch {self.kind}'):
+            rows = self.raw.fetchmany(size)
+        if not rows:
+            self.finish()
+        return rows
+
+    def fetchall(self):
+        try:
+            with Profiler.phase(f'fetch {self.kind}'):
+                return self.raw.fetchall()
+        finally:
+            self.finish()
+
+    def close(self):
+        self.finish()
+        self.raw.close()
+
+class RecordingConnection:
+    """Connection proxy whose cursors log their queries to the QueryLog."""
+
+    def __init__(self, conn):
+        self.raw = conn
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+    def cursor(self, *args, **kwargs):
+        return RecordingCursor(self.raw.cursor(*args, **kwargs))
+
+    def resetSession(self, properties=None):
+        """
+        Replaces the session properties of the client session (SET SESSION) with properties and
+        restores its catalog and schema (USE). The embedded engine has no client session.
+        """
+        session = getattr(self.raw, '_client_session', None)
+        if session is not None:
+            session.properties = dict(properties or {})
+            session.catalog = self.raw.catalog
+            session.schema = self.raw.schema
+
+class TrinoPool:
+    """
+    Thread-safe pool of Trino connections, one pool per host/port/scheme/user/encoding shared by
+    all the test and benchmark classes. Every connection has its own requests session (session
+    headers are per connection), but all sessions of a pool share one HTTP adapter, so TCP/TLS
+    connections are reused across connections, threads and classes.
+    """
+    pools = {}
+    lock = threading.Lock()
+
+    @classmethod
+    def get(cls, host, port, scheme='http', user='test', verify=False, maxSize=16, encoding=None):
+        """
+        Shared pool of the connections to host. encoding is None for the direct protocol (result
+        pages through the coordinator), or the encoding(s) of the spooling protocol, e.g. 'json+zstd'.
+        """
+        key = (host, int(port), scheme, user, tuple(encoding) if isinstance(encoding, list) else encoding)
+        with cls.lock:
+            if not cls.pools:
+                atexit.register(cls.closeAll)
+            if key not in cls.pools:
+                cls.pools[key] = cls(*key, verify=verify, maxSize=maxSize)
+            return cls.pools[key]
+
+    @classmethod
+    def closeAll(cls):
+        with cls.lock:
+            for pool in cls.pools.values():
+                pool.close()
+            cls.pools.clear()
+
+    def __init__(self, host, port, scheme, user, encoding=None, verify=False, maxSize=16):
+        from requests.adapters import HTTPAdapter
+
+        self.host = host
+        self.port = port
+        self.scheme = scheme
+        self.user = user
+        self.encoding = list(encoding) if isinstance(encoding, tuple) else encoding
+        self.verify = verify
+        self.maxSize = maxSize
+        self.adapter = HTTPAdapter(pool_connections=1, pool_maxsize=maxSize)
+        self.idle = []
+        self.cond = threading.Condition()
+        self.created = 0
+        self.inUse = 0
+        self.acquired = 0
+        self.waits = 0
+        self.waitTime = 0.0
+        self.maxWait = 0.0
+
+    @property
+    def url(self):
+        return f'{self.scheme}://{self.host}:{self.port}'
+
+    def session(self):
+        import requests
+
+        session = requests.Session()
+        session.verify = self.verify
+        session.mount('http://', self.adapter)
+        session.mount('https://', self.adapter)
+        return session
+
+    def connect(self):
+        from trino.dbapi import connect
+
+        return RecordingConnection(connect(
+            host=self.host,
+            port=self.port,
+            user=self.user,
+            http_scheme=self.scheme,
+            http_session=self.session(),
+            encoding=self.encoding
+        ))
+
+    def acquire(self, timeout=None):
+        """Returns an idle connection, creates one if the pool is not full, waits otherwise."""
+        start = time.perf_counter()
+        with self.cond:
+            waited = False
+            while not self.idle and self.created >= self.maxSize:
+                waited = True
+                if not self.cond.wait(timeout):
+                    raise TimeoutError(f'No Trino connection available after {timeout}s')
+            conn = self.idle.pop() if self.idle else None
+            if conn is None:
+                self.created += 1
+            self.inUse += 1
+            self.acquired += 1
+            wait = time.perf_counter() - start
+            self.waits += waited
+            self.waitTime += wait
+            self.maxWait = max(self.maxWait, wait)
+        if conn is None:
+            try:
+                conn = self.connect()
+            except Exception:
+                with self.cond:
+                    self.created -= 1
+                    self.inUse -= 1
+                    self.cond.notify()
+                raise
+        return conn
+
+    def resize(self, maxSize):
+        """Grows the pool, e.g. for load generators that need more than the default size."""
+        with self.cond:
+            if maxSize > self.maxSize:
+                self.maxSize = maxSize
+                # the sockets of the old pool manager are closed, those in use when they are returned
+                self.adapter.poolmanager.clear()
+                self.adapter.init_poolmanager(1, maxSize)
+                self.cond.notify_all()
+
+    def release(self, conn):
+        # the next borrower, maybe another class, must not inherit SET SESSION or USE of this one
+        conn.resetSession()
+        # pooled connections are never closed individually, it would close the shared adapter
+        with self.cond:
+            self.idle.append(conn)
+            self.inUse -= 1
+            self.cond.notify()
+
+    @contextmanager
+    def connection(self, timeout=None, properties=None):
+        """A pooled connection, with the session properties for the time it is leased."""
+        conn = self.acquire(timeout)
+        try:
+            if properties:
+                conn.resetSession(properties)
+            yield conn
+        finally:
+            self.release(conn)
+
+    @contextmanager
+    def cursor(self, timeout=None, properties=None):
+        with self.connection(timeout, properties) as conn:
+            with closing(conn.cursor()) as cur:
+                yield cur
+
+    def stats(self):
+        with self.cond:
+            return {
+                'created': self.created,
+                'inUse': self.inUse,
+                'idle': len(self.idle),
+                'acquired': self.acquired,
+                'waits': self.waits,
+                'waitTime': self.waitTime,
+                'maxWait': self.maxWait,
+            }
+
+    def close(self):
+        with self.cond:
+            self.idle.clear()
+            self.adapter.close()
 
 class CustomLogFormatter(logging.Formatter):
     def format(self, record):
@@ -76,20 +639,27 @@ class CustomLogFormatter(logging.Formatter):
         else:
             return super().format(record)
 
-class TrinoConnect(Consts):
-    loggers = {}
+class Session:
+    """
+    Settings and clients shared by every test class of the process: private/config.ini is parsed
+    once, the Trino pool and the S3 clients are built on first use, so that the suites of a
+    unittest run (or of a parallel.py worker) only pay for them once.
+    """
+    lock = threading.RLock()
+    cached = None
+    clients = {}
 
-    @classproperty
-    def logger(cls):
-        return cls.loggers[cls.__name__]
+    @classmethod
+    def settings(cls):
+        with cls.lock:
+            if cls.cached is None:
+                cls.cached = cls.load()
+            return cls.cached
 
     @classmethod
-    def setUpTrait(cls):
-        import uuid
+    def load(cls):
         import configparser
         import os
-        from trino.dbapi import connect
-        from trino.auth import BasicAuthentication
 
         config = configparser.ConfigParser()
         config.read('private/config.ini')
@@ -97,6 +667,83 @@ class TrinoConnect(Consts):
         targetTrino=config.get(targetEnv, option='trino', fallback='default')
         targetS3=config.get(targetEnv, option='s3', fallback='default')
 
+        settings = {
+            'targetEnv': targetEnv,
+            'caS3': os.getenv('CA_BUNDLE', config.get(targetS3, option='ca', fallback="true")),
+            'trinoHost': os.getenv('TRINO_HOST', config.get(targetTrino, option='host', fallback='localhost')),
+            'trinoPort': os.getenv('TRINO_PORT', int(config.get(targetTrino, option='port', fallback=8080))),
+            'trinoScheme': config.get(targetTrino, option='scheme', fallback='http'),
+            's3Bucket': os.getenv('AWS_S3_BUCKET', config.get(targetS3, option='bucket', fallback=None)),
+            's3AccessKey': os.getenv('AWS_ACCESS_KEY_ID', config.get(targetS3, option='key', fallback=None)),
+            's3SecretKey': os.getenv('AWS_SECRET_ACCESS_KEY', config.get(targetS3, option='secret', fallback=None)),
+            's3Endpoint': os.getenv('AWS_S3_ENDPOINT', config.get(targetS3, option='endpoint', fallback=None)),
+            'offline': os.getenv('TRINO_OFFLINE', config.get(targetEnv, option='offline', fallback=str(targetEnv == 'offline'))).lower() == 'true',
+        }
+
+        if settings['offline']:
+            # local S3 stand-in and embedded engine, see offline.py
+            import offline
+            if settings['s3Bucket'] is None or settings['s3Bucket'] == Consts.unsetValue:
+                settings['s3Bucket'] = 'unittest'
+            settings['s3AccessKey'] = settings['s3SecretKey'] = 'offline'
+            settings['s3Endpoint'] = offline.LocalS3.start(settings['s3Bucket'])
+            settings['caS3'] = 'false'
+
+        if settings['s3Bucket'] is None or settings['s3Bucket'] == Consts.unsetValue:
+            raise Exception("S3 bucket not set")
+
+        if settings['caS3'].lower() == 'true':
+            settings['caS3'] = True
+        elif settings['caS3'].lower() == 'false':
+            settings['caS3'] = False
+
+        if os.getenv('TRINO_S3_PROXY') and settings['s3Endpoint'] not in (None, Consts.unsetValue):
+            # the S3 clients go through the request counting proxy, see s3proxy.py
+            import s3proxy
+            settings['s3Upstream'] = settings['s3Endpoint']
+            settings['s3Endpoint'] = s3proxy.S3Proxy.start(os.getenv('TRINO_S3_PROXY'), settings['s3Endpoint'], settings['caS3'])
+            RecordingCursor.s3Proxy = s3proxy.S3Proxy.instance
+        return settings
+
+    @classmethod
+    def pool(cls):
+        settings = cls.settings()
+        if settings['offline']:
+            import offline
+            return offline.EmbeddedPool.get(host='duckdb', port=0, scheme='embedded')
+        return TrinoPool.get(
+            host=settings['trinoHost'],
+            port=settings['trinoPort'],
+            scheme=settings['trinoScheme'],
+            user='test',
+            verify=False
+        )
+
+    @classmethod
+    def s3Client(cls, endpoint, key, secret, verify):
+        """One boto3 client per endpoint and credentials, boto3 clients are thread safe."""
+        with cls.lock:
+            client = cls.clients.get((endpoint, key, verify))
+            if client is None:
+                import boto3
+                import warnings
+                warnings.filterwarnings(action='ignore', module='.*botocore.*', category=DeprecationWarning)
+                client = boto3.client('s3', aws_access_key_id=key, aws_secret_access_key=secret,
+                                      endpoint_url=endpoint if '://' in endpoint else 'https://'+endpoint, verify=verify)
+                cls.clients[(endpoint, key, verify)] = client
+            return client
+
+class TrinoConnect(Consts):
+    loggers = {}
+
+    @classproperty
+    def logger(cls):
+        return cls.loggers[cls.__name__]
+
+    @classmethod
+    def setUpTrait(cls):
+        import uuid
+
         if cls.__name__ not in cls.loggers:
             logger = logging.getLogger(cls.__name__)
             logger.setLevel(logging.INFO)
@@ -109,102 +756,190 @@ class TrinoConnect(Consts):
             logger.propagete = False
             cls.loggers[cls.__name__] = logger
 
-        cls.caS3=os.getenv('CA_BUNDLE', config.get(targetS3, option='ca', fallback="true"))
-        cls.trinoHost=os.getenv('TRINO_HOST', config.get(targetTrino, option='host', fallback='localhost'))
-        cls.trinoPort=os.getenv('TRINO_PORT', int(config.get(targetTrino, option='port', fallback=8080)))
-        cls.trinoScheme=config.get(targetTrino, option='scheme', fallback='http')
-        cls.schemaNm=f"unittest_{str(uuid.uuid4())[:8]}"
-        cls.s3Bucket=os.getenv('AWS_S3_BUCKET', config.get(targetS3, option='bucket', fallback=None))
-        cls.s3AccessKey=os.getenv('AWS_ACCESS_KEY_ID', config.get(targetS3, option='key', fallback=None))
-        cls.s3SecretKey=os.getenv('AWS_SECRET_ACCESS_KEY', config.get(targetS3, option='secret', fallback=None))
-        cls.s3Endpoint=os.getenv('AWS_S3_ENDPOINT', config.get(targetS3, option='endpoint', fallback=None))
-
-        if cls.s3Bucket is None or cls.s3Bucket == cls.unsetValue:
-            raise Exception("S3 bucket not set")
+        with Profiler.phase(cls.__name__), Profiler.phase('setUpTrait'):
+            for name, value in Session.settings().items():
+                setattr(cls, name, value)
+            cls.schemaNm=f"unittest_{str(uuid.uuid4())[:8]}"
 
-        cls.logger.info(f"Schema: {cls._catalog}.{cls.schemaNm}")
-        cls.logger.info(f"S3 locations: s3a://{cls.s3Bucket}/trino/data/unittest/{cls.schemaNm}")
-        if cls.caS3.lower() == 'true':
-            cls.caS3 = True
-        elif cls.caS3.lower() == 'false':
-            cls.caS3 = False
-        cls.logger.info(f"CA: {cls.caS3}")
-
-        cls.conn = connect(
-            host=cls.trinoHost,
-            port=cls.trinoPort,
-            user='test',
-            http_scheme=cls.trinoScheme,
-            verify=False
-        )
+            cls.logger.info(f"Schema: {cls._catalog}.{cls.schemaNm}")
+            cls.logger.info(f"S3 locations: s3a://{cls.s3Bucket}/trino/data/unittest/{cls.schemaNm}")
+            cls.logger.info(f"CA: {cls.caS3}")
+
+            cls.pool = Session.pool()
+            cls.conn = cls.pool.acquire()
 
     @classmethod
-    def deleteS3Folder(cls, s3, path):
-        if len(path) < 2:
-            raise RuntimeError(f'Invalid path: {path}')
-        if not path.endswith('/'):
-            path += '/'
+    def hasS3Credentials(cls):
+        return sum(o is None or o == cls.unsetValue for o in [ cls.s3AccessKey, cls.s3SecretKey, cls.s3Endpoint ]) == 0
 
+    @classmethod
+    def s3Client(cls):
+        # <<<<< Boto3 >>>>>
+        return Session.s3Client(cls.s3Endpoint, cls.s3AccessKey, cls.s3SecretKey, cls.caS3)
+
+        # <<<<< PyArrow (slow!) >>>>>
+        # from pyarrow import fs
+        # return fs.S3FileSystem(access_key=cls.s3AccessKey, secret_key=cls.s3SecretKey, endpoint_override=cls.s3Endpoint)
+
+    @classmethod
+    def listS3Objects(cls, s3, path, modified=False):
+        """
+        Yields (key, size) of every object under the prefix path of the test bucket, or
+        (key, size, mtime) with the last modification as epoch seconds when modified.
+        """
         if s3.__class__.__module__ == 'botocore.client':
             # <Boto3>
-            cls.logger.info(f'Boto3 {cls.s3Bucket}/{path}')
-            objects_to_delete = []
             paginator = s3.get_paginator('list_objects_v2')
             for page in paginator.paginate(Bucket=cls.s3Bucket, Prefix=path):
-                if 'Contents' in page:
-                    for obj in page['Contents']:
-                        objects_to_delete.append({'Key': obj['Key']})
-                    if objects_to_delete:
-                        s3.delete_objects(
-                            Bucket=cls.s3Bucket,
-                            Delete={'Objects': objects_to_delete}
-                        )
-                        cls.logger.info(f'Deleted {len(objects_to_delete)} objects in {path}')
+                for obj in page.get('Contents', []):
+                    yield (obj['Key'], obj['Size'], obj['LastModified'].timestamp()) if modified else (obj['Key'], obj['Size'])
+        elif s3.__class__.__module__ == 'pyarrow._s3fs':
+            # <PyArrow>
+            from pyarrow import fs
+            selector = fs.FileSelector(f"{cls.s3Bucket}/{path}", recursive=True, allow_not_found=True)
+            for info in s3.get_file_info(selector):
+                if info.type == fs.FileType.File:
+                    key = info.path[len(cls.s3Bucket)+1:]
+                    yield (key, info.size, info.mtime.timestamp()) if modified else (key, info.size)
+        else:
+            raise RuntimeError(f'Unsupported S3 client: {type(s3)}')
+
+    @classmethod
+    def listS3Prefixes(cls, s3, path):
+        """Yields the prefixes one level under the prefix path of the test bucket (the "folders")."""
+        if not path.endswith('/'):
+            path += '/'
+        if s3.__class__.__module__ == 'botocore.client':
+            # <Boto3>
+            paginator = s3.get_paginator('list_objects_v2')
+            for page in paginator.paginate(Bucket=cls.s3Bucket, Prefix=path, Delimiter='/'):
+                for prefix in page.get('CommonPrefixes', []):
+                    yield prefix['Prefix']
         elif s3.__class__.__module__ == 'pyarrow._s3fs':
             # <PyArrow>
-            cls.logger.info(f'PyArrow {cls.s3Bucket}/{path}')
-            # fileInfo = s3.get_file_info(f"{cls.s3Bucket}/trino/data/unittest/{cls.schemaNm}")
-            # if fileInfo.type != fs.FileType.NotFound:
-            #     cls.logger.warning(f"S3 location {cls.s3Bucket}/{path} not deleted")
-            s3.delete_dir(f"{cls.s3Bucket}/trino/data/unittest/{cls.schemaNm}")
-            s3.delete_dir(f"{cls.s3Bucket}/trino/warehouse/{cls.schemaNm}")
+            from pyarrow import fs
+            selector = fs.FileSelector(f"{cls.s3Bucket}/{path}", recursive=False, allow_not_found=True)
+            for info in s3.get_file_info(selector):
+                if info.type == fs.FileType.Directory:
+                    yield info.path[len(cls.s3Bucket)+1:] + '/'
         else:
             raise RuntimeError(f'Unsupported S3 client: {type(s3)}')
-            
+
+    @classmethod
+    def deleteS3Batch(cls, s3, keys):
+        """Deletes up to 1000 keys, returns the keys that could not be deleted."""
+        if s3.__class__.__module__ == 'botocore.client':
+            try:
+                response = s3.delete_objects(
+                    Bucket=cls.s3Bucket,
+                    Delete={'Objects': [{'Key': key} for key in keys], 'Quiet': True}
+                )
+            except Exception as e:
+                cls.logger.warning(f'Delete batch of {len(keys)} objects failed: {e}')
+                return list(keys)
+            return [error['Key'] for error in response.get('Errors', [])]
+        else:
+            # PyArrow has no multi-object delete, the batch is deleted by one worker
+            failed = []
+            for key in keys:
+                try:
+                    s3.delete_file(f"{cls.s3Bucket}/{key}")
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    cls.logger.warning(f'Delete {key} failed: {e}')
+                    failed.append(key)
+            return failed
+
+    @classmethod
+    def deleteS3Folder(cls, s3, path, workers=8, batchSize=1000):
+        """
+        Deletes all objects under the prefix path. Full batches of batchSize keys (the
+        delete_objects limit) are deleted by a bounded thread pool while the listing is still
+        running. Returns the number of objects and bytes deleted, the failed keys and the rate.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        if len(path) < 2:
+            raise RuntimeError(f'Invalid path: {path}')
+        if not path.endswith('/'):
+            path += '/'
+
+        cls.logger.info(f'{type(s3).__name__} {cls.s3Bucket}/{path}')
+        stats = {'path': path, 'objects': 0, 'bytes': 0, 'failed': []}
+        start = time.perf_counter()
+        def batches():
+            # size of each key, the failed keys are not counted as reclaimed
+            sizes = {}
+            for key, size in cls.listS3Objects(s3, path):
+                sizes[key] = size
+                if len(sizes) == batchSize:
+                    yield sizes
+                    sizes = {}
+            if sizes:
+                yield sizes
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for sizes, future in boundedMap(pool, lambda batch: cls.deleteS3Batch(s3, list(batch)), batches(), 2 * workers):
+                failed = future.result()
+                stats['failed'] += failed
+                stats['objects'] += len(sizes) - len(failed)
+                stats['bytes'] += sum(sizes.values()) - sum(sizes.get(key, 0) for key in failed)
+        if s3.__class__.__module__ == 'pyarrow._s3fs':
+            # PyArrow recreates the parent directory markers of the deleted files
+            try:
+                s3.delete_dir(f"{cls.s3Bucket}/{path}")
+            except FileNotFoundError:
+                pass
+
+        stats['seconds'] = time.perf_counter() - start
+        stats['objectsPerSec'] = stats['objects'] / stats['seconds'] if stats['seconds'] > 0 else 0
+        cls.logger.info(f"Deleted {stats['objects']} objects ({stats['bytes']} bytes) in {path}"
+                        f" at {stats['objectsPerSec']:.0f} objects/s")
+        if stats['failed']:
+            cls.logger.warning(f"Failed to delete {len(stats['failed'])} objects in {path}: {stats['failed'][:10]}")
+        return stats
 
     @classmethod
     def tearDownTrait(cls):
-        from contextlib import closing
+        with Profiler.phase(cls.__name__), Profiler.phase('tearDownTrait'):
+            cls.cleanUpTrait()
+        if Profiler.enabled():
+            cls.logger.info(f"Profile: {Profiler.export()}.{{json,folded}}")
+        if RecordingCursor.s3Proxy is not None:
+            cls.logger.info(f"S3 requests: {RecordingCursor.s3Proxy.export()}")
+        cls.logger.info(f"Done")
 
+    @classmethod
+    def cleanUpTrait(cls):
         if cls.conn != None:
             cls.logger.info(f"Drop schema: {cls._catalog}.{cls.schemaNm}", extra={'nl': True})
-            with closing(cls.conn.cursor()) as cur:
+            with Profiler.phase('drop schema'), closing(cls.conn.cursor()) as cur:
                 cur.execute(f"DROP SCHEMA IF EXISTS {cls._catalog}.{cls.schemaNm} CASCADE")
-            cls.conn.close()
+            if QueryLog.enabled() and not cls.offline:
+                try:
+                    with Profiler.phase('query stats'):
+                        QueryLog.enrich(cls.pool, cls.conn)
+                    cls.logger.info(f"Query stats: {QueryLog.export()}")
+                except Exception as e:
+                    cls.logger.warning(f'Query stats {e}')
+            cls.pool.release(cls.conn)
+            cls.conn = None
+            cls.logger.info(f"Pool: {cls.pool.stats()}")
         if cls.schemaNm != None:
-            if sum(o is None or o == cls.unsetValue for o in [ cls.s3AccessKey, cls.s3SecretKey, cls.s3Endpoint ]) == 0:
+            if cls.hasS3Credentials():
                 try:
                     cls.logger.info(f"Delete s3a://{cls.s3Bucket}/trino/data/unittest/{cls.schemaNm}")
-
-                    # <<<<< Boto3 >>>>>
-                    import boto3
-                    import warnings
-                    warnings.filterwarnings(action='ignore', module='.*botocore.*', category=DeprecationWarning)
-                    s3 = boto3.client('s3', aws_access_key_id=cls.s3AccessKey, aws_secret_access_key=cls.s3SecretKey, endpoint_url='https://'+cls.s3Endpoint, verify=cls.caS3)
-
-                    # <<<<< PyArrow (slow!) >>>>>
-                    # from pyarrow import fs
-                    # s3 = fs.S3FileSystem(access_key=cls.s3AccessKey, secret_key=cls.s3SecretKey, endpoint_override=cls.s3Endpoint)
-
-                    cls.deleteS3Folder(s3, f'trino/data/unittest/{cls.schemaNm}')
-                    cls.deleteS3Folder(s3, f'trino/warehouse/{cls.schemaNm}')
+                    s3 = cls.s3Client()
+                    with Profiler.phase('S3 cleanup'):
+                        cls.deleteS3Folder(s3, f'trino/data/unittest/{cls.schemaNm}')
+                        cls.deleteS3Folder(s3, f'trino/warehouse/{cls.schemaNm}')
                 except FileNotFoundError:
                     pass
                 except Exception as e:
                     cls.logger.warning(f'S3 Cleanup {e}')
             else:
                 cls.logger.warning(f"Skip S3 cleanup at location s3a://{cls.s3Bucket}/trino/data/unittest/{cls.schemaNm}")
-        cls.logger.info(f"Done")
 
 class TestCase(unittest.TestCase, TrinoConnect):
     @classmethod
@@ -215,3 +950,53 @@ class TestCase(unittest.TestCase, TrinoConnect):
     def tearDownClass(cls):
         cls.tearDownTrait()
 
+    def run(self, result=None):
+        with QueryLog.tagged(self.id()), Profiler.phase(type(self).__name__), Profiler.phase(self._testMethodName):
+            return super().run(result)
+
+    def assertRowEqual(self, row, expected, types, msg=None):
+        self.assertEqual(len(row), len(expected), f'{msg}, number of columns' if msg else 'number of columns')
+        for j, (value, exp, typeName) in enumerate(zip(row, expected, types)):
+            where = f'{msg}, column {j+1}' if msg else f'column {j+1}'
+            if exp is ANY:
+                continue
+            elif isinstance(exp, re.Pattern):
+                self.assertRegex(str(value), exp, where)
+            elif isinstance(exp, list):
+                self.assertListEqual(value, exp, where)
+            elif isinstance(exp, dict):
+                self.assertDictEqual(value, exp, where)
+            elif isinstance(exp, tuple):
+                self.assertTupleEqual(value, exp, where)
+            else:
+                self.assertEqual(normalize(value, typeName), normalize(exp, typeName), where)
+
+    def verifyQuery(self, sql, expected, batchSize=1000):
+        """
+        Runs sql and checks the result row by row against the expected iterable while streaming,
+        in constant memory. Returns the RowStream statistics.
+        """
+        missing = object()
+        expected = iter(expected)
+        with closing(self.conn.cursor()) as cur:
+            stream = RowStream(cur, batchSize)
+            cur.execute(sql)
+            types = None
+            debug = self.logger.isEnabledFor(logging.DEBUG)
+            for row in stream:
+                if types is None:
+                    # the description is known once the first row arrived
+                    types = [column[1] for column in cur.description]
+                if debug:
+                    for j, value in enumerate(row):
+                        self.logger.debug(f'[{stream.rows:02d},{j+1:02d}]> {value}')
+                exp = next(expected, missing)
+                if exp is missing:
+                    self.fail(f"Did not get the expected number of rows, got more than {stream.rows - 1}")
+                self.assertRowEqual(row, exp, types, f'row {stream.rows}')
+            if next(expected, missing) is not missing:
+                self.fail(f"Did not get the expected number of rows, got {stream.rows}")
+        stats = stream.stats()
+        self.logger.info(f"{stats['rows']} rows verified, first row after {stats['timeToFirstRow'] or 0:.3f}s,"
+                         f" {stats['rowsPerSec'] or 0:.0f} rows/s, peak RSS {stats['peakRss'] >> 20} MB")
+        return stats
@@ -0,0 +1,359 @@
+"""
+Offline mode of the test suites and benchmarks: a process-local S3 stand-in (moto) serves the
+test bucket and an embedded DuckDB database runs the Trino SQL of the suites, translated with
+sqlglot. Selected with TRINO_TEST_ENV=offline (or offline=true in the target section of
+private/config.ini), it needs neither a Trino cluster nor network access.
+"""
+
+import atexit
+import functools
+import logging
+import re
+import threading
+import time
+
+import mixins
+
+CATALOGS = ['s3', 'hive', 'iceberg']
+
+class LocalS3:
+    """In-process S3 compatible server (moto), started once per process with the test bucket."""
+    server = None
+    endpoint = None
+    lock = threading.Lock()
+
+    @classmethod
+    def start(cls, bucket):
+        import boto3
+        from moto.server import ThreadedMotoServer
+
+        with cls.lock:
+            if cls.server is None:
+                logging.getLogger('werkzeug').setLevel(logging.ERROR)
+                cls.server = ThreadedMotoServer(ip_address='127.0.0.1', port=0, verbose=False)
+                cls.server.start()
+                host, port = cls.server.get_host_and_port()
+                cls.endpoint = f'http://{host}:{port}'
+                atexit.register(cls.stop)
+            s3 = boto3.client('s3', aws_access_key_id='offline', aws_secret_access_key='offline',
+                              endpoint_url=cls.endpoint, region_name='us-east-1')
+            s3.create_bucket(Bucket=bucket)
+            return cls.endpoint
+
+    @classmethod
+    def stop(cls):
+        with cls.lock:
+            if cls.server is not None:
+                cls.server.stop()
+                cls.server = None
+
+class Engine:
+    """
+    Process-wide DuckDB database, one attached in-memory database per Trino catalog. Keeps the
+    Trino DDL of the tables for SHOW CREATE TABLE and DESCRIBE, as DuckDB has no CHAR(n) and
+    no table properties.
+    """
+    instance = None
+    lock = threading.Lock()
+
+    @classmethod
+    def get(cls):
+        with cls.lock:
+            if cls.instance is None:
+                cls.instance = cls()
+            return cls.instance
+
+    def __init__(self):
+        import duckdb
+
+        self.db = duckdb.connect(':memory:')
+        self.db.execute("SET TimeZone='UTC'")
+        self.catalogs = set()
+        self.tables = {}
+        self.queries = 0
+        self.lock = threading.Lock()
+        for catalog in CATALOGS:
+            self.attach(catalog)
+
+    def attach(self, catalog):
+        with self.lock:
+            if catalog not in self.catalogs:
+                self.db.execute(f'ATTACH IF NOT EXISTS \':memory:\' AS "{catalog}"')
+                self.catalogs.add(catalog)
+
+    def nextQueryId(self):
+        with self.lock:
+            self.queries += 1
+            return f"{time.strftime('%Y%m%d_%H%M%S')}_{self.queries:05d}_duckdb"
+
+    def connect(self):
+        return EmbeddedConnection(self)
+
+class EmbeddedPool(mixins.TrinoPool):
+    """TrinoPool of the embedded engine, the connections are DuckDB cursors of one database."""
+
+    def connect(self):
+        return mixins.RecordingConnection(Engine.get().connect())
+
+class EmbeddedConnection:
+    """The part of trino.dbapi.Connection used by the suites."""
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def cursor(self):
+        return EmbeddedCursor(self.engine)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+def trinoType(t):
+    """Trino name of a DuckDB type, as in the description of a Trino cursor."""
+    from sqlglot import exp
+
+    name = str(t)
+    fixed = {
+        'TIMESTAMP_S': 'timestamp(0)', 'TIMESTAMP_MS': 'timestamp(3)', 'TIMESTAMP': 'timestamp(6)',
+        'TIMESTAMP_NS': 'timestamp(9)', 'TIMESTAMP WITH TIME ZONE': 'timestamp(6) with time zone',
+        'TIME': 'time(6)', 'HUGEINT': 'decimal(38,0)',
+    }
+    if name in fixed:
+        return fixed[name]
+    if t.id == 'struct':
+        return 'row(' + ', '.join(f'{n} {trinoType(c)}' for n, c in t.children) + ')'
+    if t.id == 'list':
+        return f'array({trinoType(t.child)})'
+    if t.id == 'map':
+        return f'map({trinoType(t.key)}, {trinoType(t.value)})'
+    return exp.DataType.build(name, dialect='duckdb').sql('trino').lower()
+
+def converter(t):
+    """Converts DuckDB values to what the Trino client returns (ROW as NamedRowTuple)."""
+    from trino.types import NamedRowTuple
+
+    if t.id == 'struct':
+        names = [n for n, _ in t.children]
+        types = [trinoType(c) for _, c in t.children]
+        convs = [converter(c) for _, c in t.children]
+        return lambda v: None if v is None else NamedRowTuple([c(v[n]) for n, c in zip(names, convs)], names, types)
+    if t.id == 'list':
+        child = converter(t.child)
+        return lambda v: None if v is None else [child(x) for x in v]
+    if t.id == 'map':
+        key, value = converter(t.key), converter(t.value)
+        return lambda v: None if v is None else {key(k): value(x) for k, x in v.items()}
+    return lambda v: v
+
+@functools.lru_cache(maxsize=None)
+def decimalType(precision, scale):
+    from sqlglot import exp
+
+    return exp.DataType.build(f'DECIMAL({precision}, {scale})')
+
+# Trino integer literals in hex (0x07f), sqlglot reads them as binary strings
+HEX_INTEGER = re.compile(r"'(?:[^']|'')*'|\b0[xX][0-9a-fA-F]+\b")
+SHOW = re.compile(r'^\s*SHOW\s+(CATALOGS|SCHEMAS\s+(?:FROM|IN)\s+(\S+)|TABLES\s+(?:FROM|IN)\s+(\S+)|CREATE\s+TABLE\s+(\S+))\s*;?\s*$',
+                  re.IGNORECASE)
+
+class EmbeddedCursor:
+    """
+    The part of trino.dbapi.Cursor used by the suites and benchmarks (execute, fetch*,
+    description with Trino type names, update_type, query_id, stats) on top of a DuckDB cursor.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.cur = engine.db.cursor()
+        self.description = None
+        self.update_type = None
+        self.query_id = None
+        self.stats = None
+        self.warnings = []
+        self.rowcount = -1
+        self.arraysize = 1
+        self.rows = None
+        self.converters = []
+        self.chars = {}
+
+    def translate(self, sql):
+        """Returns the DuckDB statement of a Trino statement, its update type and if it counts rows."""
+        import sqlglot
+        from sqlglot import exp
+
+        sql = HEX_INTEGER.sub(lambda m: m.group(0) if m.group(0).startswith("'") else str(int(m.group(0), 16)), sql)
+        tree = sqlglot.parse_one(sql, read='trino')
+        for table in tree.find_all(exp.Table):
+            if table.catalog:
+                self.engine.attach(table.catalog)
+        # DECIMAL 'x' literals have the precision and scale of x in Trino, not DuckDB's default DECIMAL(18,3)
+        for cast in list(tree.find_all(exp.Cast)):
+            if cast.to.this == exp.DataType.Type.DECIMAL and not cast.to.expressions and cast.this.is_string:
+                digits = cast.this.this.strip().lstrip('+-')
+                whole, _, fraction = digits.partition('.')
+                precision = max(len(whole.lstrip('0')) + len(fraction), 1)
+                cast.set('to', decimalType(precision, len(fraction)).copy())
+        # declared CHAR(n) columns of the referenced tables, DuckDB only knows them as VARCHAR
+        self.chars = {}
+        for table in tree.find_all(exp.Table):
+            _, columns = self.engine.tables.get(self.tableName(table), (None, []))
+            self.chars.update((name.lower(), type) for name, type in columns if type.startswith('char('))
+        # ROW(...) is positional in Trino, DuckDB casts only structs with matching field names
+        for struct in list(tree.find_all(exp.Struct)):
+            if not any(isinstance(e, (exp.PropertyEQ, exp.Alias)) for e in struct.expressions):
+                struct.replace(exp.Anonymous(this='row', expressions=struct.expressions))
+        if isinstance(tree, exp.Create):
+            tree.set('properties', None)
+            if tree.args.get('kind') == 'TABLE' and isinstance(tree.this, exp.Schema):
+                self.engine.tables[self.tableName(tree.this.this)] = (sql.strip(), [
+                    (c.name, c.args['kind'].sql('trino').lower()) for c in tree.this.expressions if isinstance(c, exp.ColumnDef)
+                ])
+                # CHAR(n) is VARCHAR in DuckDB, the values are padded on INSERT instead
+                for c in tree.this.expressions:
+                    if isinstance(c, exp.ColumnDef) and c.args['kind'].this == exp.DataType.Type.CHAR:
+                        c.set('kind', exp.DataType.build('VARCHAR'))
+            return tree.sql('duckdb'), f"CREATE {tree.args.get('kind')}", tree.expression is not None
+        if isinstance(tree, exp.Insert):
+            self.coerceValues(tree)
+            return tree.sql('duckdb'), 'INSERT', True
+        if isinstance(tree, exp.Drop):
+            for target in tree.args.get('tables') or [tree.this]:
+                name = self.tableName(target)
+                for table in [t for t in self.engine.tables if t == name or t.startswith(name + '.')]:
+                    del self.engine.tables[table]
+            return tree.sql('duckdb'), f"DROP {tree.args.get('kind')}", False
+        if isinstance(tree, (exp.Delete, exp.Update, exp.Merge)):
+            return tree.sql('duckdb'), tree.key.upper(), True
+        return tree.sql('duckdb'), None, False
+
+    @staticmethod
+    def tableName(table):
+        return '.'.join(p.name.lower() for p in table.parts)
+
+    def coerceValues(self, insert):
+        """
+        Pads the VALUES of the CHAR(n) columns as Trino does, and casts the decimal literals of
+        REAL/DOUBLE columns from their text, DuckDB rounds long DECIMAL literals on the cast.
+        """
+        from sqlglot import exp
+
+        table = insert.this.this if isinstance(insert.this, exp.Schema) else insert.this
+        _, columns = self.engine.tables.get(self.tableName(table), (None, []))
+        if isinstance(insert.this, exp.Schema):
+            types = dict(columns)
+            columns = [(c.name, types.get(c.name.lower(), '')) for c in insert.this.expressions]
+        values = insert.expression
+        if not columns or not isinstance(values, exp.Values):
+            return
+        for row in values.expressions:
+            for (_, type), value in zip(columns, row.expressions):
+                char = re.match(r'char\((\d+)\)$', type)
+                number = value.this if isinstance(value, exp.Neg) else value
+                if char:
+                    value.replace(exp.func('rpad', value.copy(), exp.Literal.number(int(char.group(1))), exp.Literal.string(' ')))
+                elif type in ('real', 'double') and isinstance(number, exp.Literal) and not number.is_string:
+                    text = f'-{number.this}' if number is not value else number.this
+                    value.replace(exp.cast(exp.Literal.string(text), type.upper()))
+
+    def show(self, match):
+        """SHOW statements, as queries on the DuckDB catalog or the kept Trino DDL."""
+        kind = match.group(1).split()[0].upper()
+        if kind == 'CATALOGS':
+            return ('SELECT database_name AS "Catalog" FROM duckdb_databases() '
+                    "WHERE NOT internal AND database_name <> 'memory' UNION SELECT 'system' ORDER BY 1")
+        if kind == 'SCHEMAS':
+            catalog = match.group(2).strip('"')
+            self.engine.attach(catalog)
+            return f"SELECT schema_name AS \"Schema\" FROM information_schema.schemata WHERE catalog_name = '{catalog}' ORDER BY 1"
+        if kind == 'TABLES':
+            catalog, schema = match.group(3).replace('"', '').split('.')
+            return (f"SELECT table_name AS \"Table\" FROM information_schema.tables "
+                    f"WHERE table_catalog = '{catalog}' AND table_schema = '{schema}' ORDER BY 1")
+        name = match.group(4).replace('"', '').lower()
+        if name not in self.engine.tables:
+            raise RuntimeError(f'Table {name} does not exist')
+        ddl = self.engine.tables[name][0].replace("'", "''")
+        return f"SELECT '{ddl}' AS \"Create Table\""
+
+    def execute(self, operation, params=None):
+        if params:
+            raise NotImplementedError('Query parameters are not supported offline')
+        self.query_id = self.engine.nextQueryId()
+        start = time.perf_counter()
+        cpu = time.process_time()
+        self.update_type = None
+        self.rows = None
+        match = SHOW.match(operation)
+        describe = re.match(r'^\s*(?:DESCRIBE|DESC)\s+(\S+)\s*;?\s*$', operation, re.IGNORECASE)
+        if re.match(r'^\s*CALL\s', operation, re.IGNORECASE):
+            raise NotImplementedError(f'Procedures are not supported offline: {operation.strip()}')
+        if describe and describe.group(1).replace('"', '').lower() in self.engine.tables:
+            _, columns = self.engine.tables[describe.group(1).replace('"', '').lower()]
+            self.rows = iter([[name, type, '', ''] for name, type in columns])
+            self.description = [(name, 'varchar', None, None, None, None, None) for name in ('Column', 'Type', 'Extra', 'Comment')]
+            self.converters = [lambda v: v] * 4
+        else:
+            if match:
+                sql, self.update_type, counts, self.chars = self.show(match), None, False, {}
+            else:
+                sql, self.update_type, counts = self.translate(operation)
+            self.cur.execute(sql)
+            if self.update_type is None:
+                self.description = [(d[0], self.chars.get(d[0].lower(), 'varchar') if str(d[1]) == 'VARCHAR' else trinoType(d[1]),
+                                     None, None, None, None, None) for d in self.cur.description]
+                self.converters = [converter(d[1]) for d in self.cur.description]
+            else:
+                result = self.cur.fetchall()
+                if not counts:
+                    self.description, rows = [('result', 'boolean', None, None, None, None, None)], [[True]]
+                else:
+                    self.rowcount = result[0][0] if result else 0
+                    self.description, rows = [('rows', 'bigint', None, None, None, None, None)], [[self.rowcount]]
+                self.converters = [lambda v: v]
+                self.rows = iter(rows)
+        elapsed = int((time.perf_counter() - start) * 1000)
+        self.stats = {
+            'queryId': self.query_id, 'state': 'RUNNING' if self.update_type is None else 'FINISHED',
+            'queued': False, 'scheduled': True, 'nodes': 1, 'totalSplits': 0, 'queuedSplits': 0,
+            'runningSplits': 0, 'completedSplits': 0, 'cpuTimeMillis': int((time.process_time() - cpu) * 1000),
+            'wallTimeMillis': elapsed, 'elapsedTimeMillis': elapsed, 'queuedTimeMillis': 0,
+            'processedRows': 0, 'processedBytes': 0, 'physicalInputBytes': 0, 'peakMemoryBytes': 0,
+            'spilledBytes': 0,
+        }
+        return self
+
+    def convert(self, row):
+        return [c(v) for c, v in zip(self.converters, row)]
+
+    def fetchone(self):
+        row = next(self.rows, None) if self.rows is not None else self.cur.fetchone()
+        if row is None:
+            self.stats['state'] = 'FINISHED'
+            return None
+        self.stats['processedRows'] += 1
+        return self.convert(row)
+
+    def fetchmany(self, size=None):
+        size = size or self.arraysize
+        if self.rows is not None:
+            rows = [row for _, row in zip(range(size), self.rows)]
+        else:
+            rows = self.cur.fetchmany(size)
+        if len(rows) < size:
+            self.stats['state'] = 'FINISHED'
+        self.stats['processedRows'] += len(rows)
+        return [self.convert(row) for row in rows]
+
+    def fetchall(self):
+        rows = list(self.rows) if self.rows is not None else self.cur.fetchall()
+        self.stats['state'] = 'FINISHED'
+        self.stats['processedRows'] += len(rows)
+        return [self.convert(row) for row in rows]
+
+    def cancel(self):
+        pass
+
+    def close(self):
+        self.cur.close()
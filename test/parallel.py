@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Runs the test suites in parallel, one process per suite: every suite creates its own
+unittest_<uuid> schema and S3 prefix, so they do not interfere, and the run takes about as long
+as the slowest suite instead of the sum of all of them.
+"""
+
+import argparse
+import glob
+import io
+import os
+import sys
+import time
+import unittest
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stderr, redirect_stdout
+from multiprocessing import get_context
+
+def runSuite(name, verbosity=1, failfast=False):
+    """Runs a test module, class or method in this process, returns its counts and captured output."""
+    output = io.StringIO()
+    start = time.perf_counter()
+    # the log handlers of mixins are created by setUpClass, they write to the captured stderr too
+    with redirect_stdout(output), redirect_stderr(output):
+        try:
+            suite = unittest.defaultTestLoader.loadTestsFromName(name)
+            result = unittest.TextTestRunner(stream=output, verbosity=verbosity, failfast=failfast).run(suite)
+            counts = {'tests': result.testsRun, 'failures': len(result.failures), 'errors': len(result.errors),
+                      'skipped': len(result.skipped), 'ok': result.wasSuccessful()}
+        except Exception as e:
+            print(f'{name}: {e!r}', file=output)
+            counts = {'tests': 0, 'failures': 0, 'errors': 1, 'skipped': 0, 'ok': False}
+    return dict(counts, name=name, elapsed=time.perf_counter() - start, output=output.getvalue())
+
+def suites():
+    here = os.path.dirname(os.path.abspath(__file__))
+    return sorted(os.path.basename(path)[:-3] for path in glob.glob(os.path.join(here, 'test_*.py')))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('names', nargs='*', help='test modules, classes or methods, default all test_*.py')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='parallel processes, default one per suite')
+    parser.add_argument('-v', '--verbose', action='store_const', const=2, default=1, help='verbose test output')
+    parser.add_argument('-f', '--failfast', action='store_true', help='stop a suite on its first failure')
+    args = parser.parse_args()
+
+    names = args.names or suites()
+    start = time.perf_counter()
+    results = []
+    # spawn, the workers must not inherit threads (S3 stand-in, pools) of the parent
+    with ProcessPoolExecutor(max_workers=args.jobs or len(names), mp_context=get_context('spawn')) as executor:
+        futures = [executor.submit(runSuite, name, args.verbose, args.failfast) for name in names]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            print(f"{'=' * 30} {result['name']} ({result['elapsed']:.1f}s) {'=' * 30}", file=sys.stderr)
+            print(result['output'], file=sys.stderr, flush=True)
+    elapsed = time.perf_counter() - start
+
+    for r in sorted(results, key=lambda r: r['name']):
+        print(f"{r['name']:<40} {'OK' if r['ok'] else 'FAILED':<7} {r['tests']:>4} tests {r['failures']:>3} failures"
+              f" {r['errors']:>3} errors {r['skipped']:>3} skipped {r['elapsed']:>8.1f}s")
+    print(f"Ran {sum(r['tests'] for r in results)} tests in {elapsed:.1f}s"
+          f" ({sum(r['elapsed'] for r in results):.1f}s sequential)")
+    sys.exit(0 if all(r['ok'] for r in results) else 1)
+
+if __name__ == '__main__':
+    main()
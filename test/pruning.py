@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Partition-pruning benchmark, creates tables with thousands of date partitions in the Hive and
+Iceberg catalogs and compares point, range and IN-list predicates on the partition column with a
+full scan: latency, planning time, splits, files and bytes read.
+"""
+
+import argparse
+from datetime import date, timedelta
+
+import bench
+import mixins
+
+CONNECTORS = {'s3': 'hive', 'hive': 'hive', 'iceberg': 'iceberg'}
+EPOCH = date(2000, 1, 1)
+
+class PruningReport(bench.Report):
+    columns = ['catalog', 'partitions', 'query', 'samples', 'p50', 'p95', 'planningTime', 'splits', 'files',
+               'physicalInputBytes', 'splitsRatio', 'filesRatio', 'bytesRatio']
+    dimensions = ['partitions', 'query']
+
+    def table(self):
+        lines = [f"{'catalog':<8} {'partitions':>10} {'query':<8} {'p50 ms':>9} {'plan ms':>8} {'splits':>7} {'files':>7}"
+                 f" {'bytes':>12} {'vs full scan':>14}"]
+        for r in self.results:
+            ratio = '-' if r['bytesRatio'] is None else f"{r['bytesRatio']:.2%}"
+            lines.append(f"{r['catalog']:<8} {r['partitions']:>10} {r['query']:<8} {r['p50']*1e3:>9.1f}"
+                         f" {(r['planningTime'] or 0)*1e3:>8.1f} {r['splits'] or 0:>7} {r['files'] or 0:>7}"
+                         f" {r['physicalInputBytes'] or 0:>12.0f} {ratio:>14}")
+        return '\n'.join(lines)
+
+class Pruning:
+    """
+    For each catalog and partition count, creates table_pruning_<n> partitioned by its DATE column d,
+    one partition per day from 2000-01-01 with rowsPerPartition rows each (INSERT ... SELECT from
+    sequences, batchSize partitions per INSERT to stay under the writers' max-partitions), then
+    times the queries with bench.Benchmark and probes each once for its splits (cursor stats),
+    planning time (query info) and the number of files it reads.
+    """
+
+    def __init__(self, catalogs, partitions, rowsPerPartition=100, batchSize=100, warmup=1, repeat=5):
+        self.catalogs = catalogs
+        self.partitions = partitions
+        self.rowsPerPartition = rowsPerPartition
+        self.batchSize = batchSize
+        self.warmup = warmup
+        self.repeat = repeat
+
+    @staticmethod
+    def day(i):
+        return f"DATE '{EPOCH + timedelta(days=i)}'"
+
+    def queries(self, n):
+        middle = n // 2
+        spread = [self.day(i * n // 10) for i in range(10)]
+        return [
+            ('full', "SELECT count(*), sum(v) FROM {table}"),
+            ('point', f"SELECT count(*), sum(v) FROM {{table}} WHERE d = {self.day(middle)}"),
+            ('range', f"SELECT count(*), sum(v) FROM {{table}} WHERE d BETWEEN {self.day(middle)} AND {self.day(middle + max(n // 100, 1) - 1)}"),
+            ('in_list', f"SELECT count(*), sum(v) FROM {{table}} WHERE d IN ({', '.join(spread)})"),
+        ]
+
+    def createTableSql(self, target, table, n):
+        location = f"s3a://{target.s3Bucket}/trino/data/unittest/{target.schemaNm}/{table.rsplit('.', 1)[-1]}"
+        if CONNECTORS[target.catalog] == 'iceberg':
+            properties = f"location='{location}', format='PARQUET', partitioning=ARRAY['d']"
+        else:
+            properties = f"external_location='{location}', format='PARQUET', partitioned_by=ARRAY['d']"
+        return f"CREATE TABLE IF NOT EXISTS {table}(id BIGINT, v DOUBLE, payload VARCHAR, d DATE) WITH ({properties})"
+
+    def insertSql(self, table, first, last):
+        return f"""
+            INSERT INTO {table}
+            SELECT k * {self.rowsPerPartition} + r, random(), to_hex(sha256(to_utf8(CAST(k * r AS VARCHAR)))),
+                   date_add('day', k, DATE '{EPOCH}')
+            FROM UNNEST(sequence({first}, {last - 1})) AS p(k)
+            CROSS JOIN UNNEST(sequence(1, {self.rowsPerPartition})) AS x(r)
+        """
+
+    def probe(self, target, sql):
+        """Splits and planning time of one run of sql, and the number of files it reads."""
+        result = {'splits': None, 'planningTime': None, 'files': None}
+        with target.pool.cursor() as cur:
+            cur.execute(sql)
+            cur.fetchall()
+            result['splits'] = (cur.stats or {}).get('totalSplits')
+            queryId = cur.query_id
+        if target.offline:
+            return result
+        try:
+            result['planningTime'] = mixins.QueryLog.info(target.pool, queryId).get('planningTime')
+        except Exception as e:
+            target.logger.warning(f'Query info of {queryId}: {e}')
+        try:
+            with target.pool.cursor() as cur:
+                cur.execute(sql.replace('count(*), sum(v)', 'count(DISTINCT "$path")', 1))
+                result['files'] = cur.fetchall()[0][0]
+        except Exception as e:
+            target.logger.warning(f'Files of {sql}: {e}')
+        return result
+
+    def run(self, report):
+        for catalog in self.catalogs:
+            target = type(f'Pruning{catalog.capitalize()}', (mixins.TrinoConnect,), {'_catalog': catalog})
+            target.setUpTrait()
+            try:
+                timer = bench.Benchmark(target, self.warmup, self.repeat)
+                timer.execute(f"CREATE SCHEMA IF NOT EXISTS {catalog}.{target.schemaNm}")
+                for n in self.partitions:
+                    table = f'{catalog}.{target.schemaNm}.table_pruning_{n}'
+                    timer.execute(self.createTableSql(target, table, n))
+                    for first in range(0, n, self.batchSize):
+                        timer.execute(self.insertSql(table, first, min(first + self.batchSize, n)))
+                    target.logger.info(f'{table}: {n} partitions of {self.rowsPerPartition} rows')
+                    full = None
+                    for name, sql in self.queries(n):
+                        sql = sql.format(table=table)
+                        result = timer.measure(f'{n}/{name}', sql)
+                        result.update(self.probe(target, sql), query=name, partitions=n)
+                        full = full or result
+                        for column, ratio in [('splits', 'splitsRatio'), ('files', 'filesRatio'), ('physicalInputBytes', 'bytesRatio')]:
+                            result[ratio] = result[column] / full[column] if result[column] is not None and full[column] else None
+                        report.add(result)
+                    timer.execute(f"DROP TABLE IF EXISTS {table}")
+            finally:
+                target.tearDownTrait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('catalogs', nargs='*', default=['hive', 'iceberg'], help='catalogs to benchmark')
+    parser.add_argument('-p', '--partitions', default='100,1000,5000', help='comma separated partition counts')
+    parser.add_argument('-r', '--rows', type=int, default=100, help='rows per partition')
+    parser.add_argument('-b', '--batch', type=int, default=100, help='partitions per INSERT')
+    parser.add_argument('-w', '--warmup', type=int, default=1, help='untimed runs per query')
+    parser.add_argument('-n', '--repeat', type=int, default=5, help='timed runs per query')
+    parser.add_argument('-o', '--output', default='private/bench', help='report directory')
+    args = parser.parse_args()
+
+    partitions = [int(p) for p in args.partitions.split(',') if p]
+    report = PruningReport('pruning', partitions=partitions, rows=args.rows, warmup=args.warmup, repeat=args.repeat)
+    Pruning(args.catalogs, partitions, args.rows, args.batch, args.warmup, args.repeat).run(report)
+    print(report.table())
+    print(f'Report: {report.write(args.output)}.{{json,csv}}')
+
+if __name__ == '__main__':
+    main()
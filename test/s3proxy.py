@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Request counting proxy in front of the S3 endpoint: forwards every request unchanged (path-style,
+the Host header is kept so that the SigV4 signatures stay valid) and records its operation,
+object key, byte range and size. Requests are attributed to the queries running when they
+arrive, so that the GET/HEAD/LIST requests, ranges and bytes each query sends to the object
+store can be reported, with the ranges that overlap or repeat earlier reads of the same query.
+
+Enabled for the suites and the benchmarks with TRINO_S3_PROXY=<listen address>, e.g.
+127.0.0.1:0 for the boto3 clients of the tests only, or 0.0.0.0:9000 with the s3.endpoint of the
+catalogs pointed at http://<this host>:9000 to also see the requests of Trino. Standalone:
+python3 s3proxy.py http://minio:9000 -l 0.0.0.0:9000
+"""
+
+import argparse
+import http.client
+import json
+import os
+import re
+import ssl
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+# headers of the hop, not forwarded
+HOP = {'connection', 'keep-alive', 'proxy-connection', 'transfer-encoding', 'te', 'trailer', 'upgrade', 'expect'}
+OUTSIDE = '(outside queries)'
+
+def operation(method, path, query):
+    """S3 operation of a path-style request: GET, HEAD, LIST, PUT, DELETE, POST (multi-object delete, multipart)."""
+    key = path.lstrip('/').partition('/')[2]
+    if method == 'GET' and (not key or 'list-type' in query or 'prefix' in query or 'delimiter' in query):
+        return 'LIST'
+    return method
+
+class Window:
+    """Requests of one query (or of the time outside queries), with the ranges read per object."""
+
+    def __init__(self, label, **info):
+        self.label = label
+        self.info = info
+        self.started = time.time()
+        self.ended = None
+        self.requests = {}
+        self.bytesRead = 0
+        self.bytesWritten = 0
+        self.shared = 0
+        self.errors = 0
+        self.ranges = {}
+        self.merged = {}
+        self.overlapBytes = 0
+        self.overlapping = 0
+        self.repeated = 0
+
+    def add(self, op, key, start, end, written, status, shared):
+        self.requests[op] = self.requests.get(op, 0) + 1
+        self.bytesWritten += written
+        self.shared += shared
+        self.errors += status >= 400
+        if op != 'GET' or start is None or status >= 300:
+            return
+        self.bytesRead += end - start
+        ranges = self.ranges.setdefault(key, [])
+        if [start, end] in ranges:
+            self.repeated += 1
+        ranges.append([start, end])
+        # overlap with the union of the ranges already read, then merged into it
+        merged, overlap = [], 0
+        for s, e in self.merged.get(key, []):
+            overlap += max(0, min(e, end) - max(s, start))
+            if e < start or s > end:
+                merged.append([s, e])
+            else:
+                start, end = min(s, start), max(e, end)
+        self.merged[key] = sorted(merged + [[start, end]])
+        if overlap:
+            self.overlapping += 1
+            self.overlapBytes += overlap
+
+    def summary(self):
+        return dict(self.info, label=self.label, started=self.started,
+                    seconds=(self.ended or time.time()) - self.started, requests=dict(self.requests),
+                    totalRequests=sum(self.requests.values()), bytesRead=self.bytesRead, bytesWritten=self.bytesWritten,
+                    objects=len(self.ranges), overlappingRanges=self.overlapping, repeatedRanges=self.repeated,
+                    overlapBytes=self.overlapBytes, sharedRequests=self.shared, errors=self.errors,
+                    ranges={key: ranges for key, ranges in self.ranges.items()})
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def upstream(self):
+        """Keep-alive connection to the upstream endpoint of this handler thread."""
+        proxy = self.server.proxy
+        conn = getattr(proxy.local, 'conn', None)
+        if conn is None:
+            if proxy.upstream.scheme == 'https':
+                conn = http.client.HTTPSConnection(proxy.upstream.hostname, proxy.upstream.port or 443, context=proxy.context, timeout=300)
+            else:
+                conn = http.client.HTTPConnection(proxy.upstream.hostname, proxy.upstream.port or 80, timeout=300)
+            proxy.local.conn = conn
+        return conn
+
+    def body(self):
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            chunks = []
+            while size := int(self.rfile.readline().split(b';')[0], 16):
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+            while self.rfile.readline() not in (b'\r\n', b'\n', b''):
+                pass
+            return b''.join(chunks)
+        return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+    def forward(self):
+        proxy = self.server.proxy
+        start = time.perf_counter()
+        body = self.body()
+        headers = [(k, v) for k, v in self.headers.items() if k.lower() not in HOP]
+        if body or self.command in ('PUT', 'POST'):
+            headers = [(k, v) for k, v in headers if k.lower() != 'content-length'] + [('Content-Length', str(len(body)))]
+        for attempt in range(2):
+            conn = self.upstream()
+            try:
+                conn.putrequest(self.command, self.path, skip_host=True, skip_accept_encoding=True)
+                for k, v in headers:
+                    conn.putheader(k, v)
+                conn.endheaders(body or None)
+                response = conn.getresponse()
+                break
+            except (http.client.RemoteDisconnected, ConnectionError, http.client.CannotSendRequest) as e:
+                # stale keep-alive connection, retried once
+                conn.close()
+                proxy.local.conn = None
+                if attempt:
+                    self.send_error(502, f'Upstream {proxy.upstream.netloc}: {e}')
+                    return
+
+        self.send_response_only(response.status, response.reason)
+        length = response.getheader('Content-Length')
+        data = None if length is not None or self.command == 'HEAD' else response.read()
+        for k, v in response.getheaders():
+            if k.lower() not in HOP and not (data is not None and k.lower() == 'content-length'):
+                self.send_header(k, v)
+        if data is not None:
+            self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        sent = 0
+        if data is not None:
+            self.wfile.write(data)
+            sent = len(data)
+        elif self.command != 'HEAD':
+            while chunk := response.read(1 << 16):
+                self.wfile.write(chunk)
+                sent += len(chunk)
+        if response.will_close:
+            conn.close()
+            proxy.local.conn = None
+
+        url = urlsplit(self.path)
+        op = operation(self.command, url.path, parse_qs(url.query, keep_blank_values=True))
+        key = unquote(url.path.lstrip('/'))
+        served = re.match(r'bytes (\d+)-(\d+)/', response.getheader('Content-Range') or '')
+        first, last = (int(served.group(1)), int(served.group(2)) + 1) if served else (0, sent)
+        proxy.record(op, key, first, last, len(body), response.status, time.perf_counter() - start)
+
+    do_GET = do_HEAD = do_PUT = do_POST = do_DELETE = forward
+
+class S3Proxy:
+    """
+    Threaded HTTP proxy to one S3 endpoint. begin()/end() open and close the window of a query,
+    a request is counted in every window open when it arrives (sharedRequests when there are
+    several), or in the window outside queries.
+    """
+    instance = None
+    lock = threading.Lock()
+
+    @classmethod
+    def start(cls, listen, upstream, verify=True):
+        """Starts the proxy of the process once, returns its endpoint URL for the local clients."""
+        with cls.lock:
+            if cls.instance is None:
+                cls.instance = cls(listen, upstream, verify)
+            return cls.instance.endpoint
+
+    def __init__(self, listen, upstream, verify=True):
+        host, _, port = listen.rpartition(':')
+        self.upstream = urlsplit(upstream if '://' in upstream else f'https://{upstream}')
+        self.context = ssl.create_default_context(cafile=verify if isinstance(verify, str) else None)
+        if verify is False:
+            self.context.check_hostname = False
+            self.context.verify_mode = ssl.CERT_NONE
+        self.local = threading.local()
+        self.recordLock = threading.Lock()
+        self.windows = {}
+        self.closed = []
+        self.outside = Window(OUTSIDE)
+        self.nextToken = 0
+        self.exports = 0
+        self.started = time.strftime('%Y-%m-%dT%H%M%S')
+        self.server = ThreadingHTTPServer((host or '127.0.0.1', int(port or 0)), Handler)
+        self.server.daemon_threads = True
+        self.server.proxy = self
+        address, port = self.server.server_address[:2]
+        self.endpoint = f"http://{'127.0.0.1' if address in ('0.0.0.0', '') else address}:{port}"
+        threading.Thread(target=self.server.serve_forever, name='s3proxy', daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def begin(self, label, **info):
+        with self.recordLock:
+            self.nextToken += 1
+            self.windows[self.nextToken] = Window(label, **info)
+            return self.nextToken
+
+    def end(self, token, **info):
+        """Closes the window of a query and returns its summary."""
+        with self.recordLock:
+            window = self.windows.pop(token, None)
+            if window is None:
+                return None
+            window.ended = time.time()
+            window.info.update(info)
+            self.closed.append(window)
+            return window.summary()
+
+    @contextmanager
+    def window(self, label, **info):
+        token = self.begin(label, **info)
+        try:
+            yield
+        finally:
+            self.end(token)
+
+    def record(self, op, key, start, end, written, status, seconds):
+        with self.recordLock:
+            windows = list(self.windows.values()) or [self.outside]
+            for window in windows:
+                window.add(op, key, start, end, written, status, len(windows) > 1)
+
+    def summaries(self):
+        """Summaries of the windows not exported yet, closed and open, and of the window outside queries."""
+        with self.recordLock:
+            return [w.summary() for w in self.closed + list(self.windows.values()) + [self.outside]]
+
+    def export(self, outdir=None):
+        """
+        Writes the windows closed since the last export and the window outside queries to a new
+        report and drops them, so that a long run (one export per test class) holds only the
+        windows of the running class. The open windows are written by the export after their end.
+        """
+        outdir = outdir or os.getenv('TRINO_S3_PROXY_STATS', 'private/s3proxy')
+        os.makedirs(outdir, exist_ok=True)
+        with self.recordLock:
+            windows, self.closed = self.closed + [self.outside], []
+            self.outside = Window(OUTSIDE)
+            self.exports += 1
+            exports = self.exports
+        path = os.path.join(outdir, f's3_{self.started}_{os.getpid()}_{exports}.json')
+        with open(path, 'w') as f:
+            json.dump({'started': self.started, 'upstream': self.upstream.geturl(), 'windows': [w.summary() for w in windows]},
+                      f, indent=2, default=str)
+        return path
+
+def table(summaries):
+    lines = [f"{'query':<48} {'GET':>6} {'HEAD':>5} {'LIST':>5} {'PUT':>5} {'MiB read':>9} {'objects':>7} {'overlap':>7} {'repeat':>6} {'MiB twice':>9}"]
+    for s in summaries:
+        if not s['totalRequests']:
+            continue
+        r = s['requests']
+        lines.append(f"{s['label'][:48]:<48} {r.get('GET', 0):>6} {r.get('HEAD', 0):>5} {r.get('LIST', 0):>5} {r.get('PUT', 0):>5}"
+                     f" {s['bytesRead']/2**20:>9.2f} {s['objects']:>7} {s['overlappingRanges']:>7} {s['repeatedRanges']:>6}"
+                     f" {s['overlapBytes']/2**20:>9.2f}{' !' if s['overlapBytes'] else ''}")
+    return '\n'.join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('upstream', help='S3 endpoint, e.g. http://minio:9000')
+    parser.add_argument('-l', '--listen', default='127.0.0.1:9000', help='listen address')
+    parser.add_argument('-k', '--insecure', action='store_true', help='do not verify the certificate of the upstream')
+    parser.add_argument('-o', '--output', default='private/s3proxy', help='report directory')
+    args = parser.parse_args()
+
+    proxy = S3Proxy(args.listen, args.upstream, not args.insecure)
+    print(f'Proxy {proxy.endpoint} -> {args.upstream}, Ctrl-C to stop')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    proxy.stop()
+    print(table(proxy.summaries()))
+    print(f'Report: {proxy.export(args.output)}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Large result extracts through Trino's spooling protocol: the coordinator returns the URIs of
+result segments spooled on S3, which are downloaded and decoded by a pool of threads as they
+arrive, instead of every row coming back through the coordinator's paged JSON protocol.
+Compares the throughput of the direct protocol, of the client's sequential segment iterator
+and of the parallel fetch on the same query.
+"""
+
+import argparse
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import bench
+import mixins
+
+def encodings():
+    """Spooling encodings supported by the installed client, compressed first."""
+    import trino.client
+
+    return [e for e in ('json+zstd', 'json+lz4', 'json')
+            if e in trino.client.ENCODINGS and (e.split('+')[1] if '+' in e else None) not in trino.client.CODECS_UNAVAILABLE]
+
+class SegmentFetcher:
+    """
+    Runs a query with a segment cursor on a pool using the spooling protocol. The segments of
+    each result page are submitted to workers threads that download (spooled segments) or
+    decode (inline segments) them, map their rows and acknowledge them, at most inflight at a
+    time. Rows are passed to consume in the order of the result when ordered, as the segments
+    complete otherwise. Servers without spooling return plain pages, which are consumed as is.
+    """
+
+    def __init__(self, pool, workers=8, inflight=None, ordered=True):
+        self.pool = pool
+        self.workers = workers
+        self.inflight = inflight or 2 * workers
+        self.ordered = ordered
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+
+    def close(self):
+        self.executor.shutdown()
+
+    def load(self, segment, mapper, stats, lock):
+        from trino.client import CompressedQueryDataDecoderFactory, SpooledSegment
+
+        start = time.perf_counter()
+        data = segment.segment.data
+        downloaded = time.perf_counter()
+        rows = CompressedQueryDataDecoderFactory(mapper).create(segment.encoding).decode(data, segment.segment.metadata)
+        spooled = isinstance(segment.segment, SpooledSegment)
+        if spooled:
+            segment.segment.acknowledge()
+        with lock:
+            stats['segments'] += 1
+            stats['spooledSegments'] += spooled
+            stats['segmentBytes'] += len(data)
+            stats['downloadTime'] += downloaded - start
+            stats['decodeTime'] += time.perf_counter() - downloaded
+        return rows
+
+    def execute(self, sql, consume=lambda rows: None):
+        from trino.client import DecodableSegment
+        from trino.mapper import RowMapperFactory
+
+        stats = {'rows': 0, 'segments': 0, 'spooledSegments': 0, 'segmentBytes': 0, 'plainRows': 0,
+                 'downloadTime': 0.0, 'decodeTime': 0.0, 'timeToFirstRow': None}
+        lock = threading.Lock()
+        pending = deque()
+        start = time.perf_counter()
+
+        def deliver(rows):
+            if rows and stats['timeToFirstRow'] is None:
+                stats['timeToFirstRow'] = time.perf_counter() - start
+            stats['rows'] += len(rows)
+            consume(rows)
+
+        def drain(limit):
+            while len(pending) > limit:
+                if self.ordered:
+                    deliver(pending.popleft().result())
+                else:
+                    done = next((f for f in pending if f.done()), None) or pending[0]
+                    pending.remove(done)
+                    deliver(done.result())
+
+        with self.pool.connection() as conn:
+            cur = conn.cursor('segment')
+            try:
+                cur.execute(sql)
+                mapper = None
+                for item in iter(cur.fetchone, None):
+                    if not isinstance(item, DecodableSegment):
+                        # a row of the direct protocol, the server does not spool
+                        drain(0)
+                        stats['plainRows'] += 1
+                        deliver([item])
+                        continue
+                    if mapper is None:
+                        mapper = RowMapperFactory().create(columns=cur._query.columns, legacy_primitive_types=False)
+                    pending.append(self.executor.submit(self.load, item, mapper, stats, lock))
+                    drain(self.inflight)
+                drain(0)
+                stats['queryStats'] = dict(cur.stats or {})
+            finally:
+                while pending:
+                    pending.popleft().cancel()
+                cur.close()
+        stats['seconds'] = time.perf_counter() - start
+        stats['rowsPerSec'] = stats['rows'] / stats['seconds'] if stats['seconds'] > 0 else None
+        return stats
+
+class SpoolReport(bench.Report):
+    columns = ['mode', 'workers', 'samples', 'p50', 'p95', 'rows', 'rowsPerSec', 'timeToFirstRow', 'segments',
+               'spooledSegments', 'segmentBytes', 'speedup']
+    dimensions = ['mode', 'workers']
+
+    def table(self):
+        lines = [f"{'mode':<10} {'workers':>7} {'p50 s':>8} {'rows':>10} {'rows/s':>12} {'first row ms':>12} {'segments':>9}"
+                 f" {'MiB':>8} {'speedup':>8}"]
+        for r in self.results:
+            lines.append(f"{r['mode']:<10} {r['workers'] or '-':>7} {r['p50']:>8.2f} {r['rows']:>10} {r['rowsPerSec'] or 0:>12.0f}"
+                         f" {(r['timeToFirstRow'] or 0)*1e3:>12.1f} {r['segments'] or 0:>9} {(r['segmentBytes'] or 0)/2**20:>8.1f}"
+                         f" {r['speedup'] or 0:>7.2f}x")
+        return '\n'.join(lines)
+
+class SpoolBenchmark:
+    """
+    Times the query with the direct protocol (the suites' pool), with the spooling protocol read
+    by the client's sequential segment iterator, and with SegmentFetcher for each worker count.
+    """
+
+    def __init__(self, target, sql, workers=(1, 4, 16), warmup=1, repeat=3, ordered=True):
+        self.target = target
+        self.sql = sql
+        self.workers = workers
+        self.warmup = warmup
+        self.repeat = repeat
+        self.ordered = ordered
+
+    def direct(self, pool):
+        rows, first = 0, None
+        start = time.perf_counter()
+        with pool.cursor() as cur:
+            cur.execute(self.sql)
+            while batch := cur.fetchmany(10000):
+                if first is None:
+                    first = time.perf_counter() - start
+                rows += len(batch)
+        return {'rows': rows, 'timeToFirstRow': first}
+
+    def measure(self, mode, workers, run):
+        samples, results = [], []
+        for i in range(self.warmup + self.repeat):
+            start = time.perf_counter()
+            result = run()
+            if i >= self.warmup:
+                samples.append(time.perf_counter() - start)
+                results.append(result)
+        last = results[-1]
+        summary = {
+            'mode': mode, 'workers': workers, 'samples': len(samples),
+            'p50': bench.percentile(samples, 50), 'p95': bench.percentile(samples, 95), 'rows': last['rows'],
+            'rowsPerSec': last['rows'] / bench.percentile(samples, 50) if samples else None,
+            'timeToFirstRow': bench.percentile([r['timeToFirstRow'] or 0 for r in results], 50),
+            'segments': last.get('segments'), 'spooledSegments': last.get('spooledSegments'),
+            'segmentBytes': last.get('segmentBytes'), 'latencies': samples,
+        }
+        self.target.logger.info(f"{mode}/{workers or '-'}: p50 {summary['p50']:.2f}s, {summary['rowsPerSec'] or 0:.0f} rows/s")
+        return summary
+
+    def run(self, report):
+        target = self.target
+        results = [self.measure('direct', None, lambda: self.direct(target.pool))]
+        if target.offline:
+            target.logger.warning('The embedded engine has no spooling protocol, only the direct protocol is measured')
+        else:
+            spooling = mixins.TrinoPool.get(host=target.trinoHost, port=target.trinoPort, scheme=target.trinoScheme,
+                                            user='test', verify=False, maxSize=max(self.workers) + 1, encoding=encodings())
+            results.append(self.measure('spooled', None, lambda: self.direct(spooling)))
+            for workers in self.workers:
+                fetcher = SegmentFetcher(spooling, workers, ordered=self.ordered)
+                try:
+                    results.append(self.measure('parallel', workers, lambda: fetcher.execute(self.sql)))
+                finally:
+                    fetcher.close()
+            if not results[-1]['spooledSegments']:
+                target.logger.warning('No spooled segments, is protocol.spooling.enabled set on the cluster?')
+        for result in results:
+            result['speedup'] = results[0]['p50'] / result['p50'] if result['p50'] else None
+            report.add(result)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('catalog', nargs='?', default='hive', help='catalog of the session')
+    parser.add_argument('-q', '--query', help='query to extract, default a generated result of -r rows')
+    parser.add_argument('-r', '--rows', type=int, default=1000000, help='rows of the generated result')
+    parser.add_argument('-j', '--workers', default='1,4,16', help='comma separated parallel fetch threads')
+    parser.add_argument('-u', '--unordered', action='store_true', help='consume segments as they complete')
+    parser.add_argument('-w', '--warmup', type=int, default=1, help='untimed runs per mode')
+    parser.add_argument('-n', '--repeat', type=int, default=3, help='timed runs per mode')
+    parser.add_argument('-o', '--output', default='private/bench', help='report directory')
+    args = parser.parse_args()
+
+    outer = max(-(-args.rows // 1000), 1)
+    sql = args.query or f"""
+        SELECT o * 1000 + i AS id, random() AS value, to_hex(md5(to_utf8(CAST(o * 1000 + i AS VARCHAR)))) AS payload,
+               date_add('day', i, DATE '2024-01-01') AS day
+        FROM UNNEST(sequence(0, {outer - 1})) AS a(o) CROSS JOIN UNNEST(sequence(0, {min(args.rows, 1000) - 1})) AS b(i)
+    """
+    workers = [int(w) for w in args.workers.split(',') if w]
+    target = type(f'Spooled{args.catalog.capitalize()}', (mixins.TrinoConnect,), {'_catalog': args.catalog})
+    target.setUpTrait()
+    try:
+        report = SpoolReport('spooled', query=' '.join(sql.split()), workers=workers, warmup=args.warmup, repeat=args.repeat)
+        SpoolBenchmark(target, sql, workers, args.warmup, args.repeat, not args.unordered).run(report)
+    finally:
+        target.tearDownTrait()
+    print(report.table())
+    print(f'Report: {report.write(args.output)}.{{json,csv}}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Sweeps what interrupted runs leave behind: when a suite crashes or is killed, tearDownTrait does
+not run and its unittest_<uuid> schema stays in the catalogs, with its data under
+trino/data/unittest/ and trino/warehouse/ of the bucket. Schemas and prefixes without activity
+for longer than the minimum age are dropped and deleted, and the reclaimed objects and bytes are
+reported.
+"""
+
+import argparse
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bench
+import mixins
+
+SCHEMA = re.compile(r'unittest_[0-9a-f]{8}')
+PREFIXES = ['trino/data/unittest/', 'trino/warehouse/']
+
+def parseAge(value):
+    """Parses a minimum age as a duration ('90m', '6h', '2d') or plain seconds."""
+    seconds = mixins.parseDuration(value)
+    if seconds is None:
+        try:
+            seconds = float(value)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f'Invalid age: {value}')
+    return seconds
+
+class RateLimiter:
+    """Spaces the calls of acquire() by at least 1/rate seconds across threads, no limit without rate."""
+
+    def __init__(self, rate=None):
+        self.interval = 1 / rate if rate else 0
+        self.next = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            wait = self.next - now
+            self.next = max(now, self.next) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+class SweepReport(bench.Report):
+    columns = ['schema', 'catalogs', 'prefixes', 'age', 'objects', 'bytes', 'action', 'failed']
+    dimensions = None
+
+    def table(self):
+        lines = [f"{'schema':<18} {'catalogs':<16} {'prefixes':>8} {'age h':>8} {'objects':>9} {'MiB':>10} {'action':<10}"]
+        for r in self.results:
+            age = f"{r['age'] / 3600:>8.1f}" if r['age'] is not None else f"{'-':>8}"
+            lines.append(f"{r['schema']:<18} {','.join(r['catalogs']) or '-':<16} {len(r['prefixes']):>8} {age}"
+                         f" {r['objects']:>9} {r['bytes'] / 2**20:>10.1f} {r['action']:<10}")
+        lines.append(f"{'total':<18} {'':<16} {sum(len(r['prefixes']) for r in self.results):>8} {'':>8}"
+                     f" {sum(r['objects'] for r in self.results):>9} {sum(r['bytes'] for r in self.results) / 2**20:>10.1f}")
+        return '\n'.join(lines)
+
+class Sweeper:
+    """
+    Finds the unittest schemas of the catalogs and their prefixes in the bucket, and the last
+    activity of each: the newest object under its prefixes and the newest query naming it in
+    system.runtime.queries (a query still running counts as now). Those idle for more than
+    minAge seconds are orphans. Those without any trace of activity, e.g. a schema just created
+    by a run on another host whose queries the coordinator no longer lists, are skipped unless
+    includeUntraced is set. The schemas are dropped
+    (CASCADE) and the prefixes deleted with TrinoConnect.deleteS3Folder, workers orphans at a
+    time, the statements and prefix deletions spaced by the rate limiter.
+    """
+
+    def __init__(self, target, catalogs, minAge=6 * 3600, workers=4, s3Workers=4, rate=None, dryRun=False,
+                 includeUntraced=False):
+        self.target = target
+        self.catalogs = catalogs
+        self.minAge = minAge
+        self.workers = workers
+        self.s3Workers = s3Workers
+        self.limiter = RateLimiter(rate)
+        self.dryRun = dryRun
+        self.includeUntraced = includeUntraced
+
+    def query(self, sql):
+        with self.target.pool.cursor() as cur:
+            cur.execute(sql)
+            return cur.fetchall()
+
+    def activity(self):
+        """Last query on each unittest schema known to the coordinator, as epoch seconds."""
+        if self.target.offline:
+            return {}
+        try:
+            rows = self.query(f"""
+                SELECT schema, max(created), count_if(state NOT IN ('FINISHED', 'FAILED'))
+                FROM system.runtime.queries CROSS JOIN UNNEST(regexp_extract_all(query, '{SCHEMA.pattern}')) AS t(schema)
+                GROUP BY schema
+            """)
+        except Exception as e:
+            self.target.logger.warning(f'Query history unavailable, ages from S3 only: {e}')
+            return {}
+        return {schema: time.time() if running else created.timestamp() for schema, created, running in rows}
+
+    def find(self):
+        target = self.target
+        found = {}
+        def orphan(schema):
+            return found.setdefault(schema, {'schema': schema, 'catalogs': [], 'prefixes': [], 'age': None,
+                                             'objects': 0, 'bytes': 0, 'action': None, 'failed': 0, 'modified': None})
+
+        for catalog in self.catalogs:
+            try:
+                schemas = [row[0] for row in self.query(f'SHOW SCHEMAS FROM {catalog}')]
+            except Exception as e:
+                target.logger.warning(f'Schemas of {catalog}: {e}')
+                continue
+            for schema in schemas:
+                if SCHEMA.fullmatch(schema):
+                    orphan(schema)['catalogs'].append(catalog)
+
+        if target.hasS3Credentials():
+            s3 = target.s3Client()
+            for parent in PREFIXES:
+                for prefix in target.listS3Prefixes(s3, parent):
+                    match = SCHEMA.fullmatch(prefix[len(parent):].rstrip('/').removesuffix('.db'))
+                    if not match:
+                        continue
+                    entry = orphan(match.group(0))
+                    entry['prefixes'].append(prefix)
+                    for key, size, modified in target.listS3Objects(s3, prefix, modified=True):
+                        entry['objects'] += 1
+                        entry['bytes'] += size
+                        entry['modified'] = max(entry['modified'] or modified, modified)
+        else:
+            target.logger.warning(f'No S3 credentials, only the schemas are swept')
+
+        now = time.time()
+        queries = self.activity()
+        orphans, skipped = [], []
+        for schema, entry in sorted(found.items()):
+            if schema == target.schemaNm:
+                continue
+            last = max([t for t in (entry.pop('modified'), queries.get(schema)) if t is not None], default=None)
+            entry['age'] = now - last if last is not None else None
+            if entry['age'] is None and not self.includeUntraced:
+                target.logger.warning(f'Skip {schema}, no trace of activity (--include-untraced to sweep it)')
+                skipped.append(entry)
+            elif entry['age'] is None or entry['age'] >= self.minAge:
+                orphans.append(entry)
+            else:
+                target.logger.info(f'Keep {schema}, active {entry["age"]:.0f}s ago')
+        return orphans, skipped
+
+    def sweep(self, entry):
+        target = self.target
+        for catalog in entry['catalogs']:
+            self.limiter.acquire()
+            self.query(f'DROP SCHEMA IF EXISTS {catalog}.{entry["schema"]} CASCADE')
+            target.logger.info(f'Dropped {catalog}.{entry["schema"]}')
+        # the tables are gone, what is left under the prefixes is the reclaimed space
+        entry['objects'] = entry['bytes'] = 0
+        if entry['prefixes']:
+            s3 = target.s3Client()
+            for prefix in entry['prefixes']:
+                self.limiter.acquire()
+                stats = target.deleteS3Folder(s3, prefix, workers=self.s3Workers)
+                entry['objects'] += stats['objects']
+                entry['bytes'] += stats['bytes']
+                entry['failed'] += len(stats['failed'])
+        return entry
+
+    def run(self, report):
+        target = self.target
+        orphans, skipped = self.find()
+        for entry in skipped:
+            report.add(dict(entry, action='skipped'))
+        target.logger.info(f"{len(orphans)} orphans older than {self.minAge:.0f}s, "
+                           f"{sum(o['objects'] for o in orphans)} objects, {sum(o['bytes'] for o in orphans)} bytes")
+        if self.dryRun:
+            for entry in orphans:
+                report.add(dict(entry, action='dry-run'))
+            return
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for entry, future in mixins.boundedMap(pool, self.sweep, orphans, self.workers):
+                try:
+                    report.add(dict(future.result(), action='swept'))
+                except Exception as e:
+                    target.logger.warning(f'Sweep {entry["schema"]}: {e}')
+                    report.add(dict(entry, action='error'))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('catalogs', nargs='*', default=['s3', 'hive', 'iceberg'], help='catalogs to sweep')
+    parser.add_argument('-a', '--age', type=parseAge, default='6h', help='minimum idle time of an orphan (90m, 6h, 2d)')
+    parser.add_argument('-j', '--workers', type=int, default=4, help='orphans swept concurrently')
+    parser.add_argument('-s', '--s3-workers', type=int, default=4, help='delete threads per prefix')
+    parser.add_argument('-r', '--rate', type=float, help='maximum DROP SCHEMA and prefix deletions per second')
+    parser.add_argument('-n', '--dry-run', action='store_true', help='only report the orphans')
+    parser.add_argument('--include-untraced', action='store_true',
+                        help='also sweep the schemas without S3 objects nor recent queries, skipped by default')
+    parser.add_argument('-o', '--output', default='private/bench', help='report directory')
+    args = parser.parse_args()
+
+    target = type('Sweeper', (mixins.TrinoConnect,), {'_catalog': args.catalogs[0] if args.catalogs else 'hive'})
+    target.setUpTrait()
+    try:
+        report = SweepReport('sweep', catalogs=args.catalogs, age=args.age, workers=args.workers, rate=args.rate,
+                             dryRun=args.dry_run, includeUntraced=args.include_untraced)
+        Sweeper(target, args.catalogs, args.age, args.workers, args.s3_workers, args.rate, args.dry_run,
+                args.include_untraced).run(report)
+    finally:
+        target.tearDownTrait()
+    print(report.table())
+    print(f'Report: {report.write(args.output)}.{{json,csv}}')
+
+if __name__ == '__main__':
+    main()
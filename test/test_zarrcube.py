@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+import json
+import tempfile
+import unittest
+
+try:
+    import numpy as np
+    import zarrcube
+    import zarrgen
+except ImportError:
+    np = None
+
+@unittest.skipIf(np is None, 'numpy is not installed')
+class TestZarrCube(unittest.TestCase):
+    """CubeEngine reductions against NumPy on a small local store, no cluster needed."""
+
+    shape = (7, 8, 10)
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = zarrcube.LocalStore(self.tmp.name)
+        self.generator = zarrgen.Generator(self.store, zarrgen.Layout(2, (3, 4, 5), compressor='none'), self.shape[0], self.shape[1:])
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def writeArray(self, name, values):
+        self.generator.writeArray(name, values.shape, values.dtype, 0, ('time', 'y', 'x'), {}, lambda region: values[region],
+                                  chunks=(3, 4, 5))
+        for key in (f'{name}/.zarray', f'{name}/.zattrs'):
+            self.store.put(key, json.dumps(self.generator.metadata[key]).encode())
+
+    def testIntegerMinMax(self):
+        rng = np.random.default_rng(42)
+        arrays = {
+            'I32': rng.integers(-1000, 1000, self.shape, dtype=np.int32),
+            'I64': rng.integers(2**62, 2**63 - 1, self.shape, dtype=np.int64),
+            'U16': rng.integers(1, 2**16 - 1, self.shape, dtype=np.uint16),
+        }
+        for name, values in arrays.items():
+            self.writeArray(name, values)
+        engine = zarrcube.CubeEngine(zarrcube.Dataset(self.store), workers=4)
+        try:
+            for name, values in arrays.items():
+                for op in ('min', 'max'):
+                    for dim, axis in (('time', 0), ('x', 2)):
+                        with self.subTest(array=name, op=op, dim=dim):
+                            result = engine.reduce(name, dim, op, y=slice(1, 7))
+                            expected = getattr(values[:, 1:7, :], op)(axis=axis)
+                            self.assertEqual(result.data.dtype, values.dtype)
+                            np.testing.assert_array_equal(result.data, expected)
+        finally:
+            engine.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Declarative workload (DDL, data, queries and expected results) run against every catalog and
+file format, reported side by side as a performance matrix of latency and bytes scanned.
+"""
+
+import argparse
+import uuid
+from collections import namedtuple
+from datetime import date, datetime, time as dtime
+from decimal import Decimal
+from zoneinfo import ZoneInfo
+
+import bench
+import mixins
+from datagen import TrinoType, literal
+
+CONNECTORS = {'s3': 'hive', 'hive': 'hive', 'iceberg': 'iceberg'}
+FORMATS = {'hive': ['PARQUET', 'ORC'], 'iceberg': ['PARQUET', 'ORC', 'AVRO']}
+
+class Column:
+    """Logical column, type is a Trino type or a {catalog: type} dict, catalogs restricts its support."""
+
+    def __init__(self, name, type, catalogs=None):
+        self.name = name
+        self.type = type
+        self.catalogs = catalogs
+
+    def supports(self, catalog):
+        return self.catalogs is None or catalog in self.catalogs
+
+    def typeFor(self, catalog):
+        return self.type[catalog] if isinstance(self.type, dict) else self.type
+
+class Query:
+    """Logical query, sql has a {table} placeholder, expected(rows, columns) gives the expected result."""
+
+    def __init__(self, name, sql, expected):
+        self.name = name
+        self.sql = sql
+        self.expected = expected
+
+class Workload:
+    def __init__(self, name, columns, partition, rows, queries):
+        self.name = name
+        self.columns = columns
+        self.partition = partition
+        self.rows = rows
+        self.queries = queries
+
+    def columnsFor(self, catalog):
+        """Supported (name, TrinoType) of a catalog, the partition column last as Hive requires."""
+        columns = [c for c in self.columns if c.supports(catalog)]
+        columns.sort(key=lambda c: c.name == self.partition)
+        return [(c.name, TrinoType.parse(c.typeFor(catalog))) for c in columns]
+
+    def createTableSql(self, catalog, format, table, location):
+        columns = ',\n  '.join(f'{name} {t.sql()}' for name, t in self.columnsFor(catalog))
+        if CONNECTORS[catalog] == 'iceberg':
+            properties = f"location='{location}', format='{format}', partitioning=ARRAY['{self.partition}']"
+        else:
+            properties = f"external_location='{location}', format='{format}', partitioned_by=ARRAY['{self.partition}']"
+        return f"CREATE TABLE IF NOT EXISTS {table}(\n  {columns}\n) WITH ({properties})"
+
+    def insertSql(self, catalog, table):
+        columns = self.columnsFor(catalog)
+        values = ',\n'.join('(' + ', '.join(literal(t, row[name]) for name, t in columns) + ')' for row in self.rows)
+        return f"INSERT INTO {table} VALUES\n{values}"
+
+def canonical(value, typeName=''):
+    """Comparable form of a result or expected value (ROW tuples, MAP items, padded CHAR, REAL)."""
+    value = mixins.normalize(value, typeName)
+    if isinstance(value, tuple):
+        return tuple(canonical(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((canonical(k), canonical(v)) for k, v in value.items()))
+    if isinstance(value, list):
+        return [canonical(v) for v in value]
+    return value
+
+def project(*names):
+    return lambda rows, columns: [tuple(row[n] for n in names) for row in rows]
+
+HIVE = ('s3', 'hive')
+ICEBERG = ('iceberg',)
+Row = namedtuple('Row', 'a b')
+
+TABLE_1 = Workload(
+    name='table_1',
+    columns=[
+        Column('c_int', 'integer'),
+        Column('c_tinyint', 'tinyint', HIVE),
+        Column('c_smallint', 'smallint', HIVE),
+        Column('c_bigint', 'bigint'),
+        Column('c_boolean', 'boolean'),
+        Column('c_real', 'real'),
+        Column('c_double', 'double'),
+        Column('c_decimal', 'decimal(20,10)'),
+        Column('c_varchar', 'varchar'),
+        Column('c_char', 'char(80)', HIVE),
+        Column('c_varbinary', 'varbinary'),
+        Column('c_array', 'array(integer)'),
+        Column('c_map', 'map(varchar, integer)'),
+        Column('c_row', 'row(a varchar, b integer)'),
+        Column('c_uuid', 'uuid', ICEBERG),
+        Column('c_time', 'time(6)', ICEBERG),
+        Column('c_timestamp', {'s3': 'timestamp(3)', 'hive': 'timestamp(3)', 'iceberg': 'timestamp(6)'}),
+        Column('c_timestamptz', 'timestamp(6) with time zone', ICEBERG),
+        Column('c_date', 'date'),
+    ],
+    partition='c_date',
+    rows=[
+        {
+            'c_int': mixins.Consts.minInt, 'c_tinyint': mixins.Consts.minTiny, 'c_smallint': mixins.Consts.minSmall,
+            'c_bigint': mixins.Consts.minBig, 'c_boolean': True, 'c_real': .14285715, 'c_double': .14285714285714285714,
+            'c_decimal': Decimal('3.14'), 'c_varchar': f'{mixins.Consts.range("AZ","az","09")}\'{mixins.Consts.symbols}',
+            'c_char': mixins.Consts.symbols, 'c_varbinary': b'eh?', 'c_array': [1, 2, 3], 'c_map': {'foo': 1, 'bar': 2},
+            'c_row': Row(mixins.Consts.symbols, 0x07f), 'c_uuid': uuid.UUID('3f0c6a1e-4a4b-4c65-9d3e-1b2f0e6c7a81'),
+            'c_time': dtime(15, 55, 23), 'c_timestamp': datetime(2024, 7, 1, 15, 55, 23, 123000),
+            'c_timestamptz': datetime(2024, 7, 1, 15, 55, 23, 123456, tzinfo=ZoneInfo('Europe/Zurich')), 'c_date': date(2024, 7, 1),
+        },
+        {
+            'c_int': mixins.Consts.maxInt, 'c_tinyint': mixins.Consts.maxTiny, 'c_smallint': mixins.Consts.maxSmall,
+            'c_bigint': mixins.Consts.maxBig, 'c_boolean': True, 'c_real': -.14285715, 'c_double': -.14285714285714285714,
+            'c_decimal': Decimal('-3.14'), 'c_varchar': f'{mixins.Consts.accents}{mixins.Consts.specials}',
+            'c_char': mixins.Consts.accents, 'c_varbinary': b'eh?', 'c_array': [1, 2, 3], 'c_map': {'foo': 1, 'bar': 2},
+            'c_row': Row(mixins.Consts.specials, -2), 'c_uuid': uuid.UUID('b7e2d4c0-93a8-4f1e-8c2b-6d5a0f9e3c17'),
+            'c_time': dtime(15, 55, 23), 'c_timestamp': datetime(2024, 7, 1, 15, 55, 23, 123000),
+            'c_timestamptz': datetime(2024, 7, 1, 15, 55, 23, 123456, tzinfo=ZoneInfo('GMT')), 'c_date': date(2024, 7, 2),
+        },
+    ],
+    queries=[
+        Query('full_scan', "SELECT * FROM {table}",
+              lambda rows, columns: [tuple(row[n] for n, _ in columns) for row in rows]),
+        Query('count', "SELECT count(*) FROM {table}", lambda rows, columns: [(len(rows),)]),
+        Query('projection', "SELECT c_varchar FROM {table}", project('c_varchar')),
+        Query('filter', "SELECT c_int, c_bigint FROM {table} WHERE c_int > 0",
+              lambda rows, columns: [(r['c_int'], r['c_bigint']) for r in rows if r['c_int'] > 0]),
+        Query('partition_filter', "SELECT c_int FROM {table} WHERE c_date = DATE '2024-07-01'",
+              lambda rows, columns: [(r['c_int'],) for r in rows if r['c_date'] == date(2024, 7, 1)]),
+        Query('aggregate', "SELECT min(c_int), max(c_int), count(DISTINCT c_varchar) FROM {table}",
+              lambda rows, columns: [(min(r['c_int'] for r in rows), max(r['c_int'] for r in rows), len({r['c_varchar'] for r in rows}))]),
+    ],
+)
+
+class Suite:
+    """
+    Table of a test suite (mixins.TestCase) built from a workload: DDL, INSERT and expected
+    rows of its catalog, one PARQUET table under the unittest prefix of the suite's schema.
+    """
+
+    table = TABLE_1
+
+    @classmethod
+    def tableName(cls):
+        return f"{cls.catalog}.{cls.schemaNm}.{cls.table.name}"
+
+    @classmethod
+    def createTableSql(cls):
+        location = f's3a://{cls.s3Bucket}/trino/data/unittest/{cls.schemaNm}/parquet/{cls.table.name}'
+        return cls.table.createTableSql(cls.catalog, 'PARQUET', cls.tableName(), location)
+
+    @classmethod
+    def insertSql(cls):
+        return cls.table.insertSql(cls.catalog, cls.tableName())
+
+    @classmethod
+    def selectSql(cls):
+        return f"SELECT * FROM {cls.tableName()}"
+
+    def expectedRows(self):
+        """Rows of the full scan, in the order of the workload rows."""
+        columns = self.table.columnsFor(self.catalog)
+        for row in self.table.rows:
+            yield tuple(row[name] for name, _ in columns)
+
+class MatrixReport(bench.Report):
+    columns = ['catalog', 'format', 'query', 'verified', 'samples', 'p50', 'p95', 'p99', 'physicalInputBytes', 'bytes']
+    dimensions = ['format', 'query']
+
+    def table(self):
+        targets = list(dict.fromkeys(f"{r['catalog']}/{r['format']}" for r in self.results))
+        queries = list(dict.fromkeys(r['query'] for r in self.results))
+        cells = {(f"{r['catalog']}/{r['format']}", r['query']): r for r in self.results}
+        lines = [f"{'p50 ms | bytes scanned':<24}" + ''.join(f'{t:>24}' for t in targets)]
+        for query in queries:
+            line = f'{query:<24}'
+            for target in targets:
+                r = cells.get((target, query))
+                cell = '-' if r is None else f"{r['p50']*1e3:.1f} | {r['physicalInputBytes'] or 0:.0f}{'' if r['verified'] else ' !'}"
+                line += f'{cell:>24}'
+            lines.append(line)
+        return '\n'.join(lines)
+
+class Matrix:
+    """
+    Runs a workload against each catalog and file format: creates one table per format in a
+    unittest_<uuid> schema of the catalog, loads the rows, verifies every query once against its
+    expected result, then times it with bench.Benchmark.
+    """
+
+    def __init__(self, workload, catalogs, formats=None, warmup=2, repeat=10):
+        self.workload = workload
+        self.catalogs = catalogs
+        self.formats = formats
+        self.warmup = warmup
+        self.repeat = repeat
+
+    def verify(self, target, catalog, query, sql):
+        with target.pool.cursor() as cur:
+            cur.execute(sql)
+            rows = cur.fetchall()
+            types = [column[1] for column in cur.description]
+        actual = sorted((tuple(canonical(v, t) for v, t in zip(row, types)) for row in rows), key=repr)
+        expected = sorted((tuple(canonical(v, t) for v, t in zip(row, types))
+                           for row in query.expected(self.workload.rows, self.workload.columnsFor(catalog))), key=repr)
+        if actual != expected:
+            target.logger.warning(f'{query.name} on {catalog}: got {actual}, expected {expected}')
+        return actual == expected
+
+    def run(self, report):
+        for catalog in self.catalogs:
+            target = type(f'Matrix{catalog.capitalize()}', (mixins.TrinoConnect,), {'_catalog': catalog})
+            target.setUpTrait()
+            try:
+                timer = bench.Benchmark(target, self.warmup, self.repeat)
+                timer.execute(f"CREATE SCHEMA IF NOT EXISTS {catalog}.{target.schemaNm}")
+                for format in self.formats or FORMATS[CONNECTORS[catalog]]:
+                    table = f'{catalog}.{target.schemaNm}.{self.workload.name}_{format.lower()}'
+                    location = f's3a://{target.s3Bucket}/trino/data/unittest/{target.schemaNm}/{format.lower()}/{self.workload.name}'
+                    timer.execute(self.workload.createTableSql(catalog, format, table, location))
+                    timer.execute(self.workload.insertSql(catalog, table))
+                    for query in self.workload.queries:
+                        sql = query.sql.format(table=table)
+                        verified = self.verify(target, catalog, query, sql)
+                        result = timer.measure(f'{format}/{query.name}', sql)
+                        result.update({'format': format, 'query': query.name, 'verified': verified})
+                        report.add(result)
+            finally:
+                target.tearDownTrait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('catalogs', nargs='*', default=['s3', 'hive', 'iceberg'], help='catalogs to compare')
+    parser.add_argument('-f', '--format', action='append', help='file format(s), default all supported by the catalog')
+    parser.add_argument('-w', '--warmup', type=int, default=2, help='untimed runs per query')
+    parser.add_argument('-n', '--repeat', type=int, default=10, help='timed runs per query')
+    parser.add_argument('-o', '--output', default='private/bench', help='report directory')
+    args = parser.parse_args()
+
+    report = MatrixReport('matrix', workload=TABLE_1.name, warmup=args.warmup, repeat=args.repeat)
+    Matrix(TABLE_1, args.catalogs, args.format, args.warmup, args.repeat).run(report)
+    print(report.table())
+    print(f'Report: {report.write(args.output)}.{{json,csv}}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Write path benchmark: INSERT of generated rows from the client, INSERT ... SELECT and CREATE
+TABLE AS SELECT at increasing volumes and with writer session properties, with the number and
+size distribution of the files each write leaves under the table location, to catch the small
+files that slow down every later scan.
+"""
+
+import argparse
+import re
+import time
+
+import bench
+import mixins
+from datagen import Loader
+
+MODES = ['insert', 'insert_select', 'ctas']
+# upper bounds of the file size buckets of the report
+BUCKETS = [('<1MB', 2**20), ('<8MB', 2**23), ('<32MB', 2**25), ('<128MB', 2**27), ('<512MB', 2**29), ('>=512MB', None)]
+
+def dataFiles(suite, location):
+    """Sizes of the data files under a table location (without Iceberg metadata), None without S3 credentials."""
+    if location is None or not suite.hasS3Credentials():
+        return None
+    key = location.split('://', 1)[1].split('/', 1)[1]
+    return [size for path, size in suite.listS3Objects(suite.s3Client(), key.rstrip('/') + '/') if '/metadata/' not in path]
+
+def distribution(sizes, small):
+    """Count, bytes, percentiles and histogram of file sizes, small files are those below small bytes."""
+    histogram = dict.fromkeys((label for label, _ in BUCKETS), 0)
+    for size in sizes:
+        histogram[next(label for label, bound in BUCKETS if bound is None or size < bound)] += 1
+    return {
+        'files': len(sizes), 'storedBytes': sum(sizes), 'smallFiles': sum(size < small for size in sizes),
+        'minSize': min(sizes, default=None), 'p10Size': bench.percentile(sizes, 10), 'p50Size': bench.percentile(sizes, 50),
+        'p90Size': bench.percentile(sizes, 90), 'maxSize': max(sizes, default=None), 'histogram': histogram,
+    }
+
+def parseSettings(text):
+    """'task_writer_count=8,hive.target_max_file_size=256MB' to a dict of session properties."""
+    settings = {}
+    for item in text.split(','):
+        name, sep, value = item.partition('=')
+        if not sep or not name.strip():
+            raise argparse.ArgumentTypeError(f'Invalid session property: {item}')
+        settings[name.strip()] = value.strip()
+    return settings
+
+class WriteReport(bench.Report):
+    columns = ['catalog', 'mode', 'rows', 'settings', 'seconds', 'rowsPerSec', 'files', 'storedBytes', 'smallFiles',
+               'minSize', 'p10Size', 'p50Size', 'p90Size', 'maxSize', 'bytesPerSec']
+    dimensions = ['mode', 'rows', 'settings']
+
+    def table(self):
+        lines = [f"{'catalog':<8} {'mode':<14} {'rows':>9} {'settings':<32} {'seconds':>8} {'rows/s':>10} {'files':>6}"
+                 f" {'small':>6} {'p50 MiB':>8} {'MiB':>9}"]
+        for r in self.results:
+            settings = ','.join(f'{k}={v}' for k, v in r['settings'].items()) or 'default'
+            lines.append(f"{r['catalog']:<8} {r['mode']:<14} {r['rows']:>9} {settings[:32]:<32} {r['seconds']:>8.1f}"
+                         f" {r['rowsPerSec'] or 0:>10.0f} {r['files'] or 0:>6} {r['smallFiles'] or 0:>6}"
+                         f" {(r['p50Size'] or 0)/2**20:>8.2f} {(r['storedBytes'] or 0)/2**20:>9.1f}")
+        return '\n'.join(lines)
+
+class WriteBenchmark:
+    """
+    Writes volumes of rows into fresh copies of the table_1 of a suite class, once per mode and
+    set of session properties. insert sends batched multi-row INSERTs of generated rows from the
+    client (datagen.Loader), insert_select and ctas copy the first rows (by key) of a source
+    table loaded once with the largest volume, so that only the writers are measured. The
+    properties are set with SET SESSION on the suite connection for insert_select and ctas and
+    reset after, and given to the pooled connections of the Loader for insert. Each copy is
+    listed with TrinoConnect.listS3Objects, then dropped and its prefix deleted.
+    """
+
+    def __init__(self, suite, volumes, modes=None, settings=None, small=32 * 2**20, loadPath='insert', days=365, workers=4):
+        self.suite = suite
+        self.volumes = sorted(volumes)
+        self.modes = modes or MODES
+        self.settings = settings or [{}]
+        self.small = small
+        self.loadPath = loadPath
+        self.days = days
+        self.workers = workers
+        self.warned = False
+
+    def properties(self, name):
+        """The WITH clause of the suite's table_1 for a table name, for CREATE TABLE AS."""
+        ddl = self.suite.createTableSql().replace('table_1', name)
+        return re.search(r'\)\s*WITH\s*\((.*)\)\s*$', ddl, re.DOTALL).group(1).strip()
+
+    def location(self, name):
+        """The location of the suite's table_1 for a table name."""
+        match = re.search(r"location\s*=\s*'([^']*)'", self.suite.createTableSql().replace('table_1', name))
+        return match.group(1) if match else None
+
+    def write(self, timer, mode, table, rows, source, key):
+        if mode == 'insert':
+            timer.execute(self.suite.createTableSql().replace('table_1', table.table))
+            start = time.perf_counter()
+            table.load('insert', rows, days=self.days, key=key)
+            return time.perf_counter() - start, rows
+        if mode == 'insert_select':
+            timer.execute(self.suite.createTableSql().replace('table_1', table.table))
+            sql = f'INSERT INTO {table.qualifiedName} SELECT * FROM {source} WHERE {key} < {rows}'
+        else:
+            sql = f'CREATE TABLE {table.qualifiedName} WITH ({self.properties(table.table)}) AS SELECT * FROM {source} WHERE {key} < {rows}'
+        start = time.perf_counter()
+        result = timer.execute(sql)
+        # the update count, the rows actually written
+        return time.perf_counter() - start, result[0][0] if result and result[0] else rows
+
+    def apply(self, timer, settings, reset=False):
+        if self.suite.offline:
+            if settings and not reset and not self.warned:
+                self.suite.logger.warning(f'Session properties are ignored offline: {settings}')
+                self.warned = True
+            return
+        for name in settings:
+            timer.execute(f'RESET SESSION {name}' if reset else f"SET SESSION {name} = {self.literal(settings[name])}")
+
+    @staticmethod
+    def literal(value):
+        return value if re.fullmatch(r'-?[0-9]+|true|false', value, re.IGNORECASE) else f"'{value}'"
+
+    def run(self, report, key='c_int'):
+        suite = self.suite
+        suite.setUpTrait()
+        try:
+            timer = bench.Benchmark(suite)
+            timer.execute(f"CREATE SCHEMA IF NOT EXISTS {suite.catalog}.{suite.schemaNm}")
+            source = None
+            if set(self.modes) - {'insert'}:
+                timer.execute(suite.createTableSql())
+                source = Loader(suite, 'table_1', self.workers)
+                source.load(self.loadPath, self.volumes[-1], days=self.days, key=key)
+            run = 0
+            for settings in self.settings:
+                for mode in self.modes:
+                    for rows in self.volumes:
+                        run += 1
+                        # the client INSERTs run on other pooled connections than the suite's
+                        table = Loader(suite, f'table_write_{run}', self.workers, session=settings if mode == 'insert' else None)
+                        self.apply(timer, settings)
+                        try:
+                            seconds, written = self.write(timer, mode, table, rows, source and source.qualifiedName, key)
+                        except Exception as e:
+                            suite.logger.warning(f'{mode}/{rows} with {settings or "default"} failed: {e}')
+                            continue
+                        finally:
+                            self.apply(timer, settings, reset=True)
+                        location = self.location(table.table)
+                        sizes = dataFiles(suite, location)
+                        result = {'catalog': suite.catalog, 'mode': mode, 'rows': written, 'settings': settings,
+                                  'seconds': seconds, 'rowsPerSec': written / seconds if seconds > 0 else None}
+                        result.update(distribution(sizes, self.small) if sizes is not None else dict.fromkeys(['files', 'storedBytes', 'smallFiles']))
+                        result['bytesPerSec'] = result['storedBytes'] / seconds if result['storedBytes'] and seconds > 0 else None
+                        suite.logger.info(f"{mode}/{rows}: {result['rowsPerSec'] or 0:.0f} rows/s, {result['files']} files,"
+                                          f" {result['smallFiles']} below {self.small} bytes")
+                        report.add(result)
+                        timer.execute(f'DROP TABLE IF EXISTS {table.qualifiedName}')
+                        if location is not None and suite.hasS3Credentials():
+                            suite.deleteS3Folder(suite.s3Client(), location.split('://', 1)[1].split('/', 1)[1])
+        finally:
+            suite.tearDownTrait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('suites', nargs='*', default=['test_hive', 'test_iceberg'], help='test modules whose table_1 to write')
+    parser.add_argument('-v', '--volumes', default='10000,100000,1000000', help='comma separated rows per write')
+    parser.add_argument('-m', '--mode', choices=MODES, action='append', help='write mode(s), default all')
+    parser.add_argument('-s', '--session', type=parseSettings, action='append',
+                        help='session properties of a variant, e.g. task_writer_count=8,hive.target_max_file_size=256MB')
+    parser.add_argument('-S', '--small', default='32MB', help='size below which a file is small')
+    parser.add_argument('-d', '--days', type=int, default=365, help='days (partitions) the generated rows spread over')
+    parser.add_argument('-p', '--path', choices=['insert', 'parquet'], default='insert', help='load path of the source rows')
+    parser.add_argument('-w', '--workers', type=int, default=4, help='concurrent INSERT batches')
+    parser.add_argument('-o', '--output', default='private/bench', help='report directory')
+    args = parser.parse_args()
+
+    volumes = [int(v) for v in args.volumes.split(',') if v]
+    small = mixins.parseDataSize(args.small)
+    settings = [{}] + (args.session or [])
+    report = WriteReport('writes', volumes=volumes, small=small, days=args.days)
+    for suite in bench.suites(args.suites):
+        WriteBenchmark(suite, volumes, args.mode, settings, small, args.path, args.days, args.workers).run(report)
+    print(report.table())
+    print(f'Report: {report.write(args.output)}.{{json,csv}}')
+
+if __name__ == '__main__':
+    main()
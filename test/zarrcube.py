@@ -0,0 +1,625 @@
+#!/usr/bin/env python3
+"""
+Reference Zarr cube-selection engine, the correctness oracle and performance baseline of the Zarr
+connector (trino-zarr-plugin): opens a Zarr v2 or v3 store on S3 or in a local directory, maps
+coordinate ranges (e.g. latitude, longitude, time) to the chunks they touch, fetches only those
+with concurrent GETs (byte-range GETs of the inner chunks of v3 shards), decodes them with
+numcodecs and assembles a NumPy array, or reduces it along a dimension like the
+zarr_average(chunk, 'time') UDF of the README.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+class LocalStore:
+    def __init__(self, root):
+        self.root = root
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'bytes': 0}
+
+    def __str__(self):
+        return self.root
+
+    def count(self, data):
+        with self.lock:
+            self.stats['requests'] += 1
+            self.stats['bytes'] += len(data or b'')
+        return data
+
+    def get(self, key, start=None, end=None):
+        """Bytes of key, or of its [start, end) range (start < 0: its last -start bytes), None if missing."""
+        try:
+            with open(os.path.join(self.root, *key.split('/')), 'rb') as f:
+                if start is not None:
+                    f.seek(start, os.SEEK_END if start < 0 else os.SEEK_SET)
+                return self.count(f.read() if start is None or start < 0 else f.read(end - start))
+        except (FileNotFoundError, NotADirectoryError):
+            return self.count(None)
+
+    def put(self, key, data):
+        path = os.path.join(self.root, *key.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+
+    def clear(self):
+        import shutil
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def list(self, prefix=''):
+        """Names of the children of the prefix folder."""
+        try:
+            return sorted(os.listdir(os.path.join(self.root, *prefix.split('/'))))
+        except FileNotFoundError:
+            return []
+
+class S3Store(LocalStore):
+    def __init__(self, client, bucket, prefix=''):
+        super().__init__(prefix.strip('/'))
+        self.client = client
+        self.bucket = bucket
+
+    def __str__(self):
+        return f's3://{self.bucket}/{self.root}'
+
+    def path(self, key):
+        return f'{self.root}/{key}' if self.root else key
+
+    def get(self, key, start=None, end=None):
+        from botocore.exceptions import ClientError
+
+        args = {}
+        if start is not None:
+            args['Range'] = f'bytes={start}' if start < 0 else f'bytes={start}-{end - 1}'
+        try:
+            return self.count(self.client.get_object(Bucket=self.bucket, Key=self.path(key), **args)['Body'].read())
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey'):
+                return self.count(None)
+            raise
+
+    def put(self, key, data):
+        self.client.put_object(Bucket=self.bucket, Key=self.path(key), Body=data)
+
+    def clear(self):
+        if not self.root:
+            raise ValueError(f'Refusing to clear the whole bucket {self.bucket}')
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.path('')):
+            keys = [{'Key': o['Key']} for o in page.get('Contents', [])]
+            if keys:
+                self.client.delete_objects(Bucket=self.bucket, Delete={'Objects': keys, 'Quiet': True})
+
+    def list(self, prefix=''):
+        base = self.path(prefix).rstrip('/') + '/' if self.path(prefix) else ''
+        names = []
+        for page in self.client.get_paginator('list_objects_v2').paginate(Bucket=self.bucket, Prefix=base, Delimiter='/'):
+            names += [p['Prefix'][len(base):].rstrip('/') for p in page.get('CommonPrefixes', [])]
+            names += [o['Key'][len(base):] for o in page.get('Contents', [])]
+        return sorted(names)
+
+V3_TYPES = {
+    'bool': 'bool', 'int8': 'i1', 'int16': 'i2', 'int32': 'i4', 'int64': 'i8', 'uint8': 'u1', 'uint16': 'u2',
+    'uint32': 'u4', 'uint64': 'u8', 'float16': 'f2', 'float32': 'f4', 'float64': 'f8', 'complex64': 'c8',
+    'complex128': 'c16',
+}
+EMPTY = 2**64 - 1
+
+def fillValue(value, dtype):
+    if value is None:
+        return np.nan if dtype.kind in 'fc' else 0
+    if isinstance(value, str) and value in ('NaN', 'Infinity', '-Infinity'):
+        return float(value.replace('Infinity', 'inf'))
+    if isinstance(value, str) and value.startswith('0x'):
+        return np.frombuffer(int(value, 16).to_bytes(dtype.itemsize, 'big'), dtype.newbyteorder('>'))[0]
+    return value
+
+def bytesCodec(spec):
+    """numcodecs codec of a v3 bytes-to-bytes codec spec, None for crc32c (stripped, not verified)."""
+    import numcodecs
+
+    name, config = spec['name'], dict(spec.get('configuration', {}))
+    if name == 'crc32c':
+        return None
+    if name == 'blosc':
+        shuffle = {'noshuffle': 0, 'shuffle': 1, 'bitshuffle': 2}.get(config.get('shuffle'), config.get('shuffle', 1))
+        return numcodecs.Blosc(cname=config.get('cname', 'zstd'), clevel=config.get('clevel', 5), shuffle=shuffle,
+                               blocksize=config.get('blocksize', 0))
+    return numcodecs.get_codec(dict(config, id=name.removeprefix('numcodecs.')))
+
+class Array:
+    """
+    Metadata of a Zarr array and the decoding of its chunks. For sharded v3 arrays, chunks is the
+    shape of the inner chunks, the read unit, and shards the shape of the stored objects.
+    """
+
+    def __init__(self, path, shape, chunks, dtype, fill, dims, attrs):
+        self.path = path
+        self.shape = tuple(shape)
+        self.chunks = tuple(chunks)
+        self.dtype = np.dtype(dtype)
+        self.fill = fillValue(fill, self.dtype)
+        self.dims = tuple(dims or (f'dim_{i}' for i in range(len(shape))))
+        self.attrs = attrs
+        self.shards = None
+
+    @classmethod
+    def fromV2(cls, path, zarray, zattrs):
+        import numcodecs
+
+        array = cls(path, zarray['shape'], zarray['chunks'], zarray['dtype'], zarray.get('fill_value'),
+                    zattrs.get('_ARRAY_DIMENSIONS'), zattrs)
+        array.version = 2
+        array.order = zarray.get('order', 'C')
+        array.separator = zarray.get('dimension_separator', '.')
+        array.compressor = zarray.get('compressor') and numcodecs.get_codec(zarray['compressor'])
+        array.filters = [numcodecs.get_codec(f) for f in zarray.get('filters') or []]
+        return array
+
+    @classmethod
+    def fromV3(cls, path, meta):
+        chunks = meta['chunk_grid']['configuration']['chunk_shape']
+        codecs = meta.get('codecs', [])
+        sharding = next((c for c in codecs if c['name'] == 'sharding_indexed'), None)
+        dtype = np.dtype(V3_TYPES[meta['data_type']])
+        inner = sharding['configuration'] if sharding else None
+        array = cls(path, meta['shape'], inner['chunk_shape'] if inner else chunks, dtype, meta.get('fill_value'),
+                    meta.get('dimension_names'), meta.get('attributes', {}))
+        array.version = 3
+        encoding = meta.get('chunk_key_encoding', {'name': 'default'})
+        array.encoding = encoding['name']
+        array.separator = encoding.get('configuration', {}).get('separator', '/' if encoding['name'] == 'default' else '.')
+        array.codecs = inner['codecs'] if inner else codecs
+        if inner:
+            array.shards = tuple(chunks)
+            array.perShard = tuple(s // c for s, c in zip(chunks, array.chunks))
+            array.indexCodecs = inner.get('index_codecs', [{'name': 'bytes', 'configuration': {'endian': 'little'}}, {'name': 'crc32c'}])
+            array.indexAtEnd = inner.get('index_location', 'end') == 'end'
+            array.indexSize = 16 * int(np.prod(array.perShard)) + 4 * sum(c['name'] == 'crc32c' for c in array.indexCodecs)
+        return array
+
+    def key(self, idx):
+        """Key of the stored object (chunk or shard) at grid index idx."""
+        if self.version == 2:
+            name = self.separator.join(map(str, idx)) or '0'
+        elif self.encoding == 'v2':
+            name = self.separator.join(map(str, idx)) or '0'
+        else:
+            name = self.separator.join(['c', *map(str, idx)])
+        return f'{self.path}/{name}' if self.path else name
+
+    def empty(self):
+        return np.full(self.chunks, self.fill, self.dtype)
+
+    def decode(self, data):
+        """Chunk array of the stored bytes, the fill value if missing."""
+        if data is None:
+            return self.empty()
+        if self.version == 2:
+            if self.compressor:
+                data = self.compressor.decode(data)
+            for f in reversed(self.filters):
+                data = f.decode(data)
+            data = data if isinstance(data, np.ndarray) else np.frombuffer(data, np.uint8)
+            return data.reshape(-1).view(self.dtype).reshape(self.chunks, order=self.order)
+        return self.decodeV3(data, self.codecs, self.chunks, self.dtype)
+
+    @staticmethod
+    def decodeV3(data, codecs, shape, dtype):
+        names = [c['name'] for c in codecs]
+        split = next(i for i, name in enumerate(names) if name in ('bytes', 'sharding_indexed'))
+        for spec in reversed(codecs[split + 1:]):
+            codec = bytesCodec(spec)
+            data = data[:-4] if codec is None else codec.decode(data)
+        data = data if isinstance(data, np.ndarray) else np.frombuffer(data, np.uint8)
+        endian = codecs[split].get('configuration', {}).get('endian', 'little')
+        order = [c['configuration']['order'] for c in codecs[:split] if c['name'] == 'transpose']
+        stored = tuple(np.array(shape)[order[0]]) if order else tuple(shape)
+        array = data.reshape(-1).view(dtype.newbyteorder('<' if endian == 'little' else '>')).reshape(stored)
+        return array.transpose(np.argsort(order[0])) if order else array
+
+    def decodeIndex(self, data):
+        """(offset, nbytes) of the inner chunks of a shard, None if the shard is missing."""
+        if data is None:
+            return None
+        return self.decodeV3(data, self.indexCodecs, self.perShard + (2,), np.dtype('u8'))
+
+class Dataset:
+    """Zarr group, opens the arrays on demand from their v2 (.zarray, .zattrs) or v3 (zarr.json) metadata."""
+
+    def __init__(self, store):
+        self.store = store
+        self.arrays = {}
+        self.consolidated = {}
+        root = store.get('zarr.json')
+        if root is not None:
+            self.version = 3
+            meta = json.loads(root)
+            self.attrs = meta.get('attributes', {})
+            self.consolidated = (meta.get('consolidated_metadata') or {}).get('metadata', {})
+        else:
+            self.version = 2
+            zmetadata = store.get('.zmetadata')
+            self.consolidated = json.loads(zmetadata)['metadata'] if zmetadata else {}
+            self.attrs = self.json('.zattrs') or {}
+
+    def json(self, key):
+        if key in self.consolidated:
+            return self.consolidated[key]
+        data = self.store.get(key)
+        return None if data is None else json.loads(data)
+
+    def meta(self, path):
+        return (self.consolidated.get(path) if self.version == 3 else None) or self.json(f'{path}/zarr.json')
+
+    def array(self, path):
+        if path not in self.arrays:
+            if self.version == 3:
+                meta = self.meta(path)
+                if meta is None or meta.get('node_type') != 'array':
+                    raise KeyError(f'No array {path} in {self.store}')
+                self.arrays[path] = Array.fromV3(path, meta)
+            else:
+                zarray = self.json(f'{path}/.zarray')
+                if zarray is None:
+                    raise KeyError(f'No array {path} in {self.store}')
+                self.arrays[path] = Array.fromV2(path, zarray, self.json(f'{path}/.zattrs') or {})
+        return self.arrays[path]
+
+    def names(self, group=''):
+        """Paths of the arrays of a group."""
+        prefix = f'{group}/' if group else ''
+        if self.consolidated:
+            suffix = '/.zarray' if self.version == 2 else ''
+            paths = [k[:-len(suffix)] if suffix else k for k in self.consolidated if k.endswith(suffix)]
+            paths = [p for p in paths if self.version == 2 or self.consolidated[p].get('node_type') == 'array']
+            return sorted(p for p in paths if p.startswith(prefix) and '/' not in p[len(prefix):])
+        names = []
+        for name in self.store.list(group):
+            path = f'{prefix}{name}'
+            meta = self.json(f'{path}/.zarray') if self.version == 2 else self.meta(path)
+            if meta is not None and (self.version == 2 or meta.get('node_type') == 'array'):
+                names.append(path)
+        return names
+
+    def coordinate(self, variable, name):
+        """Coordinate array name of a variable: sibling or root array, or listed in its CF coordinates attribute."""
+        parent = variable.path.rsplit('/', 1)[0] if '/' in variable.path else ''
+        candidates = [f'{parent}/{name}' if parent else name, name]
+        for path in dict.fromkeys(candidates):
+            try:
+                return self.array(path)
+            except KeyError:
+                pass
+        return None
+
+TIME_UNITS = {'days': 'D', 'hours': 'h', 'minutes': 'm', 'seconds': 's', 'milliseconds': 'ms', 'microseconds': 'us'}
+
+def decodeTime(values, attrs):
+    """datetime64 values of a CF time coordinate (units '<unit> since <date>'), values unchanged otherwise."""
+    match = re.match(r'^\s*(\w+)\s+since\s+(.+?)\s*(?:UTC|Z)?\s*$', str(attrs.get('units', '')))
+    if match is None or match.group(1) not in TIME_UNITS:
+        return values
+    base = np.datetime64(match.group(2).replace(' ', 'T'), 'ns')
+    unit = np.timedelta64(1, TIME_UNITS[match.group(1)]).astype('timedelta64[ns]').astype(np.int64)
+    return base + (np.asarray(values, np.float64) * unit).astype('timedelta64[ns]')
+
+class Result:
+    def __init__(self, data, dims, coords, stats):
+        self.data = data
+        self.dims = dims
+        self.coords = coords
+        self.stats = stats
+
+    def __repr__(self):
+        return f'Result({dict(zip(self.dims, self.data.shape))}, {self.data.dtype})'
+
+class CubeEngine:
+    """
+    Cube selection and slice arithmetic on a Dataset. Selections are given as coordinate value ranges,
+    {name: (low, high)} inclusive, or index ranges, {dim: slice}. A coordinate with the dimension of
+    the variable maps to the indices whose values are in range, a 2D coordinate (e.g. latitude(y, x)
+    of the HRRR Lambert grid) to the bounding box of its values in range. The chunks (inner chunks
+    of v3 shards) touched by the selection are fetched and decoded by workers threads: one GET per
+    chunk, or per shard index then one range GET per run of inner chunks closer than coalesce bytes.
+    """
+
+    def __init__(self, dataset, workers=16, coalesce=1 << 16):
+        self.dataset = dataset
+        self.workers = workers
+        self.coalesce = coalesce
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.cache = {}
+
+    def close(self):
+        self.executor.shutdown()
+
+    def coordinateValues(self, array):
+        if array.path not in self.cache:
+            data, _ = self.read(array, tuple(slice(0, n) for n in array.shape))
+            self.cache[array.path] = decodeTime(data, array.attrs)
+        return self.cache[array.path]
+
+    def coordinateNames(self, variable):
+        return list(variable.dims) + str(variable.attrs.get('coordinates', '')).split()
+
+    def slices(self, variable, ranges):
+        """Index slices of the variable selected by ranges."""
+        slices = [slice(0, n) for n in variable.shape]
+        for name, bounds in ranges.items():
+            if isinstance(bounds, slice):
+                axis = variable.dims.index(name)
+                start, stop, _ = bounds.indices(variable.shape[axis])
+                slices[axis] = slice(max(slices[axis].start, start), max(min(slices[axis].stop, stop), start))
+                continue
+            coord = self.dataset.coordinate(variable, name) if name in self.coordinateNames(variable) else None
+            if coord is None or not set(coord.dims) <= set(variable.dims):
+                raise KeyError(f'No coordinate {name} for {variable.path} {variable.dims}')
+            values = self.coordinateValues(coord)
+            low, high = (np.datetime64(b, 'ns') if np.issubdtype(values.dtype, np.datetime64) and b is not None else b
+                         for b in bounds)
+            mask = np.ones(values.shape, bool)
+            if low is not None:
+                mask &= values >= low
+            if high is not None:
+                mask &= values <= high
+            hits = np.nonzero(mask)
+            for dim, indices in zip(coord.dims, hits):
+                axis = variable.dims.index(dim)
+                start, stop = (int(indices.min()), int(indices.max()) + 1) if indices.size else (0, 0)
+                current = slices[axis]
+                slices[axis] = slice(max(current.start, start), max(min(current.stop, stop), max(current.start, start)))
+        return tuple(slices)
+
+    def plan(self, array, slices):
+        """Yields (chunk index, source slices in the chunk, destination slices in the selection)."""
+        grid = [range(s.start // c, (s.stop - 1) // c + 1) if s.stop > s.start else range(0)
+                for s, c in zip(slices, array.chunks)]
+        for idx in itertools.product(*grid):
+            src, dst = [], []
+            for i, s, c in zip(idx, slices, array.chunks):
+                lo, hi = max(s.start, i * c), min(s.stop, (i + 1) * c)
+                src.append(slice(lo - i * c, hi - i * c))
+                dst.append(slice(lo - s.start, hi - s.start))
+            yield idx, tuple(src), tuple(dst)
+
+    def fetch(self, array, plan, consume):
+        """Fetches, decodes and passes every chunk of the plan to consume(chunk, src, dst) on the worker threads."""
+        stats = {'chunks': len(plan), 'missing': 0, 'shards': 0, 'reads': 0, 'fetchTime': 0.0, 'decodeTime': 0.0}
+        lock = threading.Lock()
+
+        def timed(name, fn, *args):
+            start = time.perf_counter()
+            value = fn(*args)
+            with lock:
+                stats[name] += time.perf_counter() - start
+            return value
+
+        def decode(data, items):
+            chunk = timed('decodeTime', array.decode, data)
+            if data is None:
+                with lock:
+                    stats['missing'] += 1
+            for src, dst in items:
+                consume(chunk, src, dst)
+
+        if array.shards is None:
+            def task(item):
+                idx, src, dst = item
+                decode(timed('fetchTime', self.dataset.store.get, array.key(idx)), [(src, dst)])
+            list(self.executor.map(task, plan))
+            stats['reads'] = len(plan)
+            return stats
+
+        byShard = {}
+        for idx, src, dst in plan:
+            shard = tuple(i // p for i, p in zip(idx, array.perShard))
+            local = tuple(i % p for i, p in zip(idx, array.perShard))
+            byShard.setdefault(shard, []).append((local, src, dst))
+        stats['shards'] = len(byShard)
+
+        def index(shard):
+            start = -array.indexSize if array.indexAtEnd else 0
+            end = None if array.indexAtEnd else array.indexSize
+            return array.decodeIndex(timed('fetchTime', self.dataset.store.get, array.key(shard), start, end))
+
+        indexes = dict(zip(byShard, self.executor.map(index, byShard)))
+        reads = []
+        for shard, items in byShard.items():
+            offsets = indexes[shard]
+            present = []
+            for local, src, dst in items:
+                offset, nbytes = (EMPTY, EMPTY) if offsets is None else offsets[local]
+                if offset == EMPTY:
+                    decode(None, [(src, dst)])
+                else:
+                    present.append((int(offset), int(nbytes), src, dst))
+            # one range GET per run of inner chunks less than coalesce bytes apart
+            present.sort(key=lambda p: p[0])
+            for item in present:
+                if reads and reads[-1][0] == shard and item[0] - reads[-1][2] <= self.coalesce:
+                    reads[-1][2] = max(reads[-1][2], item[0] + item[1])
+                    reads[-1][3].append(item)
+                else:
+                    reads.append([shard, item[0], item[0] + item[1], [item]])
+
+        def task(read):
+            shard, start, end, items = read
+            data = timed('fetchTime', self.dataset.store.get, array.key(shard), start, end)
+            chunks = {}
+            for offset, nbytes, src, dst in items:
+                chunks.setdefault((offset, nbytes), []).append((src, dst))
+            for (offset, nbytes), parts in chunks.items():
+                decode(data[offset - start:offset - start + nbytes], parts)
+
+        list(self.executor.map(task, reads))
+        stats['reads'] = len(indexes) + len(reads)
+        return stats
+
+    def read(self, array, slices):
+        """(selection array, stats) of the index slices of an array."""
+        out = np.full(tuple(s.stop - s.start for s in slices), array.fill, array.dtype)
+
+        def consume(chunk, src, dst):
+            out[dst] = chunk[src]
+
+        return out, self.fetch(array, list(self.plan(array, slices)), consume)
+
+    def run(self, variable, ranges, fn):
+        array = self.dataset.array(variable)
+        store = self.dataset.store.stats
+        before = dict(store)
+        start = time.perf_counter()
+        slices = self.slices(array, ranges)
+        planned = time.perf_counter()
+        data, stats = fn(array, slices)
+        stats.update(planTime=planned - start, wallTime=time.perf_counter() - start,
+                     requests=store['requests'] - before['requests'], bytes=store['bytes'] - before['bytes'])
+        coords = {}
+        for axis, dim in enumerate(array.dims):
+            coord = self.dataset.coordinate(array, dim)
+            if coord is not None and coord.dims == (dim,):
+                coords[dim] = self.coordinateValues(coord)[slices[axis]]
+        return array, slices, data, coords, stats
+
+    def select(self, variable, **ranges):
+        """Cube selection, the values of variable in ranges."""
+        array, _, data, coords, stats = self.run(variable, ranges, self.read)
+        return Result(data, array.dims, coords, stats)
+
+    def reduce(self, variable, dim, op='mean', **ranges):
+        """
+        Slice arithmetic, op (mean, sum, min or max, NaN ignored) of the selection along dim.
+        The chunks are reduced as they arrive, the selection is never assembled.
+        """
+        def reduce(array, slices):
+            axis = array.dims.index(dim)
+            shape = tuple(s.stop - s.start for i, s in enumerate(slices) if i != axis)
+            floating = array.dtype.kind in 'fc'
+            if floating or op in ('mean', 'sum'):
+                acc = np.full(shape, np.nan if op in ('min', 'max') else 0, np.float64)
+            else:
+                # NaN has no integer value, min/max of integers start from the bounds of their dtype
+                bounds = np.iinfo(array.dtype) if array.dtype.kind in 'iu' else None
+                acc = np.full(shape, (bounds.max if op == 'min' else bounds.min) if bounds else op == 'min', array.dtype)
+            counts = np.zeros(shape, np.int64)
+            lock = threading.Lock()
+
+            def consume(chunk, src, dst):
+                part = chunk[src]
+                cell = dst[:axis] + dst[axis + 1:]
+                if op in ('mean', 'sum'):
+                    value = np.nansum(part, axis=axis) if floating else part.sum(axis=axis, dtype=np.float64)
+                    n = (~np.isnan(part)).sum(axis=axis) if floating else part.shape[axis]
+                elif op in ('min', 'max'):
+                    value = (np.nanmin if op == 'min' else np.nanmax)(part, axis=axis) if floating else (part.min if op == 'min' else part.max)(axis=axis)
+                    n = part.shape[axis]
+                with lock:
+                    if op in ('mean', 'sum'):
+                        acc[cell] += value
+                    else:
+                        acc[cell] = (np.fmin if op == 'min' else np.fmax)(acc[cell], value)
+                    counts[cell] += n
+
+            if op not in ('mean', 'sum', 'min', 'max'):
+                raise ValueError(f'Unsupported reduction {op}')
+            with np.errstate(all='ignore'):
+                stats = self.fetch(array, list(self.plan(array, slices)), consume)
+                if op == 'mean':
+                    return np.where(counts > 0, acc / np.maximum(counts, 1), np.nan), stats
+            return acc, stats
+
+        array, _, data, coords, stats = self.run(variable, ranges, reduce)
+        coords.pop(dim, None)
+        return Result(data, tuple(d for d in array.dims if d != dim), coords, stats)
+
+    def average(self, variable, dim, **ranges):
+        """zarr_average(chunk, dim) of the selection."""
+        return self.reduce(variable, dim, 'mean', **ranges)
+
+def openStore(url, workers=16, anonymous=False, endpoint=None, region=None):
+    """Store of a local path or s3://bucket/prefix, S3 credentials from private/config.ini unless anonymous."""
+    if not url.startswith('s3://'):
+        return LocalStore(url)
+    import boto3
+    from botocore import UNSIGNED
+    from botocore.config import Config
+
+    bucket, _, prefix = url[5:].partition('/')
+    config = Config(max_pool_connections=workers, signature_version=UNSIGNED if anonymous else None)
+    if anonymous:
+        client = boto3.client('s3', region_name=region, endpoint_url=endpoint, config=config)
+    else:
+        import mixins
+        settings = mixins.Session.settings()
+        endpoint = endpoint or settings['s3Endpoint']
+        client = boto3.client('s3', aws_access_key_id=settings['s3AccessKey'], aws_secret_access_key=settings['s3SecretKey'],
+                              endpoint_url=endpoint if '://' in endpoint else 'https://' + endpoint,
+                              verify=settings['caS3'], region_name=region, config=config)
+    return S3Store(client, bucket, prefix)
+
+def parseRanges(values, index=False):
+    ranges = {}
+    for value in values or []:
+        name, _, bounds = value.partition('=')
+        low, _, high = bounds.partition(',')
+        if index:
+            ranges[name] = slice(int(low) if low else None, int(high) if high else None)
+        else:
+            convert = lambda b: None if b == '' else float(b) if re.match(r'^-?[\d.]+(e-?\d+)?$', b) else b
+            ranges[name] = (convert(low), convert(high))
+    return ranges
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('store', help='local path or s3://bucket/prefix of the Zarr store')
+    parser.add_argument('variable', nargs='?', help='array to select, lists the arrays if omitted')
+    parser.add_argument('-s', '--select', action='append', help='coordinate value range, e.g. latitude=45,48 or time=2024-01-01,2024-01-02T06')
+    parser.add_argument('-i', '--index', action='append', help='index range of a dimension, e.g. x=0,100')
+    parser.add_argument('-r', '--reduce', help='dimension to reduce, e.g. time')
+    parser.add_argument('--op', default='mean', choices=['mean', 'sum', 'min', 'max'], help='reduction')
+    parser.add_argument('-w', '--workers', type=int, default=16, help='concurrent GETs')
+    parser.add_argument('-c', '--coalesce', type=int, default=1 << 16, help='max gap in bytes of merged range GETs')
+    parser.add_argument('--anonymous', action='store_true', help='unsigned S3 requests, e.g. for s3://hrrrzarr')
+    parser.add_argument('--endpoint', help='S3 endpoint')
+    parser.add_argument('--region', help='S3 region')
+    parser.add_argument('-o', '--output', help='.npy file of the result')
+    args = parser.parse_args()
+
+    dataset = Dataset(openStore(args.store, args.workers, args.anonymous, args.endpoint, args.region))
+    if args.variable is None:
+        for path in dataset.names():
+            array = dataset.array(path)
+            print(f'{path:<30} {array.dtype} {dict(zip(array.dims, array.shape))} chunks {array.chunks}'
+                  f"{f' shards {array.shards}' if array.shards else ''}")
+        return
+    engine = CubeEngine(dataset, args.workers, args.coalesce)
+    try:
+        ranges = dict(parseRanges(args.select), **parseRanges(args.index, index=True))
+        result = engine.reduce(args.variable, args.reduce, args.op, **ranges) if args.reduce else engine.select(args.variable, **ranges)
+    finally:
+        engine.close()
+    print(f'{args.variable} {dict(zip(result.dims, result.data.shape))} {result.data.dtype}')
+    for dim, values in result.coords.items():
+        if len(values):
+            print(f'  {dim}: {values[0]} .. {values[-1]}')
+    if result.data.size and result.data.dtype.kind in 'iufc':
+        with np.errstate(all='ignore'):
+            print(f'  min {np.nanmin(result.data)} max {np.nanmax(result.data)} mean {np.nanmean(result.data)}')
+    s = result.stats
+    print(f"{s['chunks']} chunks ({s['missing']} missing, {s['shards']} shards), {s['requests']} GETs, {s['bytes'] / 2**20:.1f} MiB,"
+          f" plan {s['planTime']*1e3:.1f} ms, total {s['wallTime']*1e3:.1f} ms"
+          f" ({s['bytes'] / 2**20 / max(s['wallTime'], 1e-9):.1f} MiB/s), fetch {s['fetchTime']:.2f}s and decode {s['decodeTime']:.2f}s over {args.workers} workers")
+    if args.output:
+        np.save(args.output, result.data)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+Synthetic HRRR-like Zarr datasets (time x y x x fields on a 3 km Lambert grid with 2D latitude and
+longitude) written as Zarr v2 or v3 stores with a given chunk layout and compressor, to the S3
+bucket of private/config.ini or a local directory. With --bench, sweeps the layouts and measures
+the read cost of common slices with the zarrcube reference engine, to pick a layout before
+loading the real data.
+"""
+
+import argparse
+import itertools
+import json
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import bench
+import mixins
+import zarrcube
+
+HRRR_GRID = (1059, 1799)
+START = '2024-01-01 00:00:00'
+
+def latitude(y, x, shape):
+    return 21.14 + 31.5 * y / (shape[0] - 1) + 2.5 * np.sin(np.pi * x / (shape[1] - 1))
+
+def longitude(y, x, shape):
+    return -134.1 + 73.2 * x / (shape[1] - 1) - 4.0 * (y / (shape[0] - 1) - .5) * (x / (shape[1] - 1) - .5)
+
+def noise(t, y, x):
+    """Deterministic noise in [-.5, .5] of the grid indices, the same whatever the chunk layout."""
+    return ((t * 73856093 ^ y * 19349663 ^ x * 83492791) & 0xffff) / 65535 - .5
+
+FIELDS = {
+    'TMP': ('K', 'Temperature at 2 m', lambda t, y, x, lat, lon:
+            300 - .7 * (lat - 21) + 6 * np.sin(2 * np.pi * (t + lon / 15 - 9) / 24) + .3 * noise(t, y, x)),
+    'UGRD': ('m s-1', 'U-component of wind at 10 m', lambda t, y, x, lat, lon:
+             8 * np.sin(x / 90 + t / 10) * np.cos(y / 140) + .5 * noise(t, y, x)),
+    'VGRD': ('m s-1', 'V-component of wind at 10 m', lambda t, y, x, lat, lon:
+             8 * np.cos(x / 120 - t / 8) * np.sin(y / 110) + .5 * noise(t, y, x)),
+    'RH': ('%', 'Relative humidity at 2 m', lambda t, y, x, lat, lon:
+           np.clip(60 + 30 * np.sin(y / 70 + x / 160 + t / 12) + 2 * noise(t, y, x), 0, 100)),
+}
+
+class Layout:
+    """Zarr format (2 or 3), chunk shape, optional v3 shard shape and compressor ('zstd:3', 'blosc:lz4:5', 'gzip:6', 'none')."""
+
+    def __init__(self, format, chunks, shards=None, compressor='zstd:3'):
+        self.format = format
+        self.chunks = tuple(chunks)
+        self.shards = tuple(shards) if shards else None
+        self.compressor = compressor
+        if self.shards and format != 3:
+            raise ValueError('Sharding requires Zarr v3')
+
+    @classmethod
+    def parse(cls, format, spec, compressor):
+        """Layout of a 'TxYxX' or 'TxYxX/TxYxX' (inner chunks/shard) spec."""
+        chunks, _, shards = spec.partition('/')
+        shape = lambda text: tuple(int(n) for n in text.lower().split('x'))
+        return cls(int(format.lstrip('v')), shape(chunks), shards and shape(shards), compressor)
+
+    @property
+    def name(self):
+        shards = f"_s{'x'.join(map(str, self.shards))}" if self.shards else ''
+        return f"v{self.format}_{'x'.join(map(str, self.chunks))}{shards}_{self.compressor.replace(':', '')}"
+
+    def fit(self, shape):
+        """Layout with the chunks clipped to shape, and the shards to multiples of the chunks."""
+        chunks = tuple(min(c, n) for c, n in zip(self.chunks, shape))
+        shards = self.shards and tuple(math.ceil(min(s, n) / c) * c for s, c, n in zip(self.shards, chunks, shape))
+        return Layout(self.format, chunks, shards, self.compressor)
+
+    def codec(self):
+        """numcodecs compressor, None for 'none'."""
+        import numcodecs
+
+        name, *args = self.compressor.split(':')
+        if name == 'none':
+            return None
+        if name == 'blosc':
+            return numcodecs.Blosc(cname=args[0] if args else 'lz4', clevel=int(args[1]) if len(args) > 1 else 5,
+                                   shuffle=numcodecs.Blosc.SHUFFLE)
+        if name in ('zstd', 'gzip'):
+            return numcodecs.get_codec({'id': name, 'level': int(args[0]) if args else 3})
+        raise ValueError(f'Unsupported compressor {self.compressor}')
+
+    def codecsV3(self, dtype):
+        codec = self.codec()
+        codecs = [{'name': 'bytes', 'configuration': {'endian': 'little'}}]
+        if codec is not None and codec.codec_id == 'blosc':
+            shuffle = {0: 'noshuffle', 1: 'shuffle', 2: 'bitshuffle'}[codec.shuffle]
+            codecs.append({'name': 'blosc', 'configuration': {'cname': codec.cname, 'clevel': codec.clevel,
+                           'shuffle': shuffle, 'typesize': dtype.itemsize, 'blocksize': 0}})
+        elif codec is not None:
+            codecs.append({'name': codec.codec_id, 'configuration': {'level': codec.level}
+                           | ({'checksum': False} if codec.codec_id == 'zstd' else {})})
+        return codecs
+
+    def metadata(self, shape, chunks, dtype, fill, dims, attrs, sharded):
+        """(.zarray, .zattrs) of a v2 array, (zarr.json, None) of a v3 array."""
+        dtype = np.dtype(dtype)
+        fill = 'NaN' if isinstance(fill, float) and np.isnan(fill) else fill
+        if self.format == 2:
+            codec = self.codec()
+            return ({'zarr_format': 2, 'shape': list(shape), 'chunks': list(chunks), 'dtype': dtype.newbyteorder('<').str,
+                     'compressor': codec and codec.get_config(), 'fill_value': fill, 'order': 'C', 'filters': None,
+                     'dimension_separator': '.'},
+                    dict(attrs, _ARRAY_DIMENSIONS=list(dims)))
+        types = {np.dtype(v): k for k, v in zarrcube.V3_TYPES.items()}
+        codecs = self.codecsV3(dtype)
+        if sharded and self.shards:
+            codecs = [{'name': 'sharding_indexed', 'configuration': {
+                'chunk_shape': list(chunks), 'codecs': codecs, 'index_location': 'end',
+                'index_codecs': [{'name': 'bytes', 'configuration': {'endian': 'little'}}]}}]
+            chunks = self.shards
+        return ({'zarr_format': 3, 'node_type': 'array', 'shape': list(shape), 'data_type': types[dtype],
+                 'chunk_grid': {'name': 'regular', 'configuration': {'chunk_shape': list(chunks)}},
+                 'chunk_key_encoding': {'name': 'default', 'configuration': {'separator': '/'}},
+                 'fill_value': fill, 'codecs': codecs, 'attributes': attrs, 'dimension_names': list(dims)},
+                None)
+
+class Generator:
+    """
+    Writes the dataset: one array per variable of shape (times, y, x) with the layout, and the
+    time, y, x, latitude and longitude coordinates in one chunk each, plus consolidated metadata.
+    Each chunk (or shard) is generated from its index ranges, encoded and uploaded by one of the
+    worker threads, so memory stays at about workers x chunk (or shard) size.
+    """
+
+    def __init__(self, store, layout, times, grid=HRRR_GRID, variables=('TMP',), workers=16):
+        self.store = store
+        self.shape = (times,) + tuple(grid)
+        self.layout = layout.fit(self.shape)
+        self.variables = variables
+        self.workers = workers
+        self.codec = self.layout.codec()
+        self.lock = threading.Lock()
+        self.stats = {'objects': 0, 'bytes': 0, 'rawBytes': 0}
+        self.metadata = {}
+
+    def put(self, key, data, raw=0):
+        self.store.put(key, data)
+        with self.lock:
+            self.stats['objects'] += 1
+            self.stats['bytes'] += len(data)
+            self.stats['rawBytes'] += raw
+
+    def encode(self, chunk):
+        data = np.ascontiguousarray(chunk, chunk.dtype.newbyteorder('<')).tobytes()
+        return data if self.codec is None else bytes(self.codec.encode(data))
+
+    def writeArray(self, path, shape, dtype, fill, dims, attrs, values, chunks=None, executor=None):
+        """Writes an array whose values(slices) gives the values of the index slices."""
+        sharded = chunks is None
+        chunks = chunks or self.layout.chunks
+        meta, zattrs = self.layout.metadata(shape, chunks, dtype, fill, dims, attrs, sharded)
+        if self.layout.format == 2:
+            self.metadata[f'{path}/.zarray'], self.metadata[f'{path}/.zattrs'] = meta, zattrs
+        else:
+            self.metadata[path] = meta
+        array = zarrcube.Array.fromV2(path, meta, zattrs) if zattrs is not None else zarrcube.Array.fromV3(path, meta)
+        unit = array.shards or array.chunks
+
+        def block(region):
+            out = np.full(tuple(s.stop - s.start for s in region), array.fill, array.dtype)
+            clipped = tuple(slice(s.start, min(s.stop, n)) for s, n in zip(region, shape))
+            out[tuple(slice(0, s.stop - s.start) for s in clipped)] = values(clipped)
+            return out
+
+        def write(idx):
+            region = tuple(slice(i * u, (i + 1) * u) for i, u in zip(idx, unit))
+            data = block(region)
+            if array.shards is None:
+                return self.put(array.key(idx), self.encode(data), data.nbytes)
+            parts, index, offset = [], np.zeros(array.perShard + (2,), '<u8'), 0
+            for local in itertools.product(*(range(p) for p in array.perShard)):
+                part = self.encode(data[tuple(slice(i * c, (i + 1) * c) for i, c in zip(local, array.chunks))])
+                index[local] = (offset, len(part))
+                parts.append(part)
+                offset += len(part)
+            self.put(array.key(idx), b''.join(parts) + index.tobytes(), data.nbytes)
+
+        grid = itertools.product(*(range(math.ceil(n / u)) for n, u in zip(shape, unit)))
+        list((executor.map if executor else map)(write, grid))
+
+    def write(self):
+        """Writes the store, returns its objects, bytes, raw bytes and write time."""
+        start = time.perf_counter()
+        times, ny, nx = self.shape
+        grid = (ny, nx)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for name in self.variables:
+                units, longName, fn = FIELDS[name]
+                def values(region, fn=fn):
+                    t, y, x = np.ogrid[region]
+                    return fn(t, y, x, latitude(y, x, grid), longitude(y, x, grid)).astype(np.float32)
+                self.writeArray(name, self.shape, np.float32, float('nan'), ('time', 'y', 'x'),
+                                {'units': units, 'long_name': longName, 'coordinates': 'latitude longitude'},
+                                values, executor=executor)
+        coordinates = [
+            ('time', (times,), np.int64, ('time',), {'units': f'hours since {START}', 'calendar': 'standard'},
+             lambda r: np.arange(r[0].start, r[0].stop)),
+            ('y', (ny,), np.float64, ('y',), {'units': 'm', 'standard_name': 'projection_y_coordinate'},
+             lambda r: (np.arange(r[0].start, r[0].stop) - ny // 2) * 3000.),
+            ('x', (nx,), np.float64, ('x',), {'units': 'm', 'standard_name': 'projection_x_coordinate'},
+             lambda r: (np.arange(r[0].start, r[0].stop) - nx // 2) * 3000.),
+            ('latitude', grid, np.float64, ('y', 'x'), {'units': 'degrees_north'},
+             lambda r: latitude(*np.ogrid[r], grid)),
+            ('longitude', grid, np.float64, ('y', 'x'), {'units': 'degrees_east'},
+             lambda r: longitude(*np.ogrid[r], grid)),
+        ]
+        for name, shape, dtype, dims, attrs, values in coordinates:
+            self.writeArray(name, shape, dtype, float('nan') if dtype == np.float64 else 0, dims, attrs, values, chunks=shape)
+        attrs = {'description': 'Synthetic HRRR-like dataset', 'layout': self.layout.name}
+        if self.layout.format == 2:
+            self.metadata['.zgroup'], self.metadata['.zattrs'] = {'zarr_format': 2}, attrs
+            for key in list(self.metadata):
+                self.store.put(key, json.dumps(self.metadata[key], indent=2).encode())
+            self.store.put('.zmetadata', json.dumps({'zarr_consolidated_format': 1, 'metadata': self.metadata}, indent=2).encode())
+        else:
+            for path, meta in self.metadata.items():
+                self.store.put(f'{path}/zarr.json', json.dumps(meta, indent=2).encode())
+            self.store.put('zarr.json', json.dumps({
+                'zarr_format': 3, 'node_type': 'group', 'attributes': attrs,
+                'consolidated_metadata': {'kind': 'inline', 'must_understand': False, 'metadata': self.metadata}}, indent=2).encode())
+        return dict(self.stats, writeTime=time.perf_counter() - start)
+
+def slices(shape, box=256):
+    """Common selections of a (time, y, x) variable: one field, one time series, a region, its time average."""
+    times, ny, nx = shape
+    cy, cx, half = ny // 2, nx // 2, box // 2
+    region = {'y': slice(max(cy - half, 0), cy + half), 'x': slice(max(cx - half, 0), cx + half)}
+    return [
+        ('map', 'select', {'time': slice(0, 1)}),
+        ('series', 'select', {'y': slice(cy, cy + 1), 'x': slice(cx, cx + 1)}),
+        ('region', 'select', region),
+        ('average', 'average', region),
+    ]
+
+class LayoutReport(bench.Report):
+    columns = ['layout', 'query', 'samples', 'p50', 'p95', 'requests', 'bytes', 'selectedBytes', 'overread',
+               'bytesPerSec', 'storedBytes', 'objects', 'ratio', 'writeTime']
+    dimensions = ['layout', 'query']
+
+    def table(self):
+        lines = [f"{'layout':<36} {'query':<8} {'p50 ms':>9} {'GETs':>7} {'MiB read':>9} {'overread':>9} {'MiB/s':>8}"
+                 f" {'stored MiB':>10} {'ratio':>6}"]
+        for r in self.results:
+            lines.append(f"{r['layout']:<36} {r['query']:<8} {r['p50']*1e3:>9.1f} {r['requests']:>7} {r['bytes']/2**20:>9.1f}"
+                         f" {r['overread']:>8.1f}x {(r['bytesPerSec'] or 0)/2**20:>8.1f} {r['storedBytes']/2**20:>10.1f}"
+                         f" {r['ratio']:>6.2f}")
+        return '\n'.join(lines)
+
+class LayoutBenchmark:
+    """
+    For each layout, writes the dataset under <target>/<layout name>, then times the common slices
+    of its first variable with zarrcube.CubeEngine: latency, GETs, bytes read and the overread, the
+    decoded elements of the touched chunks per selected element.
+    """
+
+    def __init__(self, target, layouts, times, grid, variables, workers=16, warmup=1, repeat=5, clean=False):
+        self.target = target.rstrip('/')
+        self.layouts = layouts
+        self.times = times
+        self.grid = grid
+        self.variables = variables
+        self.workers = workers
+        self.warmup = warmup
+        self.repeat = repeat
+        self.clean = clean
+
+    def measure(self, engine, variable, method, ranges):
+        samples = []
+        for i in range(self.warmup + self.repeat):
+            start = time.perf_counter()
+            result = getattr(engine, method)(variable, 'time', **ranges) if method == 'average' else engine.select(variable, **ranges)
+            if i >= self.warmup:
+                samples.append(time.perf_counter() - start)
+        return samples, result
+
+    def run(self, report):
+        for layout in self.layouts:
+            store = zarrcube.openStore(f'{self.target}/{layout.name}', self.workers)
+            generator = Generator(store, layout, self.times, self.grid, self.variables, self.workers)
+            written = generator.write()
+            print(f"{layout.name}: {written['objects']} objects, {written['bytes']/2**20:.1f} MiB"
+                  f" ({written['bytes']/written['rawBytes']:.2f} of raw) in {written['writeTime']:.1f}s")
+            engine = zarrcube.CubeEngine(zarrcube.Dataset(store), self.workers)
+            try:
+                variable = self.variables[0]
+                array = engine.dataset.array(variable)
+                for name, method, ranges in slices(generator.shape):
+                    samples, result = self.measure(engine, variable, method, ranges)
+                    selected = engine.slices(array, ranges)
+                    elements = math.prod(s.stop - s.start for s in selected)
+                    stats = result.stats
+                    report.add({
+                        'layout': layout.name, 'query': name, 'samples': len(samples),
+                        'p50': bench.percentile(samples, 50), 'p95': bench.percentile(samples, 95),
+                        'requests': stats['requests'], 'bytes': stats['bytes'],
+                        'selectedBytes': elements * array.dtype.itemsize,
+                        'overread': stats['chunks'] * math.prod(array.chunks) / max(elements, 1),
+                        'bytesPerSec': stats['bytes'] / bench.percentile(samples, 50) if samples else None,
+                        'storedBytes': written['bytes'], 'objects': written['objects'],
+                        'ratio': written['bytes'] / written['rawBytes'], 'writeTime': written['writeTime'],
+                    })
+            finally:
+                engine.close()
+                if self.clean:
+                    store.clear()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('target', help='local directory or s3://bucket/prefix, one store per layout under it')
+    parser.add_argument('-f', '--format', action='append', choices=['v2', 'v3'], help='Zarr format(s), default v3')
+    parser.add_argument('-l', '--layout', action='append',
+                        help='chunk shape TxYxX, or TxYxX/TxYxX for inner chunks in v3 shards, default 1x1059x1799')
+    parser.add_argument('-c', '--compressor', action='append', help='zstd[:level], gzip[:level], blosc[:cname:level] or none, default zstd:3')
+    parser.add_argument('-g', '--grid', default='x'.join(map(str, HRRR_GRID)), help='grid YxX, default the HRRR CONUS grid')
+    parser.add_argument('-t', '--times', type=int, default=24, help='hourly time steps')
+    parser.add_argument('-s', '--size', help='total raw size (e.g. 10GB), sets the time steps')
+    parser.add_argument('-v', '--variables', default='TMP', help=f"comma separated variables of {', '.join(FIELDS)}")
+    parser.add_argument('-w', '--workers', type=int, default=16, help='concurrent chunk writes and reads')
+    parser.add_argument('--bench', action='store_true', help='time the common slices of every layout')
+    parser.add_argument('-W', '--warmup', type=int, default=1, help='untimed runs per slice')
+    parser.add_argument('-n', '--repeat', type=int, default=5, help='timed runs per slice')
+    parser.add_argument('--clean', action='store_true', help='delete each store once benchmarked')
+    parser.add_argument('-o', '--output', default='private/bench', help='report directory')
+    args = parser.parse_args()
+
+    grid = tuple(int(n) for n in args.grid.lower().split('x'))
+    variables = [v for v in args.variables.split(',') if v]
+    unknown = set(variables) - set(FIELDS)
+    if unknown:
+        parser.error(f"unknown variables {', '.join(sorted(unknown))}")
+    times = math.ceil(mixins.parseDataSize(args.size) / (math.prod(grid) * 4 * len(variables))) if args.size else args.times
+    layouts = [Layout.parse(f, l, c) for f in args.format or ['v3'] for l in args.layout or [f'1x{grid[0]}x{grid[1]}']
+               for c in args.compressor or ['zstd:3'] if f == 'v3' or '/' not in l]
+
+    if not args.bench:
+        for layout in layouts:
+            generator = Generator(zarrcube.openStore(f"{args.target.rstrip('/')}/{layout.name}", args.workers),
+                                  layout, times, grid, variables, args.workers)
+            written = generator.write()
+            print(f"{args.target.rstrip('/')}/{layout.name}: {'x'.join(map(str, generator.shape))} {','.join(variables)},"
+                  f" {written['objects']} objects, {written['bytes']/2**20:.1f} MiB ({written['bytes']/written['rawBytes']:.2f} of raw)"
+                  f" in {written['writeTime']:.1f}s")
+        return
+    report = LayoutReport('zarr_layout', grid=grid, times=times, variables=variables, warmup=args.warmup, repeat=args.repeat)
+    LayoutBenchmark(args.target, layouts, times, grid, variables, args.workers, args.warmup, args.repeat, args.clean).run(report)
+    print(report.table())
+    print(f'Report: {report.write(args.output)}.{{json,csv}}')
+
+if __name__ == '__main__':
+    main()